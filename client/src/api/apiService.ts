@@ -129,6 +129,9 @@ export interface CollaborationSummary {
         [key: string]: any;
     };
     recommendations: string[];
+    chunk_count?: number;
+    message_count?: number;
+    summarized_through?: string;
     generated_at: string;
     created_at: string;
     chat_sessions?: {
@@ -143,6 +146,16 @@ export interface CollaborationSummaryResponse {
     summary: CollaborationSummary;
 }
 
+export interface SummaryJobResponse {
+    message?: string;
+    job_id: string;
+    session_id?: string;
+    status: 'queued' | 'running' | 'completed' | 'failed';
+    status_url?: string;
+    summary?: CollaborationSummary;
+    error?: string;
+}
+
 export interface CollaborationSummariesResponse {
     summaries: CollaborationSummary[];
 }
@@ -335,12 +348,33 @@ class ApiService {
     }
 
     // Collaboration Summary methods
-    async generateCollaborationSummary(sessionId: string): Promise<CollaborationSummaryResponse> {
+    async generateCollaborationSummary(sessionId: string, refresh: boolean = false): Promise<CollaborationSummaryResponse> {
         console.log('Generating collaboration summary for session:', sessionId);
-        return this.request<CollaborationSummaryResponse>('/api/chat/generate-collaboration-summary', {
+        const response = await this.request<CollaborationSummaryResponse | SummaryJobResponse>('/api/chat/generate-collaboration-summary', {
             method: 'POST',
-            body: JSON.stringify({ session_id: sessionId })
+            body: JSON.stringify({ session_id: sessionId, refresh })
         });
+
+        // An existing summary comes back directly; otherwise poll the queued job
+        if (!('job_id' in response)) {
+            return response;
+        }
+
+        for (let attempt = 0; attempt < 120; attempt++) {
+            await new Promise(resolve => setTimeout(resolve, 1500));
+            const job = await this.getSummaryJob(response.job_id);
+            if (job.status === 'completed' && job.summary) {
+                return { message: 'Collaboration summary generated successfully', summary: job.summary };
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'Summary generation failed');
+            }
+        }
+        throw new Error('Summary generation is taking longer than expected');
+    }
+
+    async getSummaryJob(jobId: string): Promise<SummaryJobResponse> {
+        return this.request<SummaryJobResponse>(`/api/chat/summary-jobs/${jobId}`);
     }
 
     async getCollaborationSummaries(): Promise<CollaborationSummariesResponse> {
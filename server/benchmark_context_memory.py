@@ -0,0 +1,171 @@
+"""
+Benchmark for conversation context memory
+Compares the slot/ring-buffer ConversationContext with the previous list-of-dicts layout, both
+for resident memory and for the per-turn cost of the reads and append one chat turn makes
+
+Each layout runs in its own subprocess; memory is measured with tracemalloc:
+    python benchmark_context_memory.py
+    python benchmark_context_memory.py --sessions 10000 --messages 15 --moods 10
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+MOODS = ['happy', 'sad', 'anxious', 'neutral', 'curious']
+
+class ListContext:
+    """The previous layout: instance dict, list histories trimmed by slicing, ISO timestamps"""
+    
+    def __init__(self, user_id, session_id, user_preferences=None):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.user_preferences = user_preferences or {}
+        self.conversation_history = []
+        self.current_mood = 'neutral'
+        self.mood_history = []
+        self.topics_discussed = []
+        self.educational_topics_covered = []
+        self.last_activity = datetime.now()
+    
+    def add_message(self, message):
+        self.conversation_history.append({**message, 'timestamp': datetime.now().isoformat()})
+        self.last_activity = datetime.now()
+        if len(self.conversation_history) > 15:
+            self.conversation_history = self.conversation_history[-15:]
+    
+    def update_mood(self, mood, confidence):
+        self.current_mood = mood
+        self.mood_history.append({'mood': mood, 'confidence': confidence, 'timestamp': datetime.now().isoformat()})
+        if len(self.mood_history) > 10:
+            self.mood_history = self.mood_history[-10:]
+    
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'session_id': self.session_id,
+            'user_preferences': self.user_preferences,
+            'conversation_history': self.conversation_history,
+            'current_mood': self.current_mood,
+            'mood_history': self.mood_history,
+            'topics_discussed': self.topics_discussed,
+            'educational_topics_covered': self.educational_topics_covered,
+            'last_activity': self.last_activity.isoformat()
+        }
+
+class ListManager:
+    """The previous manager: contexts held in a plain dict and updated in place"""
+    
+    def __init__(self):
+        self.contexts = {}
+    
+    def get_context(self, user_id, session_id, user_preferences=None):
+        if session_id not in self.contexts:
+            self.contexts[session_id] = ListContext(user_id, session_id, user_preferences)
+        return self.contexts[session_id]
+    
+    def update_context(self, session_id, message, mood=None, confidence=None):
+        context = self.contexts.get(session_id)
+        if context:
+            context.add_message(message)
+            if mood:
+                context.update_mood(mood, confidence or 0.0)
+        return context
+
+def time_turns(layout: str, turns: int) -> float:
+    """
+    Average microseconds for the context work of one chat turn on a session with full histories:
+    the guardrail read, the append, the read for the reply and one serialization for the prompt
+    """
+    if layout == 'slots':
+        from utils.context_store import MemoryContextStore
+        from utils.conversation_context import ConversationContextManager
+        manager = ConversationContextManager(MemoryContextStore(sweep_interval_seconds=0))
+    else:
+        manager = ListManager()
+    
+    manager.get_context('user', 'session', {'name': 'Sam'})
+    for i in range(20):
+        manager.update_context('session', {'content': f"warm-up message {i}", 'message_type': 'user'}, MOODS[i % len(MOODS)], 0.8)
+    
+    started = time.perf_counter()
+    for i in range(turns):
+        manager.get_context('user', 'session', {'name': 'Sam'})
+        manager.update_context('session', {'content': "how is my day going", 'message_type': 'user'}, MOODS[i % len(MOODS)], 0.8)
+        manager.get_context('user', 'session', {'name': 'Sam'}).to_dict()
+    return (time.perf_counter() - started) / turns * 1e6
+
+def run_layout(layout: str, sessions: int, messages: int, moods: int, turns: int) -> dict:
+    """Build every session with one layout, measure retained memory, then time chat turns"""
+    if layout == 'slots':
+        from utils.conversation_context import ConversationContext as context_class
+    else:
+        context_class = ListContext
+    
+    # Message text is built outside the measurement; both layouts hold the same strings
+    texts = [f"message {i} about how my day is going" for i in range(messages)]
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    
+    contexts = {}
+    for s in range(sessions):
+        context = context_class(f"user-{s}", f"session-{s}", {'name': 'Sam'})
+        for i in range(messages):
+            context.add_message({'content': texts[i], 'message_type': 'user' if i % 2 == 0 else 'ai'})
+        for i in range(moods):
+            # Moods arrive as fresh strings, as they do from parsed LLM JSON
+            context.update_mood(''.join(MOODS[(s + i) % len(MOODS)]), 0.8)
+        contexts[context.session_id] = context
+    
+    build_seconds = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        'layout': layout,
+        'sessions': sessions,
+        'retained_mb': round(current / 1024 / 1024, 1),
+        'peak_mb': round(peak / 1024 / 1024, 1),
+        'bytes_per_session': round(current / sessions),
+        'build_seconds': round(build_seconds, 2),
+        'turn_us': round(time_turns(layout, turns), 1)
+    }
+
+def main():
+    """Run each layout in a subprocess and print a comparison"""
+    parser = argparse.ArgumentParser(description="Benchmark conversation context memory")
+    parser.add_argument('--layout', choices=['lists', 'slots'], help="Run a single layout in this process")
+    parser.add_argument('--sessions', type=int, default=100000)
+    parser.add_argument('--messages', type=int, default=20, help="Messages added per session (15 are kept)")
+    parser.add_argument('--moods', type=int, default=12, help="Mood updates per session (10 are kept)")
+    parser.add_argument('--turns', type=int, default=20000, help="Chat turns timed on one session")
+    args = parser.parse_args()
+    
+    if args.layout:
+        print(json.dumps(run_layout(args.layout, args.sessions, args.messages, args.moods, args.turns)))
+        return
+    
+    results = []
+    for layout in ['lists', 'slots']:
+        output = subprocess.run(
+            [sys.executable, __file__, '--layout', layout, '--sessions', str(args.sessions),
+             '--messages', str(args.messages), '--moods', str(args.moods), '--turns', str(args.turns)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    
+    print("Conversation Context Memory Benchmark")
+    print("=" * 60)
+    for key in results[0]:
+        print(f"{key:<24}" + "".join(f"{str(result[key]):>14}" for result in results))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark for the PII analyzer profiles
+Reports latency, throughput and memory for the default and lean Presidio/spaCy engines
+
+Each profile runs in its own subprocess so peak RSS is measured in isolation:
+    python benchmark_pii_profiles.py
+    python benchmark_pii_profiles.py --profile lean --batch-size 32
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_MESSAGES = [
+    "My email is john@example.com and I need help",
+    "Call me at 555-123-4567 for more information",
+    "My SSN is 123-45-6789 and I live at Shanti Road, Andheri, Mumbai",
+    "Please contact me at jane.nitin@gmail.com or call 9876543210",
+    "Hello, how are you today?",
+    "I talked to Priya about the phishing email she got",
+    "Can you explain how authentication works?",
+    "The server IP is 192.168.1.1",
+]
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    # ru_maxrss is kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def run_profile(profile: str, iterations: int, batch_size: int) -> dict:
+    """Load one profile and measure it"""
+    from utils.pii_guard import PIIGuard
+    
+    rss_before = peak_rss_mb()
+    load_started = time.perf_counter()
+    guard = PIIGuard(profile=profile)
+    load_seconds = time.perf_counter() - load_started
+    
+    # Measure the NLP engine itself, not the prefilter
+    guard.prefilter_enabled = False
+    guard.analyze(SAMPLE_MESSAGES[0])
+    
+    latencies = []
+    entity_counts = 0
+    for i in range(iterations):
+        message = SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)]
+        started = time.perf_counter()
+        detection = guard.analyze(message)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+        entity_counts += detection.total_entities
+    
+    batch = [SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)] for i in range(batch_size)]
+    batches = max(1, iterations // batch_size)
+    started = time.perf_counter()
+    for _ in range(batches):
+        guard.analyze_batch(batch)
+    batched_seconds = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        'profile': profile,
+        'recognizers': len(guard.analyzer.registry.recognizers),
+        'load_seconds': round(load_seconds, 2),
+        'latency_p50_ms': round(statistics.median(latencies), 2),
+        'latency_p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        'throughput_single_msgs_per_s': round(len(latencies) / (sum(latencies) / 1000.0), 1),
+        'throughput_batched_msgs_per_s': round(batches * batch_size / batched_seconds, 1),
+        'entities_per_msg': round(entity_counts / iterations, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'engine_rss_mb': round(peak_rss_mb() - rss_before, 1)
+    }
+
+def main():
+    """Run each profile in a subprocess and print a comparison"""
+    parser = argparse.ArgumentParser(description="Benchmark PII analyzer profiles")
+    parser.add_argument('--profile', choices=['default', 'lean'], help="Run a single profile in this process")
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+    
+    if args.profile:
+        print(json.dumps(run_profile(args.profile, args.iterations, args.batch_size)))
+        return
+    
+    results = []
+    for profile in ['default', 'lean']:
+        output = subprocess.run(
+            [sys.executable, __file__, '--profile', profile,
+             '--iterations', str(args.iterations), '--batch-size', str(args.batch_size)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    
+    print("PII Profile Benchmark")
+    print("=" * 60)
+    for key in results[0]:
+        print(f"{key:<32}" + "".join(f"{str(result[key]):>14}" for result in results))
+
+if __name__ == "__main__":
+    main()
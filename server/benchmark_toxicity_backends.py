@@ -0,0 +1,100 @@
+"""
+Benchmark for the toxicity inference backends
+Reports latency, throughput and memory for PyTorch and int8 ONNX Runtime
+
+Each backend runs in its own subprocess so peak RSS is measured in isolation:
+    python benchmark_toxicity_backends.py
+    python benchmark_toxicity_backends.py --backend onnx --batch-size 16
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_MESSAGES = [
+    "Hello, how are you today?",
+    "This is a helpful message about security",
+    "I hate this stupid system and want to destroy it",
+    "Please help me with my computer problem",
+    "You are an idiot and I hope you fail",
+    "My email is john@example.com and I need help",
+    "Can you explain how authentication works?",
+    "I've been feeling a bit down this week, any advice?",
+]
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    # ru_maxrss is kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def run_backend(backend_name: str, iterations: int, batch_size: int) -> dict:
+    """Load one backend and measure it"""
+    from utils.toxicity_backends import TorchToxicityBackend, OnnxToxicityBackend
+    
+    rss_before = peak_rss_mb()
+    load_started = time.perf_counter()
+    backend = TorchToxicityBackend() if backend_name == 'torch' else OnnxToxicityBackend()
+    load_seconds = time.perf_counter() - load_started
+    
+    # Warm up
+    backend.predict(SAMPLE_MESSAGES[:2])
+    
+    latencies = []
+    for i in range(iterations):
+        message = SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)]
+        started = time.perf_counter()
+        backend.predict([message])
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    
+    batch = [SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)] for i in range(batch_size)]
+    batches = max(1, iterations // batch_size)
+    started = time.perf_counter()
+    for _ in range(batches):
+        backend.predict(batch)
+    batched_seconds = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        'backend': backend_name,
+        'load_seconds': round(load_seconds, 2),
+        'latency_p50_ms': round(statistics.median(latencies), 2),
+        'latency_p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        'throughput_single_msgs_per_s': round(len(latencies) / (sum(latencies) / 1000.0), 1),
+        'throughput_batched_msgs_per_s': round(batches * batch_size / batched_seconds, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'model_rss_mb': round(peak_rss_mb() - rss_before, 1)
+    }
+
+def main():
+    """Run each backend in a subprocess and print a comparison"""
+    parser = argparse.ArgumentParser(description="Benchmark toxicity inference backends")
+    parser.add_argument('--backend', choices=['torch', 'onnx'], help="Run a single backend in this process")
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=16)
+    args = parser.parse_args()
+    
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args.iterations, args.batch_size)))
+        return
+    
+    results = []
+    for backend_name in ['torch', 'onnx']:
+        output = subprocess.run(
+            [sys.executable, __file__, '--backend', backend_name,
+             '--iterations', str(args.iterations), '--batch-size', str(args.batch_size)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    
+    print("Toxicity Backend Benchmark")
+    print("=" * 60)
+    for key in results[0]:
+        print(f"{key:<32}" + "".join(f"{str(result[key]):>14}" for result in results))
+
+if __name__ == "__main__":
+    main()
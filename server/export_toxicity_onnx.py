@@ -0,0 +1,28 @@
+"""
+Export the Detoxify checkpoint for the ONNX toxicity backend
+Run once per deploy, before starting workers with TOXICITY_BACKEND=onnx:
+    python export_toxicity_onnx.py
+    python export_toxicity_onnx.py --variant unbiased --no-quantize
+
+Workers never export on their own; without the exported model they fall back to PyTorch.
+"""
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.toxicity_backends import DEFAULT_ONNX_DIR, export_detoxify_onnx
+
+def main():
+    """Export the model, tokenizer and labels into the directory the backend loads from"""
+    parser = argparse.ArgumentParser(description="Export Detoxify to ONNX for the toxicity backend")
+    parser.add_argument('--variant', default=os.getenv('TOXICITY_MODEL_VARIANT', 'original'))
+    parser.add_argument('--model-dir', default=os.getenv('TOXICITY_ONNX_DIR', DEFAULT_ONNX_DIR))
+    parser.add_argument('--no-quantize', action='store_true', help="Only write the fp32 model")
+    args = parser.parse_args()
+
+    model_path = export_detoxify_onnx(args.variant, os.path.join(args.model_dir, args.variant), quantize=not args.no_quantize)
+    print(f"Exported {args.variant} to {model_path}")
+
+if __name__ == "__main__":
+    main()
@@ -128,6 +128,46 @@ CREATE INDEX IF NOT EXISTS idx_collaboration_summaries_session_id ON collaborati
 CREATE INDEX IF NOT EXISTS idx_collaboration_summaries_user_id ON collaboration_summaries(user_id);
 CREATE INDEX IF NOT EXISTS idx_collaboration_summaries_generated_at ON collaboration_summaries(generated_at);
 
+-- Create summary_jobs table for background collaboration summary generation
+CREATE TABLE IF NOT EXISTS summary_jobs (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    session_id UUID REFERENCES chat_sessions(id) ON DELETE CASCADE,
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    refresh BOOLEAN DEFAULT FALSE,
+    summary_id UUID REFERENCES collaboration_summaries(id) ON DELETE SET NULL,
+    error TEXT,
+    started_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Create indexes for summary jobs; at most one active job per session
+CREATE UNIQUE INDEX IF NOT EXISTS idx_summary_jobs_active_session ON summary_jobs(session_id) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_summary_jobs_user_id ON summary_jobs(user_id);
+
+-- Track how much of the session each collaboration summary covers
+ALTER TABLE collaboration_summaries ADD COLUMN IF NOT EXISTS chunk_count INTEGER DEFAULT 0;
+ALTER TABLE collaboration_summaries ADD COLUMN IF NOT EXISTS message_count INTEGER DEFAULT 0;
+ALTER TABLE collaboration_summaries ADD COLUMN IF NOT EXISTS summarized_through TIMESTAMP WITH TIME ZONE;
+
+-- Create summary_chunks table for per-chunk summaries merged into collaboration_summaries
+CREATE TABLE IF NOT EXISTS summary_chunks (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    session_id UUID REFERENCES chat_sessions(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    key_points JSONB,
+    mood_counts JSONB,
+    message_count INTEGER NOT NULL,
+    first_message_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_message_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_message_id UUID,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE (session_id, chunk_index)
+);
+
 -- Create session_timers table for tracking session duration
 CREATE TABLE IF NOT EXISTS session_timers (
     id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
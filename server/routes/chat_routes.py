@@ -1,26 +1,31 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from db.config import supabase
 from routes.auth_routes import verify_jwt_token
 from utils.guardrails import guardrails_service
 from utils.llm_mood_analysis import llm_mood_analyzer
 from utils.llm_response_generator import llm_response_generator
 from utils.conversation_context import context_manager
+from utils.llm_gateway import llm_gateway
+from utils.summary_jobs import summary_job_queue
+from utils.summary_chunks import summary_chunker, summary_is_current
+from utils.toxicity_batcher import Histogram
 from datetime import datetime
+import json
+import queue
+import threading
+import time
 import uuid
-import google.generativeai as genai
-import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini for collaboration summaries
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel('gemini-2.0-flash')
-else:
-    gemini_model = None
+# Gemini model for collaboration summaries, served by the shared gateway
+SUMMARY_MODEL = 'gemini-2.0-flash'
+
+# Time to first token and total time for streamed chat responses
+stream_ttft_histogram = Histogram([100, 250, 500, 1000, 2000, 5000, 10000])
+stream_total_histogram = Histogram([500, 1000, 2000, 5000, 10000, 20000, 30000])
 
 chat_bp = Blueprint('chat', __name__)
 
@@ -212,6 +217,9 @@ def add_message_to_session(session_id):
         if not result.data:
             return jsonify({'error': 'Failed to add message'}), 500
         
+        summary_chunker.note_messages(session_id)
+        context_manager.record_stored_messages(session_id, [result.data[0].get('mood')])
+        
         # Update session's updated_at timestamp
         supabase.table('chat_sessions').update({'updated_at': datetime.now().isoformat()}).eq('id', session_id).execute()
         
@@ -243,94 +251,275 @@ def process_user_message(session_id):
             return jsonify({'error': 'Chat session not found'}), 404
         
         # Get user preferences for personalization
-        user_preferences = {
-            'user_id': user['id'],
-            'name': user.get('name'),
-            'morning_preference': user.get('morning_preference'),
-            'life_genre': user.get('life_genre'),
-            'weekly_goal': user.get('weekly_goal'),
-            'favorite_app': user.get('favorite_app')
-        }
+        user_preferences = _get_user_preferences(user)
         
-        # Process message through enhanced guardrails
+        # Process message through enhanced guardrails; mood is left to the fused reply call
+        # unless a guardrail (restricted content) needs it first
+        analysis = guardrails_service.create_analysis(user_message, user['id'], session_id, user_preferences)
         processing_results = guardrails_service.process_message_v2(
-            user_message, user['id'], session_id, user_preferences
+            user_message, user['id'], session_id, user_preferences,
+            analysis=analysis, defer_mood=llm_response_generator.fused_enabled
         )
         
-        # Store user message with mood analysis (use processed_message if PII was scrubbed)
-        stored_content = processing_results.get('processed_message', user_message)
-        user_message_data = {
-            'session_id': session_id,
-            'user_id': user['id'],
-            'message_type': 'user',
-            'content': stored_content,
-            'mood': processing_results.get('mood_analysis', {}).get('mood', 'neutral'),
-            'response_type': 'normal',
-            'context_data': {
-                'mood_analysis': processing_results.get('mood_analysis'),
-                'processing_log': processing_results.get('processing_log', []),
-                'pii_scrubbed': processing_results.get('pii_scrubbed', False),
-                'original_message': user_message if processing_results.get('pii_scrubbed', False) else None
+        # Blocked messages are neither stored nor sent to Gemini
+        if processing_results.get('should_block'):
+            return jsonify(_get_blocked_response(processing_results)), 400
+        
+        ai_response = None
+        if processing_results.get('mood_deferred'):
+            # One Gemini round trip for both mood and reply
+            _, serializable_context = _get_response_inputs(processing_results, user_preferences, session_id)
+            fused = llm_response_generator.generate_response_with_mood(
+                user_message,
+                user_preferences,
+                serializable_context,
+                guardrails_service.analyze(analysis, 'history')
+            )
+            processing_results = guardrails_service.complete_message_v2(analysis, processing_results, fused['mood_analysis'])
+            ai_response = {
+                'content': fused['content'],
+                'mood': fused['mood_analysis'].get('mood', 'neutral'),
+                'response_type': processing_results.get('response_type', 'normal')
             }
-        }
         
         # Insert user message
+        user_message_data = _build_user_message_data(session_id, user['id'], user_message, processing_results)
         user_msg_result = supabase.table('chat_messages').insert(user_message_data).execute()
         
         if not user_msg_result.data:
             return jsonify({'error': 'Failed to store user message'}), 500
         
         # Generate AI response based on processing results
-        ai_response = _generate_ai_response(processing_results, user_preferences, session_id)
+        if ai_response is None:
+            ai_response = _generate_ai_response(processing_results, user_preferences, session_id)
         
         # Store AI response
-        ai_message_data = {
-            'session_id': session_id,
-            'user_id': user['id'],
-            'message_type': 'ai',
-            'content': ai_response['content'],
-            'mood': ai_response.get('mood', 'neutral'),
-            'response_type': ai_response.get('response_type', 'normal'),
-            'context_data': {
-                'response_guidance': processing_results.get('response_guidance'),
-                'should_redirect': processing_results.get('should_redirect', False),
-                'redirect_suggestions': processing_results.get('redirect_suggestions', [])
-            }
-        }
-        
+        ai_message_data = _build_ai_message_data(session_id, user['id'], ai_response, processing_results)
         ai_msg_result = supabase.table('chat_messages').insert(ai_message_data).execute()
         
         if not ai_msg_result.data:
             return jsonify({'error': 'Failed to store AI response'}), 500
         
+        summary_chunker.note_messages(session_id, 2)
+        context_manager.record_stored_messages(session_id, [user_message_data['mood'], ai_message_data['mood']])
+        
         # Update session timestamp
         supabase.table('chat_sessions').update({'updated_at': datetime.now().isoformat()}).eq('id', session_id).execute()
         
         return jsonify({
             'user_message': user_msg_result.data[0],
             'ai_response': ai_msg_result.data[0],
-            'processing_results': {
-                'mood_analysis': processing_results.get('mood_analysis'),
-                'response_guidance': processing_results.get('response_guidance'),
-                'should_redirect': processing_results.get('should_redirect'),
-                'redirect_suggestions': processing_results.get('redirect_suggestions'),
-                'context_summary': processing_results.get('context_summary'),
-                'warnings': processing_results.get('warnings', []),
-                'pii_scrubbed': processing_results.get('pii_scrubbed', False),
-                'processed_message': processing_results.get('processed_message', user_message)
-            }
+            'processing_results': _get_client_processing_results(processing_results, user_message)
         }), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to process message: {str(e)}'}), 500
 
-def _generate_ai_response(processing_results: dict, user_preferences: dict, session_id: str) -> dict:
-    """Generate AI response using LLM-based services"""
-    mood_analysis = processing_results.get('mood_analysis', {})
-    current_mood = mood_analysis.get('mood', 'neutral')
+@chat_bp.route('/sessions/<session_id>/process-message/stream', methods=['POST'])
+def process_user_message_stream(session_id):
+    """Process user message and stream guardrail verdicts and AI tokens as server-sent events"""
+    try:
+        user, error_response, status_code = require_auth()
+        if error_response:
+            return error_response, status_code
+        
+        data = request.get_json()
+        user_message = data.get('message', '').strip()
+        
+        if not user_message:
+            return jsonify({'error': 'Message is required'}), 400
+        
+        # Verify session belongs to user
+        session_result = supabase.table('chat_sessions').select('id').eq('id', session_id).eq('user_id', user['id']).eq('is_active', True).execute()
+        
+        if not session_result.data:
+            return jsonify({'error': 'Chat session not found'}), 404
+        
+        user_preferences = _get_user_preferences(user)
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to process message: {str(e)}'}), 500
     
-    # Get the original user message from processing results
-    user_message = processing_results.get('original_message', '')
+    def generate():
+        started = time.perf_counter()
+        events = queue.Queue()
+        
+        # Verdicts are pushed from the guardrail threads as each stage finishes
+        analysis = guardrails_service.create_analysis(user_message, user['id'], session_id, user_preferences)
+        def on_stage_result(stage_name, result):
+            verdict = guardrails_service.describe_verdict(stage_name, result)
+            if verdict:
+                events.put(('guardrail', verdict))
+        analysis.add_listener(on_stage_result)
+        
+        def run_guardrails():
+            try:
+                # A Gemini mood call would hold back the first token, so mood is classified locally
+                processing_results = guardrails_service.process_message_v2(
+                    user_message, user['id'], session_id, user_preferences, analysis=analysis, defer_mood=True
+                )
+                if processing_results.get('mood_deferred'):
+                    processing_results = guardrails_service.complete_message_v2(
+                        analysis, processing_results, llm_mood_analyzer.analyze_mood_local(user_message)
+                    )
+                events.put(('processed', processing_results))
+            except Exception as e:
+                events.put(('failed', e))
+        threading.Thread(target=run_guardrails, name='guardrails-stream', daemon=True).start()
+        
+        try:
+            while True:
+                event_type, payload = events.get()
+                if event_type == 'guardrail':
+                    yield _sse_event('guardrail', payload)
+                elif event_type == 'failed':
+                    raise payload
+                else:
+                    processing_results = payload
+                    break
+            
+            yield _sse_event('guardrails_complete', {
+                'should_block': processing_results.get('should_block', False),
+                'risk_level': processing_results.get('risk_level'),
+                'warnings': processing_results.get('warnings', []),
+                'pii_scrubbed': processing_results.get('pii_scrubbed', False),
+                'response_type': processing_results.get('response_type', 'normal'),
+                'elapsed_ms': round((time.perf_counter() - started) * 1000.0, 1)
+            })
+            
+            # Blocked messages are neither stored nor sent to Gemini
+            if processing_results.get('should_block'):
+                yield _sse_event('error', _get_blocked_response(processing_results))
+                return
+            
+            user_message_data = _build_user_message_data(session_id, user['id'], user_message, processing_results)
+            user_msg_result = supabase.table('chat_messages').insert(user_message_data).execute()
+            if not user_msg_result.data:
+                yield _sse_event('error', {'error': 'Failed to store user message'})
+                return
+            
+            mood_analysis, serializable_context = _get_response_inputs(processing_results, user_preferences, session_id)
+            chunks = []
+            ttft_ms = None
+            for chunk in llm_response_generator.stream_response(
+                processing_results.get('original_message', ''),
+                mood_analysis,
+                user_preferences,
+                serializable_context
+            ):
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - started) * 1000.0
+                    stream_ttft_histogram.observe(ttft_ms)
+                chunks.append(chunk)
+                yield _sse_event('token', {'text': chunk})
+            
+            ai_response = {
+                'content': ''.join(chunks).strip(),
+                'mood': mood_analysis.get('mood', 'neutral'),
+                'response_type': processing_results.get('response_type', 'normal')
+            }
+            ai_message_data = _build_ai_message_data(session_id, user['id'], ai_response, processing_results)
+            ai_msg_result = supabase.table('chat_messages').insert(ai_message_data).execute()
+            if not ai_msg_result.data:
+                yield _sse_event('error', {'error': 'Failed to store AI response'})
+                return
+            
+            summary_chunker.note_messages(session_id, 2)
+            context_manager.record_stored_messages(session_id, [user_message_data['mood'], ai_message_data['mood']])
+            supabase.table('chat_sessions').update({'updated_at': datetime.now().isoformat()}).eq('id', session_id).execute()
+            
+            total_ms = (time.perf_counter() - started) * 1000.0
+            stream_total_histogram.observe(total_ms)
+            yield _sse_event('done', {
+                'user_message_id': user_msg_result.data[0]['id'],
+                'ai_message_id': ai_msg_result.data[0]['id'],
+                'ttft_ms': round(ttft_ms, 1) if ttft_ms is not None else None,
+                'total_ms': round(total_ms, 1),
+                'processing_results': _get_client_processing_results(processing_results, user_message)
+            })
+            
+        except Exception as e:
+            yield _sse_event('error', {'error': f'Failed to process message: {str(e)}'})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _get_user_preferences(user: dict) -> dict:
+    """Get user preferences for personalization"""
+    return {
+        'user_id': user['id'],
+        'name': user.get('name'),
+        'morning_preference': user.get('morning_preference'),
+        'life_genre': user.get('life_genre'),
+        'weekly_goal': user.get('weekly_goal'),
+        'favorite_app': user.get('favorite_app')
+    }
+
+def _build_user_message_data(session_id: str, user_id: str, user_message: str, processing_results: dict) -> dict:
+    """Build the user message row (uses processed_message if PII was scrubbed)"""
+    return {
+        'session_id': session_id,
+        'user_id': user_id,
+        'message_type': 'user',
+        'content': processing_results.get('processed_message', user_message),
+        'mood': processing_results.get('mood_analysis', {}).get('mood', 'neutral'),
+        'response_type': 'normal',
+        'context_data': {
+            'mood_analysis': processing_results.get('mood_analysis'),
+            'processing_log': processing_results.get('processing_log', []),
+            'pii_scrubbed': processing_results.get('pii_scrubbed', False),
+            'original_message': user_message if processing_results.get('pii_scrubbed', False) else None
+        }
+    }
+
+def _build_ai_message_data(session_id: str, user_id: str, ai_response: dict, processing_results: dict) -> dict:
+    """Build the AI response row"""
+    return {
+        'session_id': session_id,
+        'user_id': user_id,
+        'message_type': 'ai',
+        'content': ai_response['content'],
+        'mood': ai_response.get('mood', 'neutral'),
+        'response_type': ai_response.get('response_type', 'normal'),
+        'context_data': {
+            'response_guidance': processing_results.get('response_guidance'),
+            'should_redirect': processing_results.get('should_redirect', False),
+            'redirect_suggestions': processing_results.get('redirect_suggestions', [])
+        }
+    }
+
+def _get_client_processing_results(processing_results: dict, user_message: str) -> dict:
+    """Select the processing results returned to the client"""
+    return {
+        'mood_analysis': processing_results.get('mood_analysis'),
+        'response_guidance': processing_results.get('response_guidance'),
+        'should_redirect': processing_results.get('should_redirect'),
+        'redirect_suggestions': processing_results.get('redirect_suggestions'),
+        'context_summary': processing_results.get('context_summary'),
+        'warnings': processing_results.get('warnings', []),
+        'pii_scrubbed': processing_results.get('pii_scrubbed', False),
+        'processed_message': processing_results.get('processed_message', user_message)
+    }
+
+def _get_blocked_response(processing_results: dict) -> dict:
+    """Build the error body for a message the guardrails blocked"""
+    return {
+        'error': 'Message blocked by guardrails',
+        'warnings': processing_results.get('warnings', []),
+        'risk_level': processing_results.get('risk_level'),
+        'blocked_reasons': processing_results.get('processing_log', [])
+    }
+
+def _get_response_inputs(processing_results: dict, user_preferences: dict, session_id: str) -> tuple:
+    """Get mood analysis and serializable conversation context for response generation"""
+    mood_analysis = processing_results.get('mood_analysis', {})
     
     # Get conversation context
     user_id = user_preferences.get('user_id') or processing_results.get('user_id')
@@ -351,6 +540,16 @@ def _generate_ai_response(processing_results: dict, user_preferences: dict, sess
             'user_preferences': {}
         }
     
+    return mood_analysis, serializable_context
+
+def _generate_ai_response(processing_results: dict, user_preferences: dict, session_id: str) -> dict:
+    """Generate AI response using LLM-based services"""
+    mood_analysis, serializable_context = _get_response_inputs(processing_results, user_preferences, session_id)
+    current_mood = mood_analysis.get('mood', 'neutral')
+    
+    # Get the original user message from processing results
+    user_message = processing_results.get('original_message', '')
+    
     # Generate response using LLM
     content = llm_response_generator.generate_response(
         user_message, 
@@ -423,59 +622,44 @@ def get_mood_analysis(session_id):
         if not session_result.data:
             return jsonify({'error': 'Chat session not found'}), 404
         
-        # Get messages with mood data
-        messages_result = supabase.table('chat_messages').select('mood, response_type, context_data, created_at').eq('session_id', session_id).order('created_at', desc=False).execute()
+        # Serve from the running mood stats when they cover every stored message
+        count_result = supabase.table('chat_messages').select('id', count='exact').eq('session_id', session_id).limit(1).execute()
+        message_count = count_result.count if count_result.count is not None else -1
+        mood_stats = context_manager.get_session_mood_stats(session_id, message_count)
+        
+        if mood_stats is None:
+            messages_result = supabase.table('chat_messages').select('mood').eq('session_id', session_id).order('created_at', desc=False).execute()
+            mood_stats = context_manager.seed_session_mood_stats(session_id, [msg.get('mood') for msg in messages_result.data])
         
         # Analyze mood trends
-        mood_analysis = _analyze_session_mood(messages_result.data)
+        mood_analysis = _analyze_session_mood(mood_stats)
         
         return jsonify({
             'session_id': session_id,
             'mood_analysis': mood_analysis,
-            'message_count': len(messages_result.data)
+            'message_count': mood_stats['message_count']
         }), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to get mood analysis: {str(e)}'}), 500
 
-def _analyze_session_mood(messages: list) -> dict:
-    """Analyze mood trends from session messages"""
-    if not messages:
+def _analyze_session_mood(mood_stats: dict) -> dict:
+    """Build the mood analysis from a session's running mood stats"""
+    if not mood_stats['message_count']:
         return {'trend': 'no_data', 'primary_mood': 'neutral', 'mood_changes': 0}
     
-    moods = [msg.get('mood', 'neutral') for msg in messages if msg.get('mood')]
-    
-    if not moods:
+    if not mood_stats['mood_total']:
         return {'trend': 'no_mood_data', 'primary_mood': 'neutral', 'mood_changes': 0}
     
-    # Count mood occurrences
-    mood_counts = {}
-    for mood in moods:
-        mood_counts[mood] = mood_counts.get(mood, 0) + 1
-    
-    # Find primary mood
-    primary_mood = max(mood_counts, key=mood_counts.get)
-    
-    # Count mood changes
-    mood_changes = 0
-    for i in range(1, len(moods)):
-        if moods[i] != moods[i-1]:
-            mood_changes += 1
-    
-    # Determine trend
-    if mood_counts.get('sad', 0) > len(moods) * 0.6:
-        trend = 'declining'
-    elif mood_counts.get('happy', 0) > len(moods) * 0.6:
-        trend = 'improving'
-    else:
-        trend = 'stable'
+    trend = mood_stats['trend']
+    primary_mood = mood_stats['primary_mood']
     
     return {
         'trend': trend,
         'primary_mood': primary_mood,
-        'mood_changes': mood_changes,
-        'mood_distribution': mood_counts,
-        'total_messages': len(moods),
+        'mood_changes': mood_stats['mood_changes'],
+        'mood_distribution': mood_stats['mood_counts'],
+        'total_messages': mood_stats['mood_total'],
         'recommendations': _get_mood_recommendations(trend, primary_mood)
     }
 
@@ -503,7 +687,7 @@ def _get_mood_recommendations(trend: str, primary_mood: str) -> list:
 
 @chat_bp.route('/generate-collaboration-summary', methods=['POST'])
 def generate_collaboration_summary():
-    """Generate AI collaboration summary for a chat session"""
+    """Queue AI collaboration summary generation for a chat session"""
     try:
         print("Starting collaboration summary generation...")
         
@@ -518,168 +702,153 @@ def generate_collaboration_summary():
             return jsonify({'error': 'Session ID is required'}), 400
         
         session_id = data['session_id']
+        refresh = bool(data.get('refresh', False))
         print(f"Processing session: {session_id}")
         
         # Verify session belongs to user
-        session_result = supabase.table('chat_sessions').select('*').eq('id', session_id).eq('user_id', user['id']).eq('is_active', True).execute()
+        session_result = supabase.table('chat_sessions').select('id').eq('id', session_id).eq('user_id', user['id']).eq('is_active', True).execute()
         
         if not session_result.data:
             print(f"Session not found or access denied: {session_id}")
             return jsonify({'error': 'Session not found or access denied'}), 404
         
-        session = session_result.data[0]
-        print(f"Found session: {session['title']}")
-        
-        # Get all messages for the session
-        messages_result = supabase.table('chat_messages').select('*').eq('session_id', session_id).order('created_at').execute()
-        
-        if not messages_result.data:
-            print("No messages found in session")
-            return jsonify({'error': 'No messages found in this session'}), 400
-        
-        messages = messages_result.data
-        print(f"Found {len(messages)} messages")
-        
         # Check if summary already exists
         existing_summary = supabase.table('collaboration_summaries').select('*').eq('session_id', session_id).execute()
         
-        if existing_summary.data:
+        if existing_summary.data and not refresh:
             print("Summary already exists for this session")
             return jsonify({
                 'message': 'Summary already exists for this session',
                 'summary': existing_summary.data[0]
             }), 200
         
-        # Check Gemini availability
-        if not gemini_model:
-            print("Gemini model not available - using fallback")
-            # Create a simple fallback summary
-            summary_data = {
-                'title': f"Session Summary - {session['title']}",
-                'summary': f"This is a summary of your conversation session '{session['title']}'. The session contained {len(messages)} messages and covered various topics. This summary was generated without AI assistance due to service unavailability.",
-                'key_insights': [
-                    f"Session contained {len(messages)} messages",
-                    "Conversation covered multiple topics",
-                    "User engaged actively in the session"
-                ],
-                'mood_analysis': {"patterns": "Analysis not available due to AI service unavailability"},
-                'recommendations': [
-                    "Continue engaging in supportive conversations",
-                    "Consider scheduling regular check-ins",
-                    "Monitor mood patterns over time"
-                ]
-            }
-        else:
-            print("Gemini model available, generating AI summary...")
-            
-            # Prepare conversation data for Gemini
-            conversation_text = ""
-            mood_data = []
-            
-            for msg in messages:
-                role = "User" if msg['message_type'] == 'user' else "AI Assistant"
-                conversation_text += f"{role}: {msg['content']}\n"
-                
-                if msg['mood']:
-                    mood_data.append({
-                        'message': msg['content'][:100] + "..." if len(msg['content']) > 100 else msg['content'],
-                        'mood': msg['mood'],
-                        'timestamp': msg['created_at']
-                    })
-            
-            # Create prompt for Gemini
-            prompt = f"""
-            Analyze this therapy/counseling conversation and create a comprehensive collaboration summary:
-
-            CONVERSATION:
-            {conversation_text}
-
-            MOOD DATA:
-            {mood_data}
-
-            Please provide:
-            1. A concise title for this session
-            2. A detailed summary of the conversation
-            3. Key insights about the user's emotional state and needs
-            4. Mood analysis and patterns
-            5. Recommendations for continued support
-
-            Format your response as JSON with these fields:
-            - title: string
-            - summary: string
-            - key_insights: array of strings
-            - mood_analysis: object with mood patterns and trends
-            - recommendations: array of strings
-            """
-            
-            try:
-                # Generate summary using Gemini
-                print("Calling Gemini API...")
-                response = gemini_model.generate_content(prompt)
-                print(f"Gemini response received: {len(response.text)} characters")
-                
-                try:
-                    # Parse JSON response
-                    import json
-                    summary_data = json.loads(response.text)
-                    print("Successfully parsed JSON response from Gemini")
-                except json.JSONDecodeError as e:
-                    print(f"JSON parsing failed: {e}")
-                    # Fallback if JSON parsing fails
-                    summary_data = {
-                        'title': f"Session Summary - {session['title']}",
-                        'summary': response.text,
-                        'key_insights': ["AI-generated insights from conversation"],
-                        'mood_analysis': {"patterns": "Analyzed from conversation"},
-                        'recommendations': ["Continue supportive dialogue"]
-                    }
-            except Exception as gemini_error:
-                print(f"Gemini API error: {gemini_error}")
-                # Fallback when Gemini fails
-                summary_data = {
-                    'title': f"Session Summary - {session['title']}",
-                    'summary': f"This is a summary of your conversation session '{session['title']}'. The session contained {len(messages)} messages. AI analysis was temporarily unavailable, but the conversation has been recorded for future reference.",
-                    'key_insights': [
-                        f"Session contained {len(messages)} messages",
-                        "Conversation was recorded successfully",
-                        "AI analysis temporarily unavailable"
-                    ],
-                    'mood_analysis': {"patterns": "Analysis temporarily unavailable"},
-                    'recommendations': [
-                        "Continue engaging in supportive conversations",
-                        "Session data has been preserved",
-                        "AI analysis will be available in future sessions"
-                    ]
-                }
-        
-        # Save summary to database
-        print("Saving summary to database...")
-        summary_record = {
-            'session_id': session_id,
-            'user_id': user['id'],
-            'summary_title': summary_data.get('title', f"Session Summary - {session['title']}"),
-            'summary_content': summary_data.get('summary', 'Summary content not available'),
-            'key_insights': summary_data.get('key_insights', []),
-            'mood_analysis': summary_data.get('mood_analysis', {}),
-            'recommendations': summary_data.get('recommendations', [])
-        }
+        # Only check that there is something to summarize; the worker loads the messages
+        messages_result = supabase.table('chat_messages').select('created_at', count='exact').eq('session_id', session_id).order('created_at', desc=True).limit(1).execute()
         
-        result = supabase.table('collaboration_summaries').insert(summary_record).execute()
+        if not messages_result.data:
+            print("No messages found in session")
+            return jsonify({'error': 'No messages found in this session'}), 400
         
-        if result.data:
-            print("Summary saved successfully")
+        if existing_summary.data and summary_is_current(existing_summary.data[0], messages_result.data[0]['created_at'], messages_result.count or 0):
+            print("Summary is already up to date")
             return jsonify({
-                'message': 'Collaboration summary generated successfully',
-                'summary': result.data[0]
+                'message': 'Summary is already up to date',
+                'summary': existing_summary.data[0]
             }), 200
-        else:
-            print("Failed to save summary to database")
-            return jsonify({'error': 'Failed to save summary'}), 500
+        
+        job, deduplicated = summary_job_queue.submit(session_id, user['id'], refresh=bool(existing_summary.data))
+        print(f"Summary job {'reused' if deduplicated else 'queued'}: {job['id']}")
+        
+        return jsonify({
+            'message': 'Collaboration summary generation in progress' if deduplicated else 'Collaboration summary generation queued',
+            'job_id': job['id'],
+            'status': job['status'],
+            'status_url': f"/api/chat/summary-jobs/{job['id']}"
+        }), 202
             
     except Exception as e:
         print(f"Unexpected error in collaboration summary generation: {str(e)}")
         return jsonify({'error': f'Failed to generate summary: {str(e)}'}), 500
 
+@chat_bp.route('/summary-jobs/<job_id>', methods=['GET'])
+def get_summary_job(job_id):
+    """Get the status of a collaboration summary job, with the summary once it is ready"""
+    try:
+        user, error_response, status_code = require_auth()
+        if error_response:
+            return error_response, status_code
+        
+        job = summary_job_queue.get_job(job_id, user['id'])
+        if not job:
+            return jsonify({'error': 'Summary job not found'}), 404
+        
+        response_data = {
+            'job_id': job['id'],
+            'session_id': job['session_id'],
+            'status': job['status'],
+            'created_at': job.get('created_at'),
+            'completed_at': job.get('completed_at')
+        }
+        
+        if job['status'] == 'completed' and job.get('summary_id'):
+            summary_result = supabase.table('collaboration_summaries').select('*').eq('id', job['summary_id']).execute()
+            if summary_result.data:
+                response_data['summary'] = summary_result.data[0]
+        elif job['status'] == 'failed':
+            response_data['error'] = job.get('error') or 'Summary generation failed'
+        
+        return jsonify(response_data), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get summary job: {str(e)}'}), 500
+
+def _generate_summary_for_job(job: dict) -> dict:
+    """
+    Build and save the collaboration summary for a queued job
+    
+    Runs on a summary worker thread, outside any request. Only message chunks added
+    since the last run are summarized before the reduce step.
+    
+    Args:
+        job (dict): Job row with session_id, user_id and refresh
+        
+    Returns:
+        dict: Saved collaboration summary row
+    """
+    session_id = job['session_id']
+    
+    session_result = supabase.table('chat_sessions').select('*').eq('id', session_id).eq('user_id', job['user_id']).execute()
+    if not session_result.data:
+        raise ValueError('Session not found')
+    session = session_result.data[0]
+    
+    # The summary may have been saved by an earlier attempt of this job
+    existing_summary = supabase.table('collaboration_summaries').select('*').eq('session_id', session_id).execute()
+    if existing_summary.data and not job.get('refresh'):
+        return existing_summary.data[0]
+    
+    summary_data, progress = summary_chunker.build_summary(session)
+    print(f"Summarized {progress['message_count']} messages in {progress['chunk_count']} chunks for session {session_id}")
+    
+    # Save summary to database
+    print("Saving summary to database...")
+    summary_record = {
+        'session_id': session_id,
+        'user_id': job['user_id'],
+        'summary_title': summary_data.get('title', f"Session Summary - {session['title']}"),
+        'summary_content': summary_data.get('summary', 'Summary content not available'),
+        'key_insights': summary_data.get('key_insights', []),
+        'mood_analysis': summary_data.get('mood_analysis', {}),
+        'recommendations': summary_data.get('recommendations', []),
+        'chunk_count': progress['chunk_count'],
+        'message_count': progress['message_count'],
+        'summarized_through': progress['summarized_through']
+    }
+    
+    if existing_summary.data:
+        summary_record['generated_at'] = datetime.now().isoformat()
+        result = supabase.table('collaboration_summaries').update(summary_record).eq('id', existing_summary.data[0]['id']).execute()
+    else:
+        result = supabase.table('collaboration_summaries').insert(summary_record).execute()
+    
+    if not result.data:
+        raise RuntimeError('Failed to save summary')
+    
+    print("Summary saved successfully")
+    return result.data[0]
+
+summary_job_queue.register_handler(_generate_summary_for_job)
+
+# Only what a conversation context needs, with the mood analysis pulled out of context_data
+CONTEXT_HYDRATION_COLUMNS = 'message_type, content, mood, created_at, mood_analysis:context_data->mood_analysis'
+
+def _load_context_messages(session_id: str, limit: int) -> list:
+    """Load a session's last user messages, oldest first, to rebuild its conversation context"""
+    result = supabase.table('chat_messages').select(CONTEXT_HYDRATION_COLUMNS).eq('session_id', session_id).eq('message_type', 'user').order('created_at', desc=True).limit(limit).execute()
+    return list(reversed(result.data or []))
+
+context_manager.register_hydrator(_load_context_messages)
+
 @chat_bp.route('/collaboration-summaries', methods=['GET'])
 def get_collaboration_summaries():
     """Get all collaboration summaries for the authenticated user"""
@@ -903,17 +1072,25 @@ def check_ai_service_health():
             return error_response, status_code
         
         health_status = {
-            'gemini_available': gemini_model is not None,
-            'gemini_api_key_configured': GEMINI_API_KEY is not None,
+            'gemini_available': llm_gateway.available,
+            'gemini_api_key_configured': llm_gateway.api_key is not None,
+            'circuit_breaker': llm_gateway.breaker.get_state(),
+            'summary_jobs': summary_job_queue.get_stats(),
+            'summary_chunks': summary_chunker.get_stats(),
+            'context_store': context_manager.get_stats(),
+            'streaming': {
+                'ttft_ms': stream_ttft_histogram.snapshot(),
+                'total_ms': stream_total_histogram.snapshot()
+            },
             'timestamp': datetime.now().isoformat()
         }
         
-        if gemini_model:
+        if llm_gateway.available:
             try:
                 # Test Gemini with a simple request
-                test_response = gemini_model.generate_content("Hello, this is a test. Please respond with 'OK'.")
+                test_response = llm_gateway.generate_text("Hello, this is a test. Please respond with 'OK'.", SUMMARY_MODEL)
                 health_status['gemini_test_successful'] = True
-                health_status['gemini_response_length'] = len(test_response.text)
+                health_status['gemini_response_length'] = len(test_response)
             except Exception as e:
                 health_status['gemini_test_successful'] = False
                 health_status['gemini_error'] = str(e)
@@ -1,26 +1,20 @@
 from flask import Blueprint, request, jsonify
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.guardrails import guardrails_service
+from utils.llm_gateway import llm_gateway
+from utils.llm_response_generator import llm_response_generator
 
 # Load environment variables
 load_dotenv()
 
 gemini_bp = Blueprint('gemini', __name__)
 
-# Configure Gemini
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+# Gemini is configured once by the shared gateway
 GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
 
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel(GEMINI_MODEL)
-else:
-    model = None
-
 @gemini_bp.route('/chat', methods=['POST'])
 def chat_with_gemini():
     try:
@@ -32,9 +26,12 @@ def chat_with_gemini():
         user_message = data['message']
         user_id = data.get('user_id')  # Optional user ID for logging
         
-        if not model:
+        if not llm_gateway.configured:
             return jsonify({'error': 'Gemini API not configured'}), 500
         
+        if not llm_gateway.available:
+            return jsonify({'error': 'Gemini is temporarily unavailable, please retry shortly'}), 503
+        
         # Apply guardrails to user message
         guardrails_result = guardrails_service.process_message(user_message, user_id)
         
@@ -51,11 +48,11 @@ def chat_with_gemini():
         processed_message = guardrails_result['processed_message']
         
         # Generate response using Gemini with processed message
-        response = model.generate_content(processed_message)
+        response_text = llm_gateway.generate_text(processed_message, GEMINI_MODEL)
         
         # Prepare response with guardrails info
         response_data = {
-            'response': response.text,
+            'response': response_text,
             'model': GEMINI_MODEL,
             'guardrails_applied': {
                 'pii_detected': guardrails_result['pii_detected'],
@@ -94,7 +91,12 @@ def gemini_health():
     return jsonify({
         'status': 'healthy',
         'model': GEMINI_MODEL,
-        'configured': model is not None,
+        'configured': llm_gateway.configured,
+        'available': llm_gateway.available,
+        'circuit_breaker': llm_gateway.breaker.get_state(),
         'guardrails_enabled': True,
-        'guardrails_config': guardrails_service.get_config()
+        'guardrails_config': guardrails_service.get_config(),
+        'guardrails_stats': guardrails_service.get_stats(),
+        'llm_gateway': llm_gateway.get_stats(),
+        'response_generator': llm_response_generator.get_stats()
     })
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Test Circuit Breaker
+Checks tripping on errors and slow calls, fast rejection and half-open recovery
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.circuit_breaker import CircuitBreaker
+
+def test_breaker_transitions():
+    """Errors open the circuit, a failed probe re-opens it and a healthy probe closes it"""
+    breaker = CircuitBreaker('test', min_calls=4, error_rate_threshold=0.5, cooldown_seconds=0.2)
+
+    print("🔍 Testing Circuit Breaker")
+    print("=" * 60)
+
+    for failed in (False, True, False, True):
+        assert breaker.allow_request()
+        breaker.record(50.0, failed)
+    print(f"After 2/4 failures: {breaker.get_state()['state']}")
+    assert breaker.get_state()['state'] == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    time.sleep(0.25)
+    assert breaker.allow_request(), "Cooldown elapsed, probe should be allowed"
+    assert not breaker.allow_request(), "Only one probe at a time"
+    breaker.record(50.0, True)
+    print(f"After failed probe: {breaker.get_state()['state']}")
+    assert breaker.get_state()['state'] == CircuitBreaker.OPEN
+
+    time.sleep(0.25)
+    assert breaker.allow_request()
+    breaker.record(50.0, False)
+    print(f"After healthy probe: {breaker.get_state()['state']}")
+    assert breaker.get_state()['state'] == CircuitBreaker.CLOSED
+
+def test_slow_calls_trip():
+    """A dependency that answers too slowly is treated as unhealthy"""
+    breaker = CircuitBreaker('test', min_calls=3, slow_call_ms=100.0, slow_rate_threshold=0.6)
+    for latency_ms in (500.0, 20.0, 800.0):
+        breaker.record(latency_ms, False)
+    state = breaker.get_state()
+    print(f"Slow calls: {state}")
+    assert state['state'] == CircuitBreaker.OPEN
+
+if __name__ == "__main__":
+    test_breaker_transitions()
+    test_slow_calls_trip()
+    print("\n✅ Circuit breaker tests passed")
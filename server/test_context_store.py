@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Test Context Store
+Checks LRU and byte caps, heap-driven idle expiry, heap compaction and single-flight hydration in the in-process store,
+and the idle-expiry sweeper of the SQLite store
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.context_store import MemoryContextStore, SQLiteContextStore
+from utils.conversation_context import ConversationContextManager
+
+def _message(text):
+    return {'content': text, 'message_type': 'user', 'timestamp': '2025-01-01T00:00:00'}
+
+def test_lru_caps():
+    """The least recently used session goes first when either cap is exceeded"""
+    store = MemoryContextStore(max_entries=3, sweep_interval_seconds=0)
+
+    print("🔍 Testing Context Store")
+    print("=" * 60)
+
+    for session_id in ('a', 'b', 'c'):
+        store.get_or_create('user', session_id)
+    store.get('a')
+    store.get_or_create('user', 'd')
+    print(f"After 4 sessions with cap 3: {list(store.contexts)}")
+    assert store.get('b') is None
+    assert store.get('a') is not None
+
+    small = MemoryContextStore(max_bytes=2000, sweep_interval_seconds=0)
+    small.get_or_create('user', 'x')
+    small.get_or_create('user', 'y')
+    for i in range(10):
+        small.append('y', _message('hello ' * 20), {'mood': 'sad', 'confidence': 0.9}, 15, 10)
+    stats = small.get_stats()
+    print(f"Byte cap: {stats['bytes']} bytes, {stats['evictions']} evictions")
+    assert small.get('x') is None and small.get('y') is not None
+    assert len(small.get('y')['conversation_history']) == 10
+
+def test_idle_expiry():
+    """Only sessions idle past the cutoff expire; touched ones are re-queued"""
+    store = MemoryContextStore(ttl_seconds=0.2, sweep_interval_seconds=0.05)
+    store.get_or_create('user', 'idle')
+    store.get_or_create('user', 'busy')
+    for _ in range(6):
+        time.sleep(0.05)
+        store.get('busy')
+    stats = store.get_stats()
+    print(f"Expiry: {stats}")
+    assert store.get('idle') is None
+    assert store.get('busy') is not None
+    assert stats['expirations'] == 1
+    assert stats['heap_entries'] <= 2
+    store.close()
+
+def test_sqlite_idle_expiry():
+    """The SQLite store sweeps idle sessions on the same schedule as the in-process store"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteContextStore(os.path.join(directory, 'contexts.db'), ttl_seconds=0.2, sweep_interval_seconds=0.05)
+        store.get_or_create('user', 'idle')
+        store.get_or_create('user', 'busy')
+        for _ in range(6):
+            time.sleep(0.05)
+            store.append('busy', _message('still here'), None, 15, 10)
+        store.close()
+        stats = store.get_stats()
+        print(f"SQLite expiry: {stats}")
+        assert store.get('idle') is None
+        assert store.get('busy') is not None
+        assert stats['expirations'] == 1 and stats['sweeps'] > 0 and stats['contexts'] == 1
+
+def test_reads_are_copies():
+    """The memory backend hands out copies of the stored object instead of serializing it"""
+    manager = ConversationContextManager(MemoryContextStore(sweep_interval_seconds=0))
+    context = manager.get_context('user', 's1')
+    for mood in ('sad', 'sad', 'happy'):
+        context = manager.update_context('s1', {'content': f'feeling {mood}', 'message_type': 'user'}, mood, 0.8)
+
+    stored = manager.store.contexts['s1']
+    assert context is not stored and context.conversation_history[0] is stored.conversation_history[0]
+
+    before = manager.get_context('user', 's1')
+    manager.update_context('s1', {'content': 'still happy', 'message_type': 'user'}, 'happy', 0.9)
+    after = manager.get_context('user', 's1')
+    print(f"Copy before append: {len(before.conversation_history)} turns, after: {len(after.conversation_history)} turns")
+    assert len(before.conversation_history) == 3 and len(after.conversation_history) == 4
+    assert before.mood_window.total == 3 and after.mood_window.total == 4
+    assert after.mood_window.counts == {'sad': 2, 'happy': 2}
+
+def test_heap_compaction():
+    """Evicted sessions do not leave the expiry heap growing without bound"""
+    store = MemoryContextStore(max_entries=100, ttl_seconds=0.2, sweep_interval_seconds=0)
+    for i in range(50000):
+        store.get_or_create('user', f'session-{i}')
+    stats = store.get_stats()
+    print(f"Heap after 50000 sessions with cap 100: {stats['heap_entries']} entries, {stats['heap_compactions']} compactions")
+    assert stats['contexts'] == 100
+    assert stats['heap_entries'] <= 3 * 100 + 64
+    assert stats['heap_compactions'] > 0
+
+    # Expiry still works on the compacted heap
+    time.sleep(0.25)
+    assert store.cleanup(time.time() - store.ttl_seconds) == 100
+    assert store.get_stats()['contexts'] == 0
+
+def test_hydration_single_flight():
+    """Concurrent misses on one session share a single bounded load of stored messages"""
+    calls = []
+
+    def load_messages(session_id, limit):
+        calls.append((session_id, limit))
+        time.sleep(0.1)
+        return [
+            {'message_type': 'user', 'content': 'I feel low', 'mood': 'sad', 'created_at': '2025-01-01T10:00:00', 'mood_analysis': {'confidence': 0.8}},
+            {'message_type': 'ai', 'content': 'I am here for you', 'mood': 'sad', 'created_at': '2025-01-01T10:00:05'},
+            {'message_type': 'user', 'content': 'Still sad', 'mood': 'sad', 'created_at': '2025-01-01T10:01:00'}
+        ]
+
+    manager = ConversationContextManager(MemoryContextStore(sweep_interval_seconds=0))
+    manager.register_hydrator(load_messages)
+    contexts = []
+    threads = [threading.Thread(target=lambda: contexts.append(manager.get_context('user', 's1'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    context = contexts[0]
+    print(f"Hydration: {len(calls)} load(s), {manager.get_stats()['hydration']}")
+    assert len(calls) == 1 and calls[0][1] == manager.hydration_limit
+    # The AI reply is not replayed; live sessions only record user turns
+    assert [entry.content for entry in context.conversation_history] == ['I feel low', 'Still sad']
+    assert [entry.mood for entry in context.mood_history] == ['sad', 'sad']
+    assert context.current_mood == 'sad' and context.should_redirect()
+
+def test_failed_hydration_not_stored():
+    """A failed load serves an empty context without storing it, so the next read retries"""
+    calls = []
+
+    def load_messages(session_id, limit):
+        calls.append(session_id)
+        if len(calls) == 1:
+            raise ConnectionError("database unavailable")
+        return [{'message_type': 'user', 'content': 'I feel low', 'mood': 'sad', 'created_at': '2025-01-01T10:00:00'}]
+
+    store = MemoryContextStore(sweep_interval_seconds=0)
+    manager = ConversationContextManager(store)
+    manager.register_hydrator(load_messages)
+
+    context = manager.get_context('user', 's1')
+    assert len(context.conversation_history) == 0
+    assert store.get_context('s1') is None
+    assert manager.get_stats()['hydration']['failed'] == 1
+
+    context = manager.get_context('user', 's1')
+    print(f"After a failed hydration: {len(calls)} load(s), {len(context.conversation_history)} message(s) on retry")
+    assert len(calls) == 2
+    assert [entry.content for entry in context.conversation_history] == ['I feel low']
+    assert store.get_context('s1') is not None
+
+if __name__ == "__main__":
+    test_lru_caps()
+    test_idle_expiry()
+    test_sqlite_idle_expiry()
+    test_reads_are_copies()
+    test_heap_compaction()
+    test_hydration_single_flight()
+    test_failed_hydration_not_stored()
+    print("\n✅ Context store tests passed")
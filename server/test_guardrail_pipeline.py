@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Test Guardrail Pipeline
+Checks per-message memoization of stage results, how plan() batches stages around terminal verdicts,
+that a terminal verdict skips costlier stages and how the concurrent executor handles stages that
+miss their timeouts
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.guardrails import (
+    AnalysisContext, ConcurrentStageExecutor, GuardrailPipeline, GuardrailStage, GuardrailsService,
+    STAGE_COST_VALIDATION, STAGE_COST_REGEX, STAGE_COST_CPU_MODEL, STAGE_COST_NETWORK
+)
+
+class RecordingStage:
+    """Stage body that records each call and returns a fixed result"""
+
+    def __init__(self, calls, name, result=None):
+        self.calls = calls
+        self.name = name
+        self.result = result if result is not None else {'stage': name}
+
+    def __call__(self, analysis):
+        self.calls.append(self.name)
+        return self.result
+
+def _stage(calls, name, cost, terminal=None, may_terminate=None, result=None):
+    return GuardrailStage(name, RecordingStage(calls, name, result), cost=cost, terminal=terminal, may_terminate=may_terminate)
+
+def test_memoized_stage_runs_once():
+    """Repeated reads of a stage on one message run it once; a new message runs it again"""
+    calls = []
+    pipeline = GuardrailPipeline([_stage(calls, 'toxicity', STAGE_COST_CPU_MODEL)])
+
+    print("🔍 Testing Guardrail Pipeline")
+    print("=" * 60)
+
+    analysis = AnalysisContext('hello there')
+    notified = []
+    analysis.add_listener(lambda name, result: notified.append(name))
+    results = [pipeline.run_stage(analysis, 'toxicity') for _ in range(3)]
+    report = analysis.to_report()
+    print(f"Three reads: calls {calls}, report {report['executed_stages']} / {report['memoized_stages']}")
+    assert calls == ['toxicity']
+    assert results[0] is results[1] is results[2]
+    assert report['executed_stages'] == ['toxicity'] and report['memoized_stages'] == ['toxicity', 'toxicity']
+    assert notified == ['toxicity']
+
+    pipeline.run_stage(AnalysisContext('hello there'), 'toxicity')
+    assert calls == ['toxicity', 'toxicity']
+
+    # A result recorded from outside the pipeline is served without running the stage
+    analysis = AnalysisContext('hello again')
+    assert analysis.set_result('toxicity', {'stage': 'fused'})
+    assert not analysis.set_result('toxicity', {'stage': 'late'})
+    assert pipeline.run_stage(analysis, 'toxicity') == {'stage': 'fused'}
+    assert calls == ['toxicity', 'toxicity']
+
+def test_plan_batches():
+    """Stages run cheapest first, and a stage that may terminate closes its batch at its cost tier"""
+    calls = []
+    validation_enabled = [True]
+    pipeline = GuardrailPipeline([
+        _stage(calls, 'validation', STAGE_COST_VALIDATION, terminal=lambda analysis: None, may_terminate=lambda: validation_enabled[0]),
+        _stage(calls, 'restricted_content', STAGE_COST_REGEX),
+        _stage(calls, 'toxicity', STAGE_COST_CPU_MODEL),
+        _stage(calls, 'pii', STAGE_COST_CPU_MODEL, terminal=lambda analysis: None),
+        _stage(calls, 'mood', STAGE_COST_NETWORK)
+    ])
+    names = ['mood', 'pii', 'toxicity', 'restricted_content', 'validation']
+
+    batches = pipeline.plan(names)
+    print(f"Plan: {batches}")
+    assert batches == [['validation'], ['restricted_content', 'pii', 'toxicity'], ['mood']]
+
+    # A stage that cannot terminate under the current config does not split the plan
+    validation_enabled[0] = False
+    assert pipeline.plan(names) == [['validation', 'restricted_content', 'pii', 'toxicity'], ['mood']]
+
+    # Tuned costs reorder stages; here pii becomes the costliest and closes nothing after it
+    overrides = {'pii': STAGE_COST_NETWORK + 1}
+    assert pipeline.plan(names, overrides) == [['validation', 'restricted_content', 'toxicity', 'mood', 'pii']]
+    assert calls == []
+
+def test_terminal_verdict_skips_costlier_stages():
+    """A terminal verdict stops every later batch; stages already batched with it still run"""
+    calls = []
+    verdicts = {'validation': None, 'pii': None}
+    pipeline = GuardrailPipeline([
+        _stage(calls, 'validation', STAGE_COST_VALIDATION, terminal=lambda analysis: verdicts['validation']),
+        _stage(calls, 'restricted_content', STAGE_COST_REGEX),
+        _stage(calls, 'toxicity', STAGE_COST_CPU_MODEL),
+        _stage(calls, 'pii', STAGE_COST_CPU_MODEL, terminal=lambda analysis: verdicts['pii']),
+        _stage(calls, 'mood', STAGE_COST_NETWORK)
+    ])
+    service = GuardrailsService()
+    service.pipeline = pipeline
+    service.executor = ConcurrentStageExecutor(pipeline)
+    names = ['mood', 'pii', 'toxicity', 'restricted_content', 'validation']
+
+    verdicts['validation'] = 'Message too long'
+    schedule = service.run_scheduled_stages(AnalysisContext('x' * 3000), names)
+    print(f"Validation verdict: ran {calls}, skipped {schedule['skipped_stages']}")
+    assert calls == ['validation']
+    assert schedule['terminal_stage'] == 'validation' and schedule['terminal_reason'] == 'Message too long'
+    assert sorted(schedule['skipped_stages']) == ['mood', 'pii', 'restricted_content', 'toxicity']
+
+    verdicts['validation'] = None
+    verdicts['pii'] = 'PII with scrubbing disabled'
+    calls.clear()
+    schedule = service.run_scheduled_stages(AnalysisContext('my number is 555-0100'), names)
+    print(f"PII verdict: ran {sorted(calls)}, skipped {schedule['skipped_stages']}")
+    assert sorted(calls) == ['pii', 'restricted_content', 'toxicity', 'validation']
+    assert schedule['terminal_stage'] == 'pii' and schedule['skipped_stages'] == ['mood']
+
+    # Without early exit every stage runs despite the verdict
+    calls.clear()
+    schedule = service.run_scheduled_stages(AnalysisContext('my number is 555-0100'), names, early_exit=False)
+    assert sorted(calls) == sorted(names) and schedule['skipped_stages'] == []
+
+class SlowStage(RecordingStage):
+    """Stage body that sleeps before returning"""
+
+    def __init__(self, calls, name, delay):
+        super().__init__(calls, name)
+        self.delay = delay
+
+    def __call__(self, analysis):
+        time.sleep(self.delay)
+        return super().__call__(analysis)
+
+def test_stage_timeouts():
+    """A stage past its own timeout is cut off while the others finish; only stages with a fallback get one"""
+    calls = []
+    pipeline = GuardrailPipeline([
+        _stage(calls, 'restricted_content', STAGE_COST_REGEX),
+        GuardrailStage('toxicity', SlowStage(calls, 'toxicity', 1.0), cost=STAGE_COST_CPU_MODEL),
+        GuardrailStage('mood', SlowStage(calls, 'mood', 1.0), cost=STAGE_COST_NETWORK)
+    ])
+    executor = ConcurrentStageExecutor(pipeline)
+    analysis = AnalysisContext('slow message')
+    notified = []
+    analysis.add_listener(lambda name, result: notified.append(name))
+
+    started = time.perf_counter()
+    statuses = executor.run(
+        analysis, ['restricted_content', 'toxicity', 'mood'],
+        deadline_seconds=5.0,
+        stage_timeouts={'toxicity': 0.1, 'mood': 0.2},
+        fallbacks={'mood': lambda: {'mood': 'neutral'}}
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Stage timeouts: {statuses} in {elapsed * 1000:.0f}ms, abandoned {executor.get_stats()['abandoned_stage_calls']}")
+    assert statuses == {'restricted_content': 'ok', 'toxicity': 'timeout', 'mood': 'timeout'}
+    assert elapsed < 0.5
+    assert analysis.timed_out_stages == ['toxicity', 'mood']
+    assert executor.get_stats()['abandoned_stage_calls'] == 2
+
+    # The mood fallback is recorded and announced like a computed result; toxicity has none
+    assert not analysis.has_result('toxicity')
+    assert analysis.stage_results['mood'] == {'mood': 'neutral'}
+    assert sorted(analysis.executed_stages) == ['mood', 'restricted_content']
+    assert sorted(notified) == ['mood', 'restricted_content']
+
+    # Stages finishing late release their threads without replacing the fallback
+    time.sleep(1.0)
+    assert executor.get_stats()['abandoned_stage_calls'] == 0
+    assert pipeline.run_stage(analysis, 'mood') == {'mood': 'neutral'}
+
+def test_overall_deadline():
+    """The whole fan-out stops at the deadline even when per-stage timeouts are longer"""
+    calls = []
+    pipeline = GuardrailPipeline([
+        GuardrailStage('toxicity', SlowStage(calls, 'toxicity', 0.5)),
+        GuardrailStage('pii', SlowStage(calls, 'pii', 0.5))
+    ])
+    analysis = AnalysisContext('slow message')
+
+    started = time.perf_counter()
+    statuses = ConcurrentStageExecutor(pipeline).run(
+        analysis, ['toxicity', 'pii'],
+        deadline_seconds=0.1,
+        stage_timeouts={'toxicity': 5.0, 'pii': 5.0},
+        fallbacks={}
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Overall deadline: {statuses} in {elapsed * 1000:.0f}ms")
+    assert statuses == {'toxicity': 'timeout', 'pii': 'timeout'}
+    assert elapsed < 0.3
+    assert analysis.stage_results == {}
+
+if __name__ == "__main__":
+    test_memoized_stage_runs_once()
+    test_plan_batches()
+    test_terminal_verdict_skips_costlier_stages()
+    test_stage_timeouts()
+    test_overall_deadline()
+    print("\n✅ Guardrail pipeline tests passed")
@@ -10,19 +10,35 @@ from utils.guardrails import guardrails_service
 from utils.pii_guard import pii_guard
 from utils.input_guard import input_guard
 
+PII_TEST_MESSAGES = [
+    "My email is tahiya@yahoo.com and my phone is 555-123-4567",
+    "Please contact me at jane.nitin@gmail.com or call 9876543210",
+    "My SSN is 123-45-6789 and I live at Shanti Road, Andheri, Mumbai",
+    "This is a normal message without any personal information",
+    "Credit card: 4532-1234-5678-9012"
+]
+
+TOXICITY_TEST_MESSAGES = [
+    "Hello, how are you today?",
+    "This is a helpful message about security",
+    "I hate this stupid system and want to destroy it",
+    "Please help me with my computer problem",
+    "You are an idiot and I hope you fail"
+]
+
+COMPREHENSIVE_TEST_MESSAGES = [
+    "Hello, I need help with my account", 
+    "My email is aaliyaan@outlook.com and I need assistance", 
+    "This system is terrible and I hate it",
+    "I want to harm someone",
+    "Normal message without issues",
+]
+
 def test_pii_detection():
     """Test PII detection functionality"""
     print("=== Testing PII Detection ===")
     
-    test_messages = [
-        "My email is tahiya@yahoo.com and my phone is 555-123-4567",
-        "Please contact me at jane.nitin@gmail.com or call 9876543210",
-        "My SSN is 123-45-6789 and I live at Shanti Road, Andheri, Mumbai",
-        "This is a normal message without any personal information",
-        "Credit card: 4532-1234-5678-9012"
-    ]
-    
-    for i, message in enumerate(test_messages, 1):
+    for i, message in enumerate(PII_TEST_MESSAGES, 1):
         print(f"\nTest {i}: {message[:50]}...")
         
         # Test PII detection
@@ -41,15 +57,7 @@ def test_toxicity_detection():
     """Test toxicity detection functionality"""
     print("\n=== Testing Toxicity Detection ===")
     
-    test_messages = [
-        "Hello, how are you today?",
-        "This is a helpful message about security",
-        "I hate this stupid system and want to destroy it",
-        "Please help me with my computer problem",
-        "You are an idiot and I hope you fail"
-    ]
-    
-    for i, message in enumerate(test_messages, 1):
+    for i, message in enumerate(TOXICITY_TEST_MESSAGES, 1):
         print(f"\nTest {i}: {message}")
         
         toxicity_results = input_guard.detect_toxicity(message, threshold=0.7)
@@ -87,15 +95,7 @@ def test_comprehensive_guardrails():
     """Test comprehensive guardrails processing"""
     print("\n=== Testing Comprehensive Guardrails ===")
     
-    test_messages = [
-        "Hello, I need help with my account", 
-        "My email is aaliyaan@outlook.com and I need assistance", 
-        "This system is terrible and I hate it",
-        "I want to harm someone",
-        "Normal message without issues",
-    ]
-    
-    for i, message in enumerate(test_messages, 1):
+    for i, message in enumerate(COMPREHENSIVE_TEST_MESSAGES, 1):
         print(f"\nTest {i}: {message}")
         result = guardrails_service.process_message(message, f"user_{i}")
         
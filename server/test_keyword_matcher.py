@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test Keyword Matcher
+Checks whole-word restricted keyword matching and blocklist loading
+"""
+
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.keyword_matcher import KeywordMatcher
+
+RESTRICTED_TEST_CASES = [
+    ("I want to improve my skill at chess", []),
+    ("They killed the process and restarted it", ["kill"]),
+    ("KILL it with fire!", ["kill"]),
+    ("Is the drug-test mandatory?", ["drug"]),
+    ("I hate hateful comments", ["hate"]),
+    ("That was a hate speech example", ["hate", "hate speech"]),
+    ("Pharmacist, scunthorpe, assassin", []),
+]
+
+def test_whole_word_matching():
+    """Keywords only match whole words and report their base form"""
+    matcher = KeywordMatcher({
+        'kill': 'kill', 'killed': 'kill',
+        'drug': 'drug',
+        'hate': 'hate', 'hateful': 'hate',
+        'hate speech': 'hate speech'
+    })
+    
+    print("🔍 Testing Whole-Word Keyword Matching")
+    print("=" * 60)
+    
+    for text, expected in RESTRICTED_TEST_CASES:
+        found = matcher.find_payloads(text)
+        status = "✅" if found == expected else "❌"
+        print(f"{status} {text!r}: {found}")
+        assert found == expected, f"Expected {expected}, got {found}"
+
+def test_blocklist_scaling():
+    """Load a large blocklist and check matching cost stays flat"""
+    print("\n🔍 Testing Blocklist Loading")
+    print("=" * 60)
+    
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as blocklist_file:
+        blocklist_file.write("# generated blocklist\n")
+        for i in range(100000):
+            blocklist_file.write(f"term{i}x\n")
+        blocklist_file.write("forbiddenword\tslur\n")
+        path = blocklist_file.name
+    
+    try:
+        matcher = KeywordMatcher()
+        started = time.perf_counter()
+        loaded = matcher.load_blocklist(path)
+        matcher.build()
+        print(f"Loaded {loaded} terms in {time.perf_counter() - started:.2f}s ({matcher.get_stats()})")
+        
+        message = "a perfectly ordinary forbiddenword message " * 20
+        started = time.perf_counter()
+        found = matcher.find_payloads(message)
+        print(f"Matched {found} in {(time.perf_counter() - started) * 1000:.2f}ms")
+        
+        assert loaded == 100001
+        assert found == ['slur']
+        assert matcher.find_payloads("term5 term12x") == ['term12x']
+    finally:
+        os.unlink(path)
+
+if __name__ == "__main__":
+    test_whole_word_matching()
+    test_blocklist_scaling()
+    print("\n✅ Keyword matcher tests passed")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test LLM Gateway
+Checks that identical concurrent requests share one upstream call while distinct or later ones do not,
+and that hung or abandoned calls release their slot with the right breaker outcome
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.llm_gateway import LLMGateway
+
+MODEL = 'test-model'
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class StubModel:
+    """Stands in for a GenerativeModel, answering slowly and counting upstream calls"""
+
+    def __init__(self, delay=0.2, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls.append(prompt)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream failed")
+        return StubResponse(f"reply to {prompt}")
+
+class StubChunk:
+    def __init__(self, text):
+        self.text = text
+
+class StubStream:
+    """Streams chunks with a pause before each one"""
+
+    def __init__(self, count, delay):
+        self.count = count
+        self.delay = delay
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for i in range(self.count):
+            await asyncio.sleep(self.delay)
+            yield StubChunk(f"chunk {i} ")
+
+class StreamingModel:
+    def __init__(self, count=50, delay=0.05):
+        self.stream = StubStream(count, delay)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        return self.stream
+
+def _gateway(model):
+    gateway = LLMGateway()
+    gateway.api_key = 'test-key'
+    gateway.models[MODEL] = model
+    return gateway
+
+def _run(gateway, coroutine):
+    return asyncio.run_coroutine_threadsafe(coroutine, gateway._ensure_loop()).result(timeout=5)
+
+def test_concurrent_identical_calls():
+    """N concurrent identical generate_async calls make one backend call"""
+    model = StubModel()
+    gateway = _gateway(model)
+
+    print("🔍 Testing LLM Gateway Single-Flight")
+    print("=" * 60)
+
+    async def burst():
+        return await asyncio.gather(*[gateway.generate_async('hello', MODEL) for _ in range(10)])
+
+    replies = _run(gateway, burst())
+    stats = gateway.get_stats()
+    print(f"10 identical calls: {len(model.calls)} backend call(s), {stats['coalesced']} coalesced")
+    assert model.calls == ['hello']
+    assert replies == ['reply to hello'] * 10
+    assert stats['coalesced'] == 9 and stats['coalesced_keys_in_flight'] == 0
+
+    # Different prompts or arguments are separate calls, and a finished call is not reused
+    async def mixed():
+        return await asyncio.gather(
+            gateway.generate_async('hello', MODEL),
+            gateway.generate_async('other', MODEL),
+            gateway.generate_async('hello', MODEL, generation_config={'temperature': 0})
+        )
+
+    _run(gateway, mixed())
+    print(f"After distinct calls: {model.calls}")
+    assert len(model.calls) == 4
+
+def test_blocking_callers_share_call():
+    """Threads using the blocking facade are coalesced the same way"""
+    model = StubModel()
+    gateway = _gateway(model)
+    replies = []
+    threads = [threading.Thread(target=lambda: replies.append(gateway.generate_text('hi', MODEL))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"8 threads: {len(model.calls)} backend call(s)")
+    assert model.calls == ['hi'] and replies == ['reply to hi'] * 8
+
+def test_failure_reaches_every_waiter():
+    """An upstream error is raised to every coalesced caller and the key is released"""
+    model = StubModel(fail=True)
+    gateway = _gateway(model)
+
+    async def burst():
+        return await asyncio.gather(*[gateway.generate_async('boom', MODEL) for _ in range(5)], return_exceptions=True)
+
+    results = _run(gateway, burst())
+    print(f"Failed call: {len(model.calls)} backend call(s), {[type(result).__name__ for result in results]}")
+    assert len(model.calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert gateway.get_stats()['coalesced_keys_in_flight'] == 0
+
+def test_hung_call_times_out_upstream():
+    """A call Gemini never answers is cut off upstream and counted against the breaker"""
+    model = StubModel(delay=10)
+    gateway = _gateway(model)
+    gateway.request_timeout = 0.1
+    gateway.max_concurrency = 1
+
+    for _ in range(2):
+        try:
+            gateway.generate_text('stuck', MODEL, timeout=1.0)
+            assert False, "Expected a timeout"
+        except asyncio.TimeoutError:
+            pass
+    stats = gateway.get_stats()
+    print(f"Hung calls: {stats['upstream_timeouts']} upstream timeouts, {stats['errors']} errors, in flight {stats['in_flight']}")
+    # The second call only ran because the first gave its semaphore slot back
+    assert len(model.calls) == 2
+    assert stats['upstream_timeouts'] == 2 and stats['errors'] == 2 and stats['in_flight'] == 0
+    assert stats['circuit_breaker']['calls_in_window'] == 2
+
+def test_abandoned_stream_is_not_a_failure():
+    """A stream the client walks away from is neither a success nor a failure for the breaker"""
+    gateway = _gateway(StreamingModel())
+    stream = gateway.stream_text('story', MODEL)
+    assert next(stream) == 'chunk 0 '
+    stream.close()
+    time.sleep(0.2)
+    stats = gateway.get_stats()
+    print(f"Abandoned stream: cancelled {stats['cancelled']}, errors {stats['errors']}, in flight {stats['in_flight']}")
+    assert stats['cancelled'] == 1 and stats['errors'] == 0 and stats['in_flight'] == 0
+    assert stats['circuit_breaker']['calls_in_window'] == 0
+
+if __name__ == "__main__":
+    test_concurrent_identical_calls()
+    test_blocking_callers_share_call()
+    test_failure_reaches_every_waiter()
+    test_hung_call_times_out_upstream()
+    test_abandoned_stream_is_not_a_failure()
+    print("\n✅ LLM gateway tests passed")
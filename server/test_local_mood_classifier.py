@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Test Local Mood Classifier
+Checks the lexicon moods, the confidence gate and crisis handling
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.local_mood_classifier import LocalMoodClassifier
+
+# (message, expected mood, expected to skip the LLM)
+MOOD_TEST_CASES = [
+    ("I'm so happy today!", 'happy', True),
+    ("hello", 'neutral', True),
+    ("How does photosynthesis work?", 'curious', True),
+    ("I feel so sad and lonely", 'sad', False),
+    ("I'm really stressed, can you help me", 'supportive', True),
+    ("I'm not happy", 'sad', False),
+    ("The meeting moved to Thursday afternoon", 'neutral', False),
+    ("I want to kill myself", 'sad', False),
+]
+
+def test_local_moods():
+    """Short unambiguous messages are classified locally; sensitive ones go to the LLM"""
+    classifier = LocalMoodClassifier()
+    
+    print("🔍 Testing Local Mood Classifier")
+    print("=" * 60)
+    
+    for text, expected_mood, expected_confident in MOOD_TEST_CASES:
+        result = classifier.classify(text)
+        confident = classifier.is_confident(text, result)
+        ok = result['mood'] == expected_mood and confident == expected_confident
+        status = "✅" if ok else "❌"
+        print(f"{status} {text!r}: {result['mood']} ({result['confidence']}, skip LLM={confident})")
+        assert ok, f"Expected {expected_mood}/{expected_confident}, got {result['mood']}/{confident}"
+    
+    crisis = classifier.classify("I want to kill myself")
+    assert crisis['sensitivity_level'] == 'high' and crisis['support_needed']
+
+if __name__ == "__main__":
+    test_local_moods()
+    print("\n✅ Local mood classifier tests passed")
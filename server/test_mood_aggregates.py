@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test Mood Aggregates
+Checks the running mood window and session stats against recounting the full history
+"""
+
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.conversation_context import ConversationContext, ConversationContextManager, MOOD_TREND_WINDOW
+from utils.context_store import MemoryContextStore
+
+MOODS = ['happy', 'sad', 'neutral', 'anxious']
+
+def _changes(moods):
+    return sum(1 for i in range(1, len(moods)) if moods[i] != moods[i - 1])
+
+def test_trend_window():
+    """The sliding window matches a recount of the last moods after every event"""
+    print("🔍 Testing Mood Aggregates")
+    print("=" * 60)
+
+    rng = random.Random(7)
+    context = ConversationContext('user', 'session')
+    moods = []
+    for _ in range(200):
+        mood = rng.choice(MOODS[:2] if rng.random() < 0.5 else MOODS)
+        context.update_mood(mood, 0.8)
+        moods.append(mood)
+        window = moods[-MOOD_TREND_WINDOW:]
+        assert context.mood_window.total == len(window)
+        assert context.mood_window.counts == {m: window.count(m) for m in set(window)}
+        assert context.mood_window.transitions == _changes(window)
+
+    # A stored context restores the window from its last moods without replaying the whole history
+    for data in (context.to_dict(), context.to_dict(iso_timestamps=False)):
+        restored = ConversationContext.from_dict(data)
+        assert len(restored.mood_history) == len(context.mood_history)
+        assert restored.mood_window.counts == context.mood_window.counts
+        assert restored.mood_window.transitions == context.mood_window.transitions
+        assert restored.mood_window.last == context.mood_window.last
+        assert restored.get_mood_trend() == context.get_mood_trend()
+    print(f"Trend after 200 events: {context.get_mood_trend()}")
+
+def test_session_stats():
+    """Session stats seed, update incrementally and go stale when messages are missed"""
+    manager = ConversationContextManager(MemoryContextStore(sweep_interval_seconds=0))
+    assert manager.get_session_mood_stats('s1', 0) is None
+
+    stored = ['sad', 'sad', None, 'happy']
+    manager.seed_session_mood_stats('s1', stored)
+    manager.record_stored_messages('s1', ['sad', 'sad'])
+    stored += ['sad', 'sad']
+
+    stats = manager.get_session_mood_stats('s1', len(stored))
+    print(f"Session stats: {stats}")
+    assert stats['mood_counts'] == {'sad': 4, 'happy': 1}
+    assert stats['mood_changes'] == _changes([m for m in stored if m])
+    assert stats['primary_mood'] == 'sad' and stats['trend'] == 'declining'
+
+    # Another worker stored a message this process did not see
+    assert manager.get_session_mood_stats('s1', len(stored) + 1) is None
+
+if __name__ == "__main__":
+    test_trend_window()
+    test_session_stats()
+    print("\n✅ Mood aggregate tests passed")
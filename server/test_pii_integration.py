@@ -11,52 +11,52 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from utils.guardrails import guardrails_service
 from utils.pii_guard import pii_guard
 
+# Test cases with different types of PII
+PII_TEST_CASES = [
+    {
+        "name": "Email Address",
+        "input": "My email is john@example.com and I need help",
+        "expected_pii": ["EMAIL"]
+    },
+    {
+        "name": "Phone Number",
+        "input": "Call me at 555-123-4567 for more information",
+        "expected_pii": ["PHONE"]
+    },
+    {
+        "name": "Social Security Number",
+        "input": "My SSN is 123-45-6789 for verification",
+        "expected_pii": ["SSN"]
+    },
+    {
+        "name": "Credit Card",
+        "input": "My credit card number is 4532-1234-5678-9012",
+        "expected_pii": ["CREDIT_CARD"]
+    },
+    {
+        "name": "IP Address",
+        "input": "The server IP is 192.168.1.1",
+        "expected_pii": ["IP_ADDRESS"]
+    },
+    {
+        "name": "Multiple PII Types",
+        "input": "Contact john@example.com at 555-123-4567, SSN: 123-45-6789",
+        "expected_pii": ["EMAIL", "PHONE", "SSN"]
+    },
+    {
+        "name": "No PII",
+        "input": "Hello, how are you today?",
+        "expected_pii": []
+    }
+]
+
 def test_pii_detection_and_scrubbing():
     """Test PII detection and scrubbing functionality"""
     
     print("🔍 Testing PII Detection and Scrubbing Integration")
     print("=" * 60)
     
-    # Test cases with different types of PII
-    test_cases = [
-        {
-            "name": "Email Address",
-            "input": "My email is john@example.com and I need help",
-            "expected_pii": ["EMAIL"]
-        },
-        {
-            "name": "Phone Number",
-            "input": "Call me at 555-123-4567 for more information",
-            "expected_pii": ["PHONE"]
-        },
-        {
-            "name": "Social Security Number",
-            "input": "My SSN is 123-45-6789 for verification",
-            "expected_pii": ["SSN"]
-        },
-        {
-            "name": "Credit Card",
-            "input": "My credit card number is 4532-1234-5678-9012",
-            "expected_pii": ["CREDIT_CARD"]
-        },
-        {
-            "name": "IP Address",
-            "input": "The server IP is 192.168.1.1",
-            "expected_pii": ["IP_ADDRESS"]
-        },
-        {
-            "name": "Multiple PII Types",
-            "input": "Contact john@example.com at 555-123-4567, SSN: 123-45-6789",
-            "expected_pii": ["EMAIL", "PHONE", "SSN"]
-        },
-        {
-            "name": "No PII",
-            "input": "Hello, how are you today?",
-            "expected_pii": []
-        }
-    ]
-    
-    for i, test_case in enumerate(test_cases, 1):
+    for i, test_case in enumerate(PII_TEST_CASES, 1):
         print(f"\n📝 Test {i}: {test_case['name']}")
         print(f"Input: {test_case['input']}")
         
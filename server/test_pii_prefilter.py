@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test PII Prefilter Recall
+Checks that skipping the Presidio NLP pass never drops PII the full pass finds
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.pii_guard import pii_guard
+from test_pii_integration import PII_TEST_CASES
+from test_guardrails import PII_TEST_MESSAGES
+
+CLEAN_TEST_MESSAGES = [
+    "hello, how are you today?",
+    "I feel a bit stressed about my exams",
+    "Can you explain what phishing is?",
+    "thanks, that really helped me understand passwords better"
+]
+
+# Names with no other PII signal, opening the message
+NAME_TEST_MESSAGES = [
+    "Priya is my friend",
+    "John said hi"
+]
+
+def entity_types(text, prefilter_enabled):
+    """Run detection with the prefilter switched on or off"""
+    pii_guard.prefilter_enabled = prefilter_enabled
+    try:
+        return sorted(pii_guard.analyze(text).entity_types)
+    finally:
+        pii_guard.prefilter_enabled = True
+
+def test_prefilter_recall():
+    """Compare prefiltered detection against the full Presidio pass"""
+    
+    print("🔍 Testing PII Prefilter Recall")
+    print("=" * 60)
+    
+    messages = [case["input"] for case in PII_TEST_CASES] + PII_TEST_MESSAGES + NAME_TEST_MESSAGES + CLEAN_TEST_MESSAGES
+    positives = 0
+    recalled = 0
+    skipped = 0
+    
+    for i, message in enumerate(messages, 1):
+        prefilter = pii_guard.prefilter(message)
+        full_types = entity_types(message, prefilter_enabled=False)
+        filtered_types = entity_types(message, prefilter_enabled=True)
+        
+        if not prefilter["needs_ner"]:
+            skipped += 1
+        if full_types:
+            positives += 1
+            if filtered_types == full_types:
+                recalled += 1
+        
+        status = "✅" if filtered_types == full_types else "❌"
+        print(f"{status} Test {i}: {message[:50]}")
+        print(f"   Signals: {prefilter['signals']}, NER: {prefilter['needs_ner']}")
+        print(f"   Full pass: {full_types}, Prefiltered: {filtered_types}")
+    
+    recall = recalled / positives if positives else 1.0
+    print(f"\nRecall vs full pass: {recall:.2%} ({recalled}/{positives})")
+    print(f"Messages skipping NER: {skipped}/{len(messages)}")
+    print(f"Prefilter stats: {pii_guard.get_prefilter_stats()}")
+    
+    assert recall == 1.0, "Prefilter dropped PII found by the full pass"
+
+def test_sentence_initial_names():
+    """A name opening a sentence still sends the message to NER; common opening words do not"""
+    for message in NAME_TEST_MESSAGES + ["it was fine. Maria called me later"]:
+        prefilter = pii_guard.prefilter(message)
+        print(f"{message}: {prefilter['signals']}")
+        assert prefilter["needs_ner"] and "capitalized_token" in prefilter["signals"]
+
+    openers = ["Thanks, that helps", "I'm not sure. What should I do?", "Can you explain it again?"]
+    for message in openers:
+        assert "capitalized_token" not in pii_guard.prefilter(message)["signals"], message
+
+if __name__ == "__main__":
+    test_prefilter_recall()
+    test_sentence_initial_names()
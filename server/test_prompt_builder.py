@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test Prompt Builder
+Checks that conversation history is trimmed to the token budget, packed newest first and listed oldest first
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.prompt_builder import PromptBuilder, estimate_tokens
+
+def _turns(count):
+    return [
+        {'message_type': 'user' if i % 2 == 0 else 'ai', 'content': f'turn {i:02d} ' + 'word ' * 10}
+        for i in range(count)
+    ]
+
+def _turn_numbers(block):
+    return [int(line.split('turn ')[1][:2]) for line in block.splitlines() if 'turn ' in line]
+
+def test_budget_trimming():
+    """Older turns are dropped first and the packed block stays within the budget"""
+    builder = PromptBuilder(context_token_budget=80, max_turn_chars=300)
+
+    print("🔍 Testing Prompt Builder")
+    print("=" * 60)
+
+    context = {'conversation_history': _turns(20), 'mood_history': [{'mood': 'sad'}, {'mood': 'neutral'}]}
+    block = builder.pack_context(context)
+    kept = _turn_numbers(block)
+    print(f"Budget 80 tokens: kept turns {kept}, ~{estimate_tokens(block)} tokens")
+    assert block.startswith('Mood trail: sad > neutral')
+    assert 0 < len(kept) < 20
+    assert kept == list(range(20 - len(kept), 20))
+    # Only the section header sits outside the budget
+    assert estimate_tokens(block) <= 80 + estimate_tokens('Recent turns (oldest first):')
+
+    stats = builder.get_stats()
+    assert stats['turns_packed'] == len(kept) and stats['turns_dropped'] == 20 - len(kept)
+
+    # A larger budget keeps strictly more of the newest turns
+    wider = _turn_numbers(PromptBuilder(context_token_budget=160).pack_context(context))
+    assert len(wider) > len(kept) and wider[-len(kept):] == kept
+
+def test_newest_first_packing():
+    """Turns are packed newest first and stop at the first that does not fit, keeping the history contiguous"""
+    builder = PromptBuilder(context_token_budget=40, max_turn_chars=300)
+    history = [
+        {'message_type': 'user', 'content': 'turn 00 short'},
+        {'message_type': 'ai', 'content': 'turn 01 ' + 'long ' * 25},
+        {'message_type': 'user', 'content': 'turn 02 ' + 'word ' * 4}
+    ]
+    block = builder.pack_context({}, history=history)
+    print(f"Newest first:\n{block}")
+    assert _turn_numbers(block) == [2]
+    assert block.splitlines()[0] == 'Recent turns (oldest first):'
+
+    # The current message is not repeated as history, and long turns are cut to max_turn_chars
+    builder = PromptBuilder(context_token_budget=400, max_turn_chars=20)
+    block = builder.pack_context({'conversation_history': history}, user_message='turn 02 ' + 'word ' * 4)
+    assert _turn_numbers(block) == [0, 1]
+    assert 'AI: turn 01 long long lo...' in block
+
+if __name__ == "__main__":
+    test_budget_trimming()
+    test_newest_first_packing()
+    print("\n✅ Prompt builder tests passed")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test Semantic Response Cache
+Checks hits, misses, follow-up bypass and preference re-templating across users
+"""
+
+import sys
+import os
+import zlib
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.semantic_cache import SemanticResponseCache
+
+def bag_of_words(texts):
+    """Deterministic stand-in for the sentence model: hashed word counts"""
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.replace('?', '').split():
+            vectors[row, zlib.crc32(word.encode()) % 64] += 1.0
+    return vectors
+
+MOOD = {'mood': 'happy', 'confidence': 0.9, 'sensitivity_level': 'low', 'support_needed': False}
+ASHA = {'name': 'Asha', 'life_genre': 'fantasy', 'weekly_goal': 'run 5k'}
+RAVI = {'name': 'Ravi', 'life_genre': 'mystery', 'weekly_goal': 'read two books'}
+
+def test_hits_and_misses():
+    """Similar messages in the same mood hit; other moods and other messages miss"""
+    cache = SemanticResponseCache(encoder=bag_of_words, threshold=0.9, max_entries=10)
+    cache.enabled = True
+
+    print("🔍 Testing Semantic Response Cache")
+    print("=" * 60)
+
+    cache.store('hello how are you', MOOD, 'Hi Asha, great to see you!', ASHA)
+    assert cache.lookup('hello how are you?', MOOD, ASHA) == 'Hi Asha, great to see you!'
+    assert cache.lookup('hello how are you', {**MOOD, 'mood': 'sad'}, ASHA) is None
+    assert cache.lookup('what is the weather like', MOOD, ASHA) is None
+    print(f"Stats: {cache.get_stats()}")
+
+def test_follow_ups_bypass():
+    """Turns with earlier conversation are neither stored nor answered from cache"""
+    cache = SemanticResponseCache(encoder=bag_of_words, threshold=0.9, max_entries=10)
+    cache.enabled = True
+    context = {'conversation_history': [{'content': 'I got a new puppy', 'message_type': 'user'}]}
+
+    cache.store('tell me more', MOOD, 'Puppies need lots of walks!', ASHA, context)
+    assert cache.get_stats()['stores'] == 0
+    cache.store('tell me more', MOOD, 'Happy to share more.', ASHA)
+    assert cache.lookup('tell me more', MOOD, RAVI, context) is None
+    assert cache.lookup('tell me more', MOOD, RAVI, {'conversation_history': [{'content': 'tell me more'}]}) == 'Happy to share more.'
+
+def test_retemplating_across_users():
+    """Every preference value is templated out and refilled for the next user"""
+    cache = SemanticResponseCache(encoder=bag_of_words, threshold=0.9, max_entries=10)
+    cache.enabled = True
+
+    cache.store('any ideas for today', MOOD, 'Asha, how about a Fantasy novel and a step toward your run 5k goal?', ASHA)
+    reply = cache.lookup('any ideas for today', MOOD, RAVI)
+    print(f"Re-templated for Ravi: {reply}")
+    assert reply == 'Ravi, how about a mystery novel and a step toward your read two books goal?'
+    assert 'Asha' not in reply and 'fantasy' not in reply.lower()
+
+    # A user without a weekly goal cannot be given a reply built around one
+    assert cache.lookup('any ideas for today', MOOD, {'name': 'Mei', 'life_genre': 'poetry'}) is None
+    # A missing name is dropped cleanly
+    cache.store('good morning', MOOD, 'Good morning, Asha!', ASHA)
+    assert cache.lookup('good morning', MOOD, {}) == 'Good morning!'
+
+if __name__ == "__main__":
+    test_hits_and_misses()
+    test_follow_ups_bypass()
+    test_retemplating_across_users()
+    print("\n✅ Semantic cache tests passed")
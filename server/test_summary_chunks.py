@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test Incremental Collaboration Summaries
+Checks chunking across equal timestamps, chunk reuse on refresh, reduce packing and the pending-count cap
+"""
+
+import sys
+import os
+import json
+import re
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import utils.summary_chunks as summary_chunks
+from utils.summary_chunks import SummaryChunker, summary_is_current
+
+class StubGateway:
+    """Stands in for the Gemini gateway, answering map and reduce prompts with fixed JSON"""
+
+    available = True
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate_text(self, prompt, model_name, generation_config=None):
+        self.prompts.append(prompt)
+        if 'PART SUMMARIES' in prompt:
+            return json.dumps({'title': 'Session', 'summary': 'Merged', 'key_insights': [], 'mood_analysis': {}, 'recommendations': []})
+        part = len([p for p in self.prompts if 'PART SUMMARIES' not in p])
+        return json.dumps({'summary': f'Part {part} ' + 'details ' * 20, 'key_points': [f'point {part}a', f'point {part}b']})
+
+class StubQuery:
+    """The subset of the Supabase query builder the chunker uses, over in-memory rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+        self.orders = []
+        self.payload = None
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) > value)
+        return self
+
+    def or_(self, expression):
+        match = re.fullmatch(r'created_at\.gt\."(.+)",and\(created_at\.eq\."(.+)",id\.gt\.(.+)\)', expression)
+        last_at, last_id = match.group(1), match.group(3)
+        self.filters.append(lambda row: (row['created_at'], row['id']) > (last_at, last_id))
+        return self
+
+    def order(self, column):
+        self.orders.append(column)
+        return self
+
+    def upsert(self, payload, on_conflict=None):
+        self.payload = payload
+        return self
+
+    def execute(self):
+        if self.payload is not None:
+            self.rows.append(dict(self.payload))
+            return type('Result', (), {'data': [dict(self.payload)]})
+        rows = [row for row in self.rows if all(check(row) for check in self.filters)]
+        rows.sort(key=lambda row: tuple(row[column] for column in self.orders))
+        return type('Result', (), {'data': [dict(row) for row in rows]})
+
+class StubSupabase:
+    def __init__(self):
+        self.tables = {'chat_messages': [], 'summary_chunks': []}
+
+    def table(self, name):
+        return StubQuery(self.tables[name])
+
+def _add_messages(db, start, count, created_at=None):
+    for i in range(start, start + count):
+        db.tables['chat_messages'].append({
+            'id': f'm{i:02d}',
+            'session_id': 's1',
+            'message_type': 'user' if i % 2 == 0 else 'ai',
+            'content': f'message {i}',
+            'mood': 'sad' if i < 4 else 'happy',
+            'created_at': created_at or f'2025-01-01T10:00:{i:02d}'
+        })
+
+def _chunker():
+    chunker = SummaryChunker()
+    chunker.chunk_size = 4
+    chunker.gateway = StubGateway()
+    return chunker
+
+def test_chunking_and_refresh():
+    """Full chunks are summarized once; messages sharing the boundary timestamp are not dropped"""
+    db = StubSupabase()
+    summary_chunks.supabase = db
+    chunker = _chunker()
+
+    print("🔍 Testing Summary Chunks")
+    print("=" * 60)
+
+    # m03 closes the first chunk and m04 was stored in the same instant
+    _add_messages(db, 0, 4)
+    _add_messages(db, 4, 2, created_at='2025-01-01T10:00:03')
+    summary, progress = chunker.build_summary({'id': 's1', 'title': 'Chat'})
+    print(f"First run: {progress}")
+    assert progress == {'chunk_count': 1, 'message_count': 6, 'summarized_through': '2025-01-01T10:00:03'}
+    assert summary['mood_analysis']['mood_counts'] == {'sad': 4, 'happy': 2}
+
+    # Refresh after two more messages: chunk 0 is reused and the next chunk starts at m04
+    _add_messages(db, 6, 2)
+    map_calls = len(chunker.gateway.prompts)
+    summary, progress = chunker.build_summary({'id': 's1', 'title': 'Chat'})
+    chunks = db.tables['summary_chunks']
+    print(f"Refresh: {progress}, chunk stats {chunker.get_stats()}")
+    assert progress['chunk_count'] == 2 and progress['message_count'] == 8
+    assert len(chunker.gateway.prompts) - map_calls == 2  # one map, one reduce
+    assert chunks[1]['first_message_at'] == '2025-01-01T10:00:03' and chunks[1]['last_message_id'] == 'm07'
+    assert 'message 4' in chunker.gateway.prompts[-2]
+
+    # Nothing new: the stored summary is current and a rebuild maps no chunks
+    stored = {'summarized_through': progress['summarized_through'], 'message_count': progress['message_count']}
+    assert summary_is_current(stored, '2025-01-01T10:00:07', 8)
+    assert not summary_is_current(stored, '2025-01-01T10:00:07', 9)
+    assert not summary_is_current(stored, '2025-01-01T10:00:08', 9)
+    map_calls = len(chunker.gateway.prompts)
+    chunker.build_summary({'id': 's1', 'title': 'Chat'})
+    assert len(chunker.gateway.prompts) - map_calls == 1  # reduce only
+
+def test_reduce_packing():
+    """Under a tight budget the newest chunks keep key points and the oldest drop out"""
+    db = StubSupabase()
+    summary_chunks.supabase = db
+    chunker = _chunker()
+    _add_messages(db, 0, 24)
+    chunker.summarize_new_chunks('s1')
+
+    chunker.reduce_token_budget = 120
+    chunker.build_summary({'id': 's1', 'title': 'Chat'})
+    prompt = chunker.gateway.prompts[-1]
+    parts = prompt.split('PART SUMMARIES:')[1].split('MOST RECENT MESSAGES:')[0].strip().splitlines()
+    print(f"Packed {len(parts)} of 6 parts under a 120-token budget")
+    assert 0 < len(parts) < 6
+    assert 'earliest parts omitted' in prompt
+    assert '"part":6' in parts[-1] and 'key_points' in parts[-1]
+    assert parts == sorted(parts, key=lambda line: int(re.search(r'"part":(\d+)', line).group(1)))
+
+def test_pending_counts_bounded():
+    """Per-session pending counts are kept for a bounded number of sessions"""
+    chunker = _chunker()
+    chunker.max_pending_sessions = 3
+    for i in range(5):
+        chunker.note_messages(f'session-{i}')
+    chunker.note_messages('session-2')
+    stats = chunker.get_stats()
+    print(f"Pending counts: {dict(chunker.pending_counts)}")
+    assert stats['pending_sessions'] == 3 and stats['pending_evictions'] == 2
+    assert list(chunker.pending_counts) == ['session-3', 'session-4', 'session-2']
+    assert chunker.pending_counts['session-2'] == 2
+
+if __name__ == "__main__":
+    test_chunking_and_refresh()
+    test_reduce_packing()
+    test_pending_counts_bounded()
+    print("\n✅ Summary chunk tests passed")
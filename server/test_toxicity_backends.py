@@ -0,0 +1,55 @@
+"""
+Parity test for the toxicity inference backends
+Compares int8 ONNX Runtime scores against the PyTorch Detoxify scores
+Needs the model exported first with export_toxicity_onnx.py
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.toxicity_backends import TorchToxicityBackend, OnnxToxicityBackend
+from test_guardrails import PII_TEST_MESSAGES, TOXICITY_TEST_MESSAGES, COMPREHENSIVE_TEST_MESSAGES
+
+# int8 quantization shifts scores slightly; verdicts at the default threshold must not change
+MAX_SCORE_DIFFERENCE = 0.05
+TOXICITY_THRESHOLD = 0.7
+
+def test_backend_parity():
+    """Check ONNX scores stay within tolerance of the PyTorch scores"""
+    print("=== Testing Toxicity Backend Parity ===")
+    
+    messages = TOXICITY_TEST_MESSAGES + PII_TEST_MESSAGES + COMPREHENSIVE_TEST_MESSAGES
+    
+    torch_backend = TorchToxicityBackend()
+    onnx_backend = OnnxToxicityBackend()
+    
+    torch_scores = torch_backend.predict(messages)
+    onnx_scores = onnx_backend.predict(messages)
+    
+    mismatches = []
+    worst_difference = 0.0
+    for i, message in enumerate(messages):
+        print(f"\nTest {i + 1}: {message[:50]}")
+        for category in torch_backend.class_names:
+            torch_value = float(torch_scores[category][i])
+            onnx_value = float(onnx_scores[category][i])
+            difference = abs(torch_value - onnx_value)
+            worst_difference = max(worst_difference, difference)
+            
+            if difference > MAX_SCORE_DIFFERENCE:
+                mismatches.append(f"{message[:30]} / {category}: torch={torch_value:.4f} onnx={onnx_value:.4f}")
+            
+            if (torch_value >= TOXICITY_THRESHOLD) != (onnx_value >= TOXICITY_THRESHOLD):
+                mismatches.append(f"{message[:30]} / {category}: verdict differs at {TOXICITY_THRESHOLD}")
+        
+        print(f"torch toxicity: {float(torch_scores['toxicity'][i]):.4f}  onnx toxicity: {float(onnx_scores['toxicity'][i]):.4f}")
+    
+    print(f"\nWorst score difference: {worst_difference:.4f}")
+    for mismatch in mismatches:
+        print(f"❌ {mismatch}")
+    
+    assert not mismatches, f"{len(mismatches)} score(s) outside parity tolerance"
+    print("✅ ONNX backend matches PyTorch backend")
+
+if __name__ == "__main__":
+    test_backend_parity()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test Toxicity Micro-Batching
+Checks that queued requests flush when the batch fills or the wait expires, with scores routed per text
+"""
+
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.toxicity_batcher import ToxicityBatcher
+
+class RecordingModel:
+    """Scores each text by its length and records the size of every batch"""
+
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def predict(self, texts):
+        with self.lock:
+            self.batches.append(len(texts))
+        return {'toxicity': [len(text) / 100.0 for text in texts]}
+
+def test_flush_on_size():
+    """A full batch runs immediately instead of waiting out max_wait_ms"""
+    model = RecordingModel()
+    batcher = ToxicityBatcher(model, max_batch_size=4, max_wait_ms=2000)
+
+    print("🔍 Testing Toxicity Batcher")
+    print("=" * 60)
+
+    started = time.perf_counter()
+    futures = [batcher.submit('x' * (i + 1)) for i in range(4)]
+    scores = [future.result(timeout=1.0)['toxicity'] for future in futures]
+    elapsed = time.perf_counter() - started
+    print(f"Size flush: batches {model.batches} in {elapsed * 1000:.1f}ms, scores {scores}")
+    assert model.batches == [4]
+    assert elapsed < 1.0
+    assert scores == [0.01, 0.02, 0.03, 0.04]
+
+def test_flush_on_timeout():
+    """A partial batch runs once the first request has waited max_wait_ms"""
+    model = RecordingModel()
+    batcher = ToxicityBatcher(model, max_batch_size=16, max_wait_ms=50)
+
+    started = time.perf_counter()
+    futures = [batcher.submit('y' * 10) for _ in range(3)]
+    for future in futures:
+        assert future.result(timeout=1.0) == {'toxicity': 0.1}
+    elapsed = time.perf_counter() - started
+    stats = batcher.get_stats()
+    print(f"Timeout flush: batches {model.batches} in {elapsed * 1000:.1f}ms, batch sizes {stats['batch_size']['buckets']}")
+    assert model.batches == [3]
+    assert elapsed >= 0.045
+    assert stats['batches_run'] == 1 and stats['batch_size']['count'] == 1
+
+    # A later request starts a new batch rather than joining the flushed one
+    assert batcher.predict('z', timeout=1.0) == {'toxicity': 0.01}
+    assert model.batches == [3, 1]
+
+if __name__ == "__main__":
+    test_flush_on_size()
+    test_flush_on_timeout()
+    print("\n✅ Toxicity batcher tests passed")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test Verdict Cache
+Checks hits and misses, NFC-normalized keys, invalidation on config changes, LRU and byte-cap eviction and TTL expiry
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.guardrails import AnalysisContext, GuardrailPipeline, GuardrailStage, VerdictCache
+
+def test_hits_and_normalized_keys():
+    """A stored verdict is served for the same text in either Unicode form, but not for other text"""
+    cache = VerdictCache()
+
+    print("🔍 Testing Verdict Cache")
+    print("=" * 60)
+
+    composed = VerdictCache.fingerprint('toxicity', 'caf\u00e9', 0)
+    decomposed = VerdictCache.fingerprint('toxicity', 'cafe\u0301', 0)
+    assert composed == decomposed
+    # Only normalization: casing and whitespace change the key
+    assert VerdictCache.fingerprint('toxicity', 'Caf\u00e9', 0) != composed
+    assert VerdictCache.fingerprint('toxicity', 'caf\u00e9 ', 0) != composed
+    assert VerdictCache.fingerprint('pii', 'caf\u00e9', 0) != composed
+
+    assert cache.get(composed) == (False, None)
+    cache.put(composed, {'is_toxic': False})
+    assert cache.get(decomposed) == (True, {'is_toxic': False})
+    stats = cache.get_stats()
+    print(f"Hits and misses: {stats}")
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['entries'] == 1
+
+def test_config_version_invalidation():
+    """A config change makes the pipeline recompute cached stages instead of serving old verdicts"""
+    calls = []
+    version = [0]
+
+    def toxicity(analysis):
+        calls.append(analysis.message)
+        return {'is_toxic': False, 'version': version[0]}
+
+    pipeline = GuardrailPipeline(
+        [GuardrailStage('toxicity', toxicity, cacheable=True)],
+        cache=VerdictCache(),
+        cache_version=lambda: version[0]
+    )
+    first = pipeline.run_stage(AnalysisContext('hello'), 'toxicity')
+    second_analysis = AnalysisContext('hello')
+    second = pipeline.run_stage(second_analysis, 'toxicity')
+    assert len(calls) == 1 and second == first
+    assert second_analysis.cache_hits == ['toxicity']
+
+    version[0] += 1
+    third = pipeline.run_stage(AnalysisContext('hello'), 'toxicity')
+    print(f"After config change: {len(calls)} computations, version {third['version']}")
+    assert len(calls) == 2 and third['version'] == 1
+
+    # Error results are never cached
+    pipeline.stages['toxicity'].run = lambda analysis: {'error': 'model unavailable'}
+    version[0] += 1
+    pipeline.run_stage(AnalysisContext('hello'), 'toxicity')
+    assert pipeline.cache.get(VerdictCache.fingerprint('toxicity', 'hello', version[0])) == (False, None)
+
+def test_lru_and_byte_eviction():
+    """The least recently used entry goes first, whether the entry or the byte cap is exceeded"""
+    cache = VerdictCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1) and cache.get('c') == (True, 3)
+    assert cache.get_stats()['evictions'] == 1
+
+    entry_size = len('k0') + len('"' + 'x' * 100 + '"')
+    cache = VerdictCache(max_entries=100, max_bytes=entry_size * 3)
+    for i in range(5):
+        cache.put(f'k{i}', 'x' * 100)
+    stats = cache.get_stats()
+    print(f"Byte cap {stats['max_bytes']}: {stats['entries']} entries, {stats['bytes']} bytes, {stats['evictions']} evictions")
+    assert stats['entries'] == 3 and stats['bytes'] <= stats['max_bytes'] and stats['evictions'] == 2
+    assert cache.get('k0') == (False, None) and cache.get('k4')[0]
+
+    # An entry larger than the whole cache is not stored and evicts nothing
+    cache.put('huge', 'x' * 1000)
+    assert cache.get('huge') == (False, None) and cache.get_stats()['entries'] == 3
+
+def test_ttl_expiry():
+    """Entries expire after the TTL and are counted as expirations, not evictions"""
+    cache = VerdictCache(ttl_seconds=0.05)
+    cache.put('k', {'is_toxic': True})
+    assert cache.get('k') == (True, {'is_toxic': True})
+    time.sleep(0.1)
+    assert cache.get('k') == (False, None)
+    stats = cache.get_stats()
+    print(f"TTL expiry: {stats}")
+    assert stats['expirations'] == 1 and stats['evictions'] == 0
+    assert stats['entries'] == 0 and stats['bytes'] == 0
+
+if __name__ == "__main__":
+    test_hits_and_normalized_keys()
+    test_config_version_invalidation()
+    test_lru_and_byte_eviction()
+    test_ttl_expiry()
+    print("\n✅ Verdict cache tests passed")
@@ -0,0 +1,165 @@
+"""
+Circuit Breaker
+Rolling error-rate and latency tracking that fails fast while a dependency is unhealthy
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a time window of recent calls"""
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, name: str, window_seconds: float = 60.0, min_calls: int = 10, error_rate_threshold: float = 0.5, slow_call_ms: float = 10000.0, slow_rate_threshold: float = 0.8, cooldown_seconds: float = 30.0):
+        """
+        Initialize the breaker in the closed state
+        
+        Args:
+            name (str): Dependency name, used in errors and health output
+            window_seconds (float): How far back calls count toward the rates
+            min_calls (int): Calls needed in the window before the breaker may trip
+            error_rate_threshold (float): Failure share that opens the circuit
+            slow_call_ms (float): Latency above which a successful call counts as slow
+            slow_rate_threshold (float): Slow-call share that opens the circuit
+            cooldown_seconds (float): Time spent open before a half-open probe is allowed
+        """
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_ms = slow_call_ms
+        self.slow_rate_threshold = slow_rate_threshold
+        self.cooldown_seconds = cooldown_seconds
+        
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        
+        # (timestamp, failed, slow, latency_ms) for calls inside the window
+        self.calls = deque()
+        self.failures = 0
+        self.slow_calls = 0
+        
+        self.stats = {
+            'times_opened': 0,
+            'rejected': 0,
+            'probes': 0
+        }
+    
+    def _trim(self, now: float):
+        cutoff = now - self.window_seconds
+        while self.calls and self.calls[0][0] < cutoff:
+            _, failed, slow, _ = self.calls.popleft()
+            self.failures -= failed
+            self.slow_calls -= slow
+    
+    def _cooled_down(self, now: float) -> bool:
+        return now - self.opened_at >= self.cooldown_seconds
+    
+    def _open(self, now: float):
+        self.state = self.OPEN
+        self.opened_at = now
+        self.probe_in_flight = False
+        self.stats['times_opened'] += 1
+    
+    def accepting_requests(self) -> bool:
+        """Whether a call would currently be let through, without reserving a probe"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                return self._cooled_down(time.time())
+            return not self.probe_in_flight
+    
+    def allow_request(self) -> bool:
+        """
+        Decide whether a call may proceed; after the cooldown one probe is let through
+        
+        Returns:
+            bool: True if the caller should make the call and then record its outcome
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            
+            now = time.time()
+            if self.state == self.OPEN and self._cooled_down(now):
+                self.state = self.HALF_OPEN
+            
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                self.stats['probes'] += 1
+                return True
+            
+            self.stats['rejected'] += 1
+            return False
+    
+    def record(self, latency_ms: float, failed: bool):
+        """
+        Record a call outcome and move between states
+        
+        Args:
+            latency_ms (float): How long the call took
+            failed (bool): Whether it raised or timed out
+        """
+        now = time.time()
+        slow = not failed and latency_ms >= self.slow_call_ms
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                if failed or slow:
+                    self._open(now)
+                else:
+                    # Healthy probe: start over with a clean window
+                    self.state = self.CLOSED
+                    self.probe_in_flight = False
+                    self.calls.clear()
+                    self.failures = 0
+                    self.slow_calls = 0
+                return
+            
+            self.calls.append((now, failed, slow, latency_ms))
+            self.failures += failed
+            self.slow_calls += slow
+            self._trim(now)
+            
+            if self.state == self.CLOSED and len(self.calls) >= self.min_calls:
+                total = len(self.calls)
+                if self.failures / total >= self.error_rate_threshold or self.slow_calls / total >= self.slow_rate_threshold:
+                    self._open(now)
+    
+    def release(self):
+        """Give back a call that ended without an outcome, e.g. because the caller went away"""
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                # The probe told us nothing; let the next caller probe instead
+                self.probe_in_flight = False
+    
+    def get_state(self) -> Dict:
+        """Get the current state with rolling error rate and latency"""
+        with self.lock:
+            now = time.time()
+            self._trim(now)
+            total = len(self.calls)
+            latencies = sorted(call[3] for call in self.calls)
+            state = {
+                'name': self.name,
+                'state': self.state,
+                'calls_in_window': total,
+                'error_rate': round(self.failures / total, 4) if total else 0.0,
+                'slow_call_rate': round(self.slow_calls / total, 4) if total else 0.0,
+                'avg_latency_ms': round(sum(latencies) / total, 2) if total else 0.0,
+                'p95_latency_ms': round(latencies[min(total - 1, int(total * 0.95))], 2) if total else 0.0,
+                'seconds_until_probe': round(max(0.0, self.cooldown_seconds - (now - self.opened_at)), 1) if self.state == self.OPEN else 0.0
+            }
+            state.update(self.stats)
+        return state
@@ -0,0 +1,635 @@
+"""
+Conversation Context Stores
+Storage backends for conversation contexts so every worker process sees the same session state
+"""
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+def _dumps(value) -> str:
+    """Compact JSON used for every stored record"""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def _new_context(user_id: str, session_id: str, user_preferences: Optional[Dict]) -> Dict:
+    return {
+        'user_id': user_id,
+        'session_id': session_id,
+        'user_preferences': user_preferences or {},
+        'conversation_history': [],
+        'current_mood': 'neutral',
+        'mood_history': [],
+        'topics_discussed': [],
+        'educational_topics_covered': [],
+        'last_activity': time.time()
+    }
+
+
+def _from_dict(data: Dict):
+    # Imported here because conversation_context builds its store from this module
+    from .conversation_context import ConversationContext
+    return ConversationContext.from_dict(data)
+
+
+class ContextStore:
+    """
+    Interface for conversation context storage
+    
+    Contexts are exchanged as ConversationContext.to_dict(iso_timestamps=False) dictionaries,
+    with epoch-second timestamps (ISO strings in older records are still read), or as
+    ConversationContext objects through the *_context methods; backends that hold objects
+    override those to skip the dictionary round trip. Appends are atomic: the message, the mood entry and the trimming of both
+    histories land together or not at all.
+    """
+    
+    backend = 'base'
+    stop_event = None  # set when a sweeper thread is started
+    
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Get the serialized context for a session, or None"""
+        raise NotImplementedError
+    
+    def create(self, context: Dict) -> Dict:
+        """Store a prebuilt context unless the session already has one; returns the stored context"""
+        raise NotImplementedError
+    
+    def get_or_create(self, user_id: str, session_id: str, user_preferences: Optional[Dict] = None) -> Dict:
+        """Get the context for a session, creating an empty one if it does not exist"""
+        context = self.get(session_id)
+        if context is None:
+            context = self.create(_new_context(user_id, session_id, user_preferences))
+        return context
+    
+    def append(self, session_id: str, message: Dict, mood_entry: Optional[Dict], max_messages: int, max_moods: int) -> Optional[Dict]:
+        """
+        Atomically append a message and optional mood entry, trimming both histories
+        
+        Args:
+            session_id (str): Chat session ID
+            message (Dict): Message to add to conversation history, already timestamped
+            mood_entry (Dict, optional): Mood entry with mood, confidence and timestamp
+            max_messages (int): Conversation history length to keep
+            max_moods (int): Mood history length to keep
+        
+        Returns:
+            Optional[Dict]: Updated context, or None if the session has no context
+        """
+        raise NotImplementedError
+    
+    def get_context(self, session_id: str):
+        """Get the context for a session as a ConversationContext, or None"""
+        data = self.get(session_id)
+        return _from_dict(data) if data is not None else None
+    
+    def create_context(self, context):
+        """Store a prebuilt ConversationContext unless the session already has one; returns the stored context"""
+        return _from_dict(self.create(context.to_dict(iso_timestamps=False)))
+    
+    def append_context(self, session_id: str, message: Dict, mood_entry: Optional[Dict], max_messages: int, max_moods: int):
+        """Same as append, returning the updated ConversationContext or None"""
+        data = self.append(session_id, message, mood_entry, max_messages, max_moods)
+        return _from_dict(data) if data is not None else None
+    
+    def cleanup(self, cutoff: float) -> int:
+        """Remove contexts with no activity since the cutoff (epoch seconds); returns the count removed"""
+        raise NotImplementedError
+    
+    def _start_sweeper(self, ttl_seconds: float, sweep_interval_seconds: float):
+        """Run cleanup for contexts idle past ttl_seconds on a daemon thread; an interval of 0 disables it"""
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.stop_event = threading.Event()
+        self.sweeper = None
+        if sweep_interval_seconds > 0:
+            self.sweeper = threading.Thread(target=self._sweep_loop, name=f'context-sweeper-{self.backend}', daemon=True)
+            self.sweeper.start()
+    
+    def _sweep_loop(self):
+        while not self.stop_event.wait(self.sweep_interval_seconds):
+            try:
+                self.cleanup(time.time() - self.ttl_seconds)
+                with self.lock:
+                    self.stats['sweeps'] += 1
+            except Exception as e:
+                print(f"Warning: Context sweep failed: {e}")
+    
+    def close(self):
+        """Stop the sweeper thread, if the backend runs one"""
+        if self.stop_event is not None:
+            self.stop_event.set()
+    
+    def get_stats(self) -> Dict:
+        """Get backend name and size"""
+        return {'backend': self.backend}
+
+
+class MemoryContextStore(ContextStore):
+    """
+    Per-process LRU capped by entry count and estimated bytes, with idle expiry
+    
+    Contexts are held as compact ConversationContext objects. Readers get a copy that shares the
+    immutable history entries, so nothing is serialized on the per-turn path.
+    
+    Idle expiry is driven by a min-heap of last-access times with lazy invalidation: each
+    session has at most one live heap entry, and a popped entry whose session was touched
+    since is pushed back with the newer time. A sweeper thread drains the expired head of the
+    heap, so expiring k sessions costs O(k log n) instead of a scan over every session.
+    Entries of evicted sessions are dropped by rebuilding the heap once they outnumber the
+    live entries two to one, which keeps the heap O(n) under LRU churn.
+    """
+    
+    backend = 'memory'
+    
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 86400.0, sweep_interval_seconds: float = 60.0):
+        """
+        Args:
+            max_entries (int): Hard cap on stored contexts
+            max_bytes (int): Hard cap on the estimated size of stored contexts
+            ttl_seconds (float): Idle time after which a context expires
+            sweep_interval_seconds (float): How often the sweeper runs; 0 disables it
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        
+        self.contexts = OrderedDict()  # session_id -> ConversationContext, least recently used first
+        self.sizes = {}  # session_id -> estimated bytes
+        self.last_access = {}  # session_id -> epoch seconds of the last read or write
+        self.heap = []  # (last_access, seq, session_id), one live entry per session
+        self.heap_seq = {}  # session_id -> seq of its live heap entry
+        self.seq = 0
+        self.current_bytes = 0
+        self.lock = threading.Lock()
+        
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'sweeps': 0,
+            'heap_compactions': 0
+        }
+        
+        self._start_sweeper(ttl_seconds, sweep_interval_seconds)
+    
+    def _touch(self, session_id: str):
+        """Mark a session as most recently used; caller holds the lock"""
+        self.contexts.move_to_end(session_id)
+        self.last_access[session_id] = time.time()
+    
+    def _push(self, session_id: str, accessed_at: float):
+        self.seq += 1
+        self.heap_seq[session_id] = self.seq
+        heapq.heappush(self.heap, (accessed_at, self.seq, session_id))
+    
+    def _resize(self, session_id: str, context):
+        size = context.estimate_bytes()
+        self.current_bytes += size - self.sizes.get(session_id, 0)
+        self.sizes[session_id] = size
+    
+    def _remove(self, session_id: str):
+        del self.contexts[session_id]
+        self.current_bytes -= self.sizes.pop(session_id)
+        del self.last_access[session_id]
+        # Its heap entry goes stale and is skipped when popped
+        del self.heap_seq[session_id]
+        if len(self.heap) > 3 * len(self.heap_seq) + 64:
+            self._compact_heap()
+    
+    def _compact_heap(self):
+        """Rebuild the heap from live entries only; caller holds the lock"""
+        self.heap = [entry for entry in self.heap if self.heap_seq.get(entry[2]) == entry[1]]
+        heapq.heapify(self.heap)
+        self.stats['heap_compactions'] += 1
+    
+    def _enforce_caps(self):
+        """Evict least recently used contexts, never the one just written"""
+        while len(self.contexts) > 1 and (len(self.contexts) > self.max_entries or self.current_bytes > self.max_bytes):
+            self._remove(next(iter(self.contexts)))
+            self.stats['evictions'] += 1
+    
+    def get(self, session_id: str) -> Optional[Dict]:
+        context = self.get_context(session_id)
+        return context.to_dict(iso_timestamps=False) if context is not None else None
+    
+    def get_context(self, session_id: str):
+        with self.lock:
+            context = self.contexts.get(session_id)
+            if context is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self._touch(session_id)
+            return context.copy()
+    
+    def get_or_create(self, user_id: str, session_id: str, user_preferences: Optional[Dict] = None) -> Dict:
+        with self.lock:
+            context = self.contexts.get(session_id)
+            if context is not None:
+                self.stats['hits'] += 1
+                self._touch(session_id)
+                return context.to_dict(iso_timestamps=False)
+            
+            self.stats['misses'] += 1
+            # Imported here because conversation_context builds its store from this module
+            from .conversation_context import ConversationContext
+            return self._insert(ConversationContext(user_id, session_id, user_preferences)).to_dict(iso_timestamps=False)
+    
+    def create(self, context: Dict) -> Dict:
+        return self.create_context(_from_dict(context)).to_dict(iso_timestamps=False)
+    
+    def create_context(self, context):
+        with self.lock:
+            existing = self.contexts.get(context.session_id)
+            if existing is not None:
+                self._touch(context.session_id)
+                return existing.copy()
+            # The store keeps the caller's object; the caller gets a copy like every other reader
+            return self._insert(context).copy()
+    
+    def _insert(self, context):
+        """Add a new context as most recently used; caller holds the lock"""
+        session_id = context.session_id
+        self.contexts[session_id] = context
+        self.last_access[session_id] = time.time()
+        self._push(session_id, self.last_access[session_id])
+        self._resize(session_id, context)
+        self._enforce_caps()
+        return context
+    
+    def append(self, session_id: str, message: Dict, mood_entry: Optional[Dict], max_messages: int, max_moods: int) -> Optional[Dict]:
+        context = self.append_context(session_id, message, mood_entry, max_messages, max_moods)
+        return context.to_dict(iso_timestamps=False) if context is not None else None
+    
+    def append_context(self, session_id: str, message: Dict, mood_entry: Optional[Dict], max_messages: int, max_moods: int):
+        with self.lock:
+            context = self.contexts.get(session_id)
+            if context is None:
+                return None
+            # The context's ring buffers are already sized to the history limits
+            context.add_message(message)
+            if mood_entry:
+                context.update_mood(mood_entry['mood'], mood_entry['confidence'])
+            self._touch(session_id)
+            self._resize(session_id, context)
+            self._enforce_caps()
+            return context.copy()
+    
+    def cleanup(self, cutoff: float) -> int:
+        """Expire contexts not accessed since the cutoff by draining the head of the heap"""
+        removed = 0
+        with self.lock:
+            while self.heap and self.heap[0][0] < cutoff:
+                _, seq, session_id = heapq.heappop(self.heap)
+                if self.heap_seq.get(session_id) != seq:
+                    continue
+                accessed_at = self.last_access[session_id]
+                if accessed_at < cutoff:
+                    self._remove(session_id)
+                    removed += 1
+                else:
+                    self._push(session_id, accessed_at)
+            self.stats['expirations'] += removed
+        return removed
+    
+    def get_stats(self) -> Dict:
+        with self.lock:
+            stats = dict(self.stats)
+            stats.update({
+                'backend': self.backend,
+                'contexts': len(self.contexts),
+                'bytes': self.current_bytes,
+                'avg_context_bytes': round(self.current_bytes / len(self.contexts)) if self.contexts else 0,
+                'heap_entries': len(self.heap),
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds
+            })
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class SQLiteContextStore(ContextStore):
+    """
+    SQLite database in WAL mode shared by every worker process on the host
+    
+    Each worker runs the idle-expiry sweeper; the sweeps are serialized by the write lock and
+    find expired rows through the last_activity index, so overlapping sweeps cost little.
+    """
+    
+    backend = 'sqlite'
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS contexts (
+        session_id TEXT PRIMARY KEY,
+        user_id TEXT,
+        user_preferences TEXT NOT NULL,
+        current_mood TEXT NOT NULL,
+        topics_discussed TEXT NOT NULL,
+        educational_topics_covered TEXT NOT NULL,
+        last_activity REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS context_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        payload TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS context_moods (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        payload TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_context_messages_session ON context_messages(session_id, id);
+    CREATE INDEX IF NOT EXISTS idx_context_moods_session ON context_moods(session_id, id);
+    CREATE INDEX IF NOT EXISTS idx_contexts_last_activity ON contexts(last_activity);
+    """
+    
+    def __init__(self, path: str, ttl_seconds: float = 86400.0, sweep_interval_seconds: float = 60.0):
+        """
+        Open (and if needed create) the shared database
+        
+        Args:
+            path (str): Database file; every worker must use the same path
+            ttl_seconds (float): Idle time after which a context expires
+            sweep_interval_seconds (float): How often the sweeper runs; 0 disables it
+        """
+        self.path = path
+        self.local = threading.local()
+        connection = self._connection()
+        connection.executescript(self.SCHEMA)
+        
+        self.lock = threading.Lock()
+        self.stats = {'expirations': 0, 'sweeps': 0}
+        self._start_sweeper(ttl_seconds, sweep_interval_seconds)
+    
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, in autocommit mode with explicit transactions"""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+    
+    def _load(self, connection: sqlite3.Connection, session_id: str) -> Optional[Dict]:
+        row = connection.execute(
+            'SELECT user_id, user_preferences, current_mood, topics_discussed, educational_topics_covered, last_activity '
+            'FROM contexts WHERE session_id = ?',
+            (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        messages = connection.execute('SELECT payload FROM context_messages WHERE session_id = ? ORDER BY id', (session_id,)).fetchall()
+        moods = connection.execute('SELECT payload FROM context_moods WHERE session_id = ? ORDER BY id', (session_id,)).fetchall()
+        return {
+            'user_id': row[0],
+            'session_id': session_id,
+            'user_preferences': json.loads(row[1]),
+            'conversation_history': [json.loads(payload) for (payload,) in messages],
+            'current_mood': row[2],
+            'mood_history': [json.loads(payload) for (payload,) in moods],
+            'topics_discussed': json.loads(row[3]),
+            'educational_topics_covered': json.loads(row[4]),
+            'last_activity': row[5]
+        }
+    
+    def _read(self, session_id: str) -> Optional[Dict]:
+        connection = self._connection()
+        # One read transaction so the three selects see the same snapshot
+        connection.execute('BEGIN')
+        try:
+            return self._load(connection, session_id)
+        finally:
+            connection.execute('COMMIT')
+    
+    def get(self, session_id: str) -> Optional[Dict]:
+        return self._read(session_id)
+    
+    def create(self, context: Dict) -> Dict:
+        session_id = context['session_id']
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            inserted = connection.execute(
+                'INSERT OR IGNORE INTO contexts VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    session_id,
+                    context.get('user_id'),
+                    _dumps(context.get('user_preferences') or {}),
+                    context.get('current_mood', 'neutral'),
+                    _dumps(context.get('topics_discussed', [])),
+                    _dumps(context.get('educational_topics_covered', [])),
+                    time.time()
+                )
+            ).rowcount
+            if inserted:
+                connection.executemany(
+                    'INSERT INTO context_messages (session_id, payload) VALUES (?, ?)',
+                    [(session_id, _dumps(message)) for message in context.get('conversation_history', [])]
+                )
+                connection.executemany(
+                    'INSERT INTO context_moods (session_id, payload) VALUES (?, ?)',
+                    [(session_id, _dumps(entry)) for entry in context.get('mood_history', [])]
+                )
+            stored = self._load(connection, session_id)
+            connection.execute('COMMIT')
+            return stored
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+    
+    def append(self, session_id: str, message: Dict, mood_entry: Optional[Dict], max_messages: int, max_moods: int) -> Optional[Dict]:
+        connection = self._connection()
+        # IMMEDIATE takes the write lock up front so concurrent appends serialize cleanly
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            updated = connection.execute(
+                'UPDATE contexts SET last_activity = ?, current_mood = COALESCE(?, current_mood) WHERE session_id = ?',
+                (time.time(), mood_entry['mood'] if mood_entry else None, session_id)
+            ).rowcount
+            if not updated:
+                connection.execute('ROLLBACK')
+                return None
+            
+            connection.execute('INSERT INTO context_messages (session_id, payload) VALUES (?, ?)', (session_id, _dumps(message)))
+            connection.execute(
+                'DELETE FROM context_messages WHERE session_id = ? AND id NOT IN '
+                '(SELECT id FROM context_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)',
+                (session_id, session_id, max_messages)
+            )
+            if mood_entry:
+                connection.execute('INSERT INTO context_moods (session_id, payload) VALUES (?, ?)', (session_id, _dumps(mood_entry)))
+                connection.execute(
+                    'DELETE FROM context_moods WHERE session_id = ? AND id NOT IN '
+                    '(SELECT id FROM context_moods WHERE session_id = ? ORDER BY id DESC LIMIT ?)',
+                    (session_id, session_id, max_moods)
+                )
+            context = self._load(connection, session_id)
+            connection.execute('COMMIT')
+            return context
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+    
+    def cleanup(self, cutoff: float) -> int:
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            stale = [session_id for (session_id,) in connection.execute('SELECT session_id FROM contexts WHERE last_activity < ?', (cutoff,))]
+            for session_id in stale:
+                connection.execute('DELETE FROM context_messages WHERE session_id = ?', (session_id,))
+                connection.execute('DELETE FROM context_moods WHERE session_id = ?', (session_id,))
+                connection.execute('DELETE FROM contexts WHERE session_id = ?', (session_id,))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        with self.lock:
+            self.stats['expirations'] += len(stale)
+        return len(stale)
+    
+    def get_stats(self) -> Dict:
+        (count,) = self._connection().execute('SELECT COUNT(*) FROM contexts').fetchone()
+        with self.lock:
+            stats = dict(self.stats)
+        stats.update({'backend': self.backend, 'contexts': count, 'path': self.path, 'ttl_seconds': self.ttl_seconds})
+        return stats
+
+
+class RedisContextStore(ContextStore):
+    """Redis (or any Redis-protocol server) shared across hosts; idle contexts expire by TTL"""
+    
+    backend = 'redis'
+    
+    def __init__(self, url: str, ttl_seconds: int):
+        """
+        Connect to the server
+        
+        Args:
+            url (str): Redis URL, e.g. redis://localhost:6379/0
+            ttl_seconds (int): Idle time after which a context expires
+        """
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.client.ping()
+        self.ttl_seconds = ttl_seconds
+    
+    @staticmethod
+    def _keys(session_id: str) -> List[str]:
+        base = f"ctx:{session_id}"
+        return [base, f"{base}:msgs", f"{base}:moods"]
+    
+    def _load(self, session_id: str) -> Optional[Dict]:
+        key, messages_key, moods_key = self._keys(session_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hgetall(key)
+        pipe.lrange(messages_key, 0, -1)
+        pipe.lrange(moods_key, 0, -1)
+        fields, messages, moods = pipe.execute()
+        if not fields:
+            return None
+        fields = {name.decode(): value.decode() for name, value in fields.items()}
+        return {
+            'user_id': fields.get('user_id'),
+            'session_id': session_id,
+            'user_preferences': json.loads(fields.get('user_preferences', '{}')),
+            'conversation_history': [json.loads(payload) for payload in messages],
+            'current_mood': fields.get('current_mood', 'neutral'),
+            'mood_history': [json.loads(payload) for payload in moods],
+            'topics_discussed': json.loads(fields.get('topics_discussed', '[]')),
+            'educational_topics_covered': json.loads(fields.get('educational_topics_covered', '[]')),
+            'last_activity': float(fields.get('last_activity', time.time()))
+        }
+    
+    def get(self, session_id: str) -> Optional[Dict]:
+        return self._load(session_id)
+    
+    def create(self, context: Dict) -> Dict:
+        session_id = context['session_id']
+        key, messages_key, moods_key = self._keys(session_id)
+        # HSETNX on user_id decides the creator; the other fields are written only by it
+        if self.client.hsetnx(key, 'user_id', context.get('user_id') or ''):
+            pipe = self.client.pipeline(transaction=True)
+            pipe.delete(messages_key, moods_key)
+            if context.get('conversation_history'):
+                pipe.rpush(messages_key, *[_dumps(message) for message in context['conversation_history']])
+            if context.get('mood_history'):
+                pipe.rpush(moods_key, *[_dumps(entry) for entry in context['mood_history']])
+            pipe.hset(key, mapping={
+                'user_preferences': _dumps(context.get('user_preferences') or {}),
+                'current_mood': context.get('current_mood', 'neutral'),
+                'topics_discussed': _dumps(context.get('topics_discussed', [])),
+                'educational_topics_covered': _dumps(context.get('educational_topics_covered', [])),
+                'last_activity': time.time()
+            })
+            for name in (key, messages_key, moods_key):
+                pipe.expire(name, self.ttl_seconds)
+            pipe.execute()
+        return self._load(session_id)
+    
+    def append(self, session_id: str, message: Dict, mood_entry: Optional[Dict], max_messages: int, max_moods: int) -> Optional[Dict]:
+        key, messages_key, moods_key = self._keys(session_id)
+        if not self.client.exists(key):
+            return None
+        
+        # MULTI/EXEC applies the push, trim and field updates as one unit
+        pipe = self.client.pipeline(transaction=True)
+        pipe.rpush(messages_key, _dumps(message))
+        pipe.ltrim(messages_key, -max_messages, -1)
+        fields = {'last_activity': time.time()}
+        if mood_entry:
+            pipe.rpush(moods_key, _dumps(mood_entry))
+            pipe.ltrim(moods_key, -max_moods, -1)
+            fields['current_mood'] = mood_entry['mood']
+        pipe.hset(key, mapping=fields)
+        for name in (key, messages_key, moods_key):
+            pipe.expire(name, self.ttl_seconds)
+        pipe.execute()
+        return self._load(session_id)
+    
+    def cleanup(self, cutoff: float) -> int:
+        # Keys expire on their own after ttl_seconds of inactivity
+        return 0
+    
+    def get_stats(self) -> Dict:
+        return {'backend': self.backend, 'ttl_seconds': self.ttl_seconds}
+
+
+def create_context_store() -> ContextStore:
+    """
+    Build the store selected by CONTEXT_BACKEND (memory, sqlite or redis)
+    
+    Falls back to the in-process store if the shared backend cannot be opened.
+    """
+    backend = os.getenv('CONTEXT_BACKEND', 'memory').lower()
+    try:
+        if backend == 'sqlite':
+            return SQLiteContextStore(
+                os.getenv('CONTEXT_SQLITE_PATH', 'conversation_contexts.db'),
+                ttl_seconds=float(os.getenv('CONTEXT_TTL_SECONDS', '86400')),
+                sweep_interval_seconds=float(os.getenv('CONTEXT_SWEEP_INTERVAL_SECONDS', '60'))
+            )
+        if backend == 'redis':
+            return RedisContextStore(
+                os.getenv('CONTEXT_REDIS_URL', 'redis://localhost:6379/0'),
+                int(os.getenv('CONTEXT_TTL_SECONDS', '86400'))
+            )
+    except Exception as e:
+        print(f"Warning: Context backend '{backend}' unavailable, using in-process memory: {e}")
+    return MemoryContextStore(
+        max_entries=int(os.getenv('CONTEXT_MAX_ENTRIES', '10000')),
+        max_bytes=int(os.getenv('CONTEXT_MAX_BYTES', str(64 * 1024 * 1024))),
+        ttl_seconds=float(os.getenv('CONTEXT_TTL_SECONDS', '86400')),
+        sweep_interval_seconds=float(os.getenv('CONTEXT_SWEEP_INTERVAL_SECONDS', '60'))
+    )
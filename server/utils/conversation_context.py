@@ -2,11 +2,129 @@
 Conversation Context Service
 Manages conversation history, user preferences, and context-aware responses
 """
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
+from collections import OrderedDict, deque, namedtuple
 from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import islice
 import json
+import os
+import sys
+import threading
+import time
+from .context_store import ContextStore, create_context_store
+
+# History lengths kept per session
+MAX_CONVERSATION_HISTORY = 15
+MAX_MOOD_HISTORY = 10
+
+# Recent moods the trend is judged on; must not exceed MAX_MOOD_HISTORY
+MOOD_TREND_WINDOW = 5
+
+# Compact history entries; timestamps are epoch seconds until serialized
+MessageEntry = namedtuple('MessageEntry', ['message_type', 'content', 'timestamp'])
+MoodEntry = namedtuple('MoodEntry', ['mood', 'confidence', 'timestamp'])
+
+
+def _to_epoch(value) -> float:
+    """Accept epoch seconds or an ISO string from a serialized context"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+@lru_cache(maxsize=8192)
+def _to_iso(timestamp: float) -> str:
+    # Cached: every read of a session serializes the same history entries again
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
+class MoodAggregate:
+    """
+    Running mood counts, transitions and total over a sequence of mood events
+    
+    Events are added at the newest end and, for a sliding window, dropped from the oldest end,
+    each in O(1). The mood vocabulary is small and fixed, so the primary mood is a constant-time
+    scan of the counts.
+    """
+    
+    __slots__ = ('counts', 'transitions', 'total', 'last')
+    
+    def __init__(self):
+        self.counts = {}
+        self.transitions = 0
+        self.total = 0
+        self.last = None
+    
+    def add(self, mood: str):
+        """Record the newest mood event"""
+        if self.last is not None and self.last != mood:
+            self.transitions += 1
+        self.counts[mood] = self.counts.get(mood, 0) + 1
+        self.total += 1
+        self.last = mood
+    
+    def remove_oldest(self, mood: str, next_mood: Optional[str]):
+        """Drop the oldest event, given the event that followed it (None if there was none)"""
+        remaining = self.counts[mood] - 1
+        if remaining:
+            self.counts[mood] = remaining
+        else:
+            del self.counts[mood]
+        if next_mood is not None and next_mood != mood:
+            self.transitions -= 1
+        self.total -= 1
+        if not self.total:
+            self.last = None
+    
+    def copy(self):
+        """Independent aggregate with the same state"""
+        clone = MoodAggregate.__new__(MoodAggregate)
+        clone.counts = dict(self.counts)
+        clone.transitions = self.transitions
+        clone.total = self.total
+        clone.last = self.last
+        return clone
+    
+    def primary_mood(self) -> str:
+        """Most frequent mood, earliest seen winning ties"""
+        return max(self.counts, key=self.counts.get) if self.counts else 'neutral'
+    
+    def trend(self) -> str:
+        """'declining' or 'improving' when sad or happy is over 60% of events, else 'stable'"""
+        if self.counts.get('sad', 0) > self.total * 0.6:
+            return 'declining'
+        if self.counts.get('happy', 0) > self.total * 0.6:
+            return 'improving'
+        return 'stable'
+
+
+class SessionMoodStats(MoodAggregate):
+    """Mood aggregate over every stored message of a session, with the message count it covers"""
+    
+    __slots__ = ('message_count',)
+    
+    def __init__(self):
+        super().__init__()
+        self.message_count = 0
+    
+    def add_message(self, mood: Optional[str]):
+        """Count a stored message and its mood, if it has one"""
+        self.message_count += 1
+        if mood:
+            self.add(sys.intern(mood))
+
 
 class ConversationContext:
+    # Slots and bounded deques keep per-session overhead small with many sessions in memory
+    __slots__ = (
+        'user_id', 'session_id', 'user_preferences', 'conversation_history', 'current_mood',
+        'mood_history', 'mood_window', 'topics_discussed', 'educational_topics_covered', 'last_activity'
+    )
+    
     def __init__(self, user_id: str, session_id: str, user_preferences: Dict = None):
         """
         Initialize conversation context
@@ -19,37 +137,36 @@ class ConversationContext:
         self.user_id = user_id
         self.session_id = session_id
         self.user_preferences = user_preferences or {}
-        self.conversation_history = []
+        self.conversation_history = deque(maxlen=MAX_CONVERSATION_HISTORY)
         self.current_mood = 'neutral'
-        self.mood_history = []
+        self.mood_history = deque(maxlen=MAX_MOOD_HISTORY)
+        self.mood_window = MoodAggregate()  # over the last MOOD_TREND_WINDOW moods
         self.topics_discussed = []
         self.educational_topics_covered = []
-        self.last_activity = datetime.now()
-        
-    def add_message(self, message: Dict):
-        """Add a message to conversation history"""
-        self.conversation_history.append({
-            **message,
-            'timestamp': datetime.now().isoformat()
-        })
-        self.last_activity = datetime.now()
-        
-        # Keep only last 15 messages for context
-        if len(self.conversation_history) > 15:
-            self.conversation_history = self.conversation_history[-15:]
-    
-    def update_mood(self, mood: str, confidence: float):
-        """Update current mood and mood history"""
-        self.current_mood = mood
-        self.mood_history.append({
-            'mood': mood,
-            'confidence': confidence,
-            'timestamp': datetime.now().isoformat()
-        })
+        self.last_activity = time.time()
+    
+    def add_message(self, message: Dict, timestamp: Optional[float] = None):
+        """Add a message to conversation history; the oldest drops off past 15 messages"""
+        self.last_activity = timestamp or time.time()
+        self.conversation_history.append(MessageEntry(
+            sys.intern(message.get('message_type') or 'user'),
+            message.get('content', ''),
+            self.last_activity
+        ))
+    
+    def update_mood(self, mood: str, confidence: float, timestamp: Optional[float] = None):
+        """Update current mood and mood history; the oldest drops off past 10 entries"""
+        # Interned so every session shares one copy of each mood label
+        self.current_mood = sys.intern(mood)
+        self.mood_history.append(MoodEntry(self.current_mood, confidence, timestamp or time.time()))
         
-        # Keep only last 10 mood entries
-        if len(self.mood_history) > 10:
-            self.mood_history = self.mood_history[-10:]
+        # Slide the trend window: the entry before the last MOOD_TREND_WINDOW leaves it
+        if len(self.mood_history) > MOOD_TREND_WINDOW:
+            self.mood_window.remove_oldest(
+                self.mood_history[-MOOD_TREND_WINDOW - 1].mood,
+                self.mood_history[-MOOD_TREND_WINDOW].mood
+            )
+        self.mood_window.add(self.current_mood)
     
     def add_topic(self, topic: str, topic_type: str = 'general'):
         """Add a topic to discussed topics"""
@@ -70,38 +187,33 @@ class ConversationContext:
     
     def get_recent_context(self, limit: int = 5) -> List[Dict]:
         """Get recent conversation context"""
-        return self.conversation_history[-limit:] if self.conversation_history else []
+        recent = list(self.conversation_history)[-limit:]
+        return [self._message_dict(entry) for entry in recent]
     
     def get_mood_trend(self) -> Dict:
         """Analyze mood trends over time"""
         if len(self.mood_history) < 2:
             return {'trend': 'stable', 'direction': 'none'}
         
-        recent_moods = [entry['mood'] for entry in self.mood_history[-5:]]
-        
-        # Count mood occurrences
-        mood_counts = {}
-        for mood in recent_moods:
-            mood_counts[mood] = mood_counts.get(mood, 0) + 1
-        
-        # Determine trend
-        if mood_counts.get('sad', 0) > len(recent_moods) * 0.6:
+        # Served from the running window counts rather than recounting the history
+        trend = self.mood_window.trend()
+        if trend == 'declining':
             return {'trend': 'declining', 'direction': 'negative', 'primary_mood': 'sad'}
-        elif mood_counts.get('happy', 0) > len(recent_moods) * 0.6:
+        elif trend == 'improving':
             return {'trend': 'improving', 'direction': 'positive', 'primary_mood': 'happy'}
         else:
             return {'trend': 'stable', 'direction': 'neutral', 'primary_mood': 'neutral'}
     
-    def should_redirect(self) -> bool:
+    def should_redirect(self, mood_trend: Optional[Dict] = None) -> bool:
         """Determine if conversation should be redirected"""
-        mood_trend = self.get_mood_trend()
+        mood_trend = mood_trend or self.get_mood_trend()
         
         # Redirect if mood is consistently negative
         if mood_trend['direction'] == 'negative':
             return True
         
         # Redirect if too many educational topics without positive interaction
-        if len(self.educational_topics_covered) > 3 and mood_trend['primary_mood'] != 'happy':
+        if len(self.educational_topics_covered) > 3 and mood_trend.get('primary_mood') != 'happy':
             return True
         
         return False
@@ -133,105 +245,315 @@ class ConversationContext:
         
         return suggestions[:3]  # Return top 3 suggestions
     
-    def to_dict(self) -> Dict:
-        """Convert context to dictionary for storage"""
-        return {
-            'user_id': self.user_id,
-            'session_id': self.session_id,
-            'user_preferences': self.user_preferences,
-            'conversation_history': self.conversation_history,
-            'current_mood': self.current_mood,
-            'mood_history': self.mood_history,
-            'topics_discussed': self.topics_discussed,
-            'educational_topics_covered': self.educational_topics_covered,
-            'last_activity': self.last_activity.isoformat()
-        }
+    def estimate_bytes(self) -> int:
+        """Approximate memory held by this context, for store size caps"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.conversation_history) + sys.getsizeof(self.mood_history)
+        # Per message: the 3-tuple, the str header and the float (64 + 49 + 24), plus the text
+        size += len(self.conversation_history) * 137 + sum(len(entry.content) for entry in self.conversation_history)
+        size += len(self.mood_history) * 112  # tuple plus two floats; mood strings are shared
+        size += sum(len(str(key)) + len(str(value)) + 8 for key, value in self.user_preferences.items())
+        if self.topics_discussed or self.educational_topics_covered:
+            size += len(json.dumps([self.topics_discussed, self.educational_topics_covered], default=str))
+        return size + len(self.session_id) + len(self.user_id or '')
+    
+    def copy(self) -> 'ConversationContext':
+        """
+        Cheap independent copy for handing a stored context to a reader
+        
+        History entries are immutable tuples and are shared; the containers and the running
+        mood window are copied so later appends to the stored context do not show through.
+        """
+        clone = ConversationContext.__new__(ConversationContext)
+        clone.user_id = self.user_id
+        clone.session_id = self.session_id
+        clone.user_preferences = dict(self.user_preferences)
+        clone.conversation_history = self.conversation_history.copy()
+        clone.current_mood = self.current_mood
+        clone.mood_history = self.mood_history.copy()
+        clone.mood_window = self.mood_window.copy()
+        clone.topics_discussed = list(self.topics_discussed)
+        clone.educational_topics_covered = list(self.educational_topics_covered)
+        clone.last_activity = self.last_activity
+        return clone
     
-    def to_dict(self) -> Dict:
-        """Convert context to serializable dictionary"""
+    @staticmethod
+    def _message_dict(entry: MessageEntry, format_timestamp=_to_iso) -> Dict:
+        return {'content': entry.content, 'message_type': entry.message_type, 'timestamp': format_timestamp(entry.timestamp)}
+    
+    def to_dict(self, iso_timestamps: bool = True) -> Dict:
+        """
+        Convert context to serializable dictionary; timestamps are formatted here
+        
+        Args:
+            iso_timestamps (bool): ISO strings for prompts and API responses; False keeps epoch
+                seconds, which is what context stores persist
+        
+        Returns:
+            Dict: Serialized context
+        """
+        format_timestamp = _to_iso if iso_timestamps else float
         return {
             'user_id': self.user_id,
             'session_id': self.session_id,
             'user_preferences': self.user_preferences,
-            'conversation_history': self.conversation_history,
+            'conversation_history': [self._message_dict(entry, format_timestamp) for entry in self.conversation_history],
             'current_mood': self.current_mood,
-            'mood_history': self.mood_history,
+            'mood_history': [
+                {'mood': entry.mood, 'confidence': entry.confidence, 'timestamp': format_timestamp(entry.timestamp)}
+                for entry in self.mood_history
+            ],
             'topics_discussed': self.topics_discussed,
             'educational_topics_covered': self.educational_topics_covered,
-            'last_activity': self.last_activity.isoformat()
+            'last_activity': format_timestamp(self.last_activity)
         }
     
     @classmethod
     def from_dict(cls, data: Dict):
-        """Create context from dictionary"""
+        """
+        Create context from dictionary
+        
+        History is loaded straight into the ring buffers; only the moods inside the trend window
+        are replayed, so the read costs the same however long the stored history is.
+        """
         context = cls(
             user_id=data['user_id'],
             session_id=data['session_id'],
             user_preferences=data.get('user_preferences', {})
         )
-        context.conversation_history = data.get('conversation_history', [])
-        context.current_mood = data.get('current_mood', 'neutral')
-        context.mood_history = data.get('mood_history', [])
+        context.conversation_history.extend(
+            MessageEntry(sys.intern(message.get('message_type') or 'user'), message.get('content', ''), _to_epoch(message.get('timestamp')))
+            for message in data.get('conversation_history', [])
+        )
+        context.mood_history.extend(
+            MoodEntry(sys.intern(entry['mood']), entry.get('confidence', 0.0), _to_epoch(entry.get('timestamp')))
+            for entry in data.get('mood_history', [])
+        )
+        for entry in islice(context.mood_history, max(len(context.mood_history) - MOOD_TREND_WINDOW, 0), None):
+            context.mood_window.add(entry.mood)
+        context.current_mood = sys.intern(data.get('current_mood', 'neutral'))
         context.topics_discussed = data.get('topics_discussed', [])
         context.educational_topics_covered = data.get('educational_topics_covered', [])
-        context.last_activity = datetime.fromisoformat(data.get('last_activity', datetime.now().isoformat()))
+        context.last_activity = _to_epoch(data.get('last_activity'))
         return context
 
 
 class ConversationContextManager:
-    def __init__(self):
-        """Initialize context manager"""
-        self.active_contexts = {}  # session_id -> ConversationContext
+    def __init__(self, store: Optional[ContextStore] = None):
+        """
+        Initialize context manager
+        
+        Args:
+            store (ContextStore, optional): Storage backend; defaults to the one selected by CONTEXT_BACKEND
+        """
+        self.store = store or create_context_store()
+        
+        # session_id -> SessionMoodStats over stored messages, least recently used first
+        self.session_moods = OrderedDict()
+        self.max_session_moods = int(os.getenv('CONTEXT_MAX_ENTRIES', '10000'))
+        self.session_moods_lock = threading.Lock()
+        
+        # Rebuilds contexts missing from the store (e.g. after a restart) from stored messages
+        self.hydrator = None
+        self.hydration_limit = int(os.getenv('CONTEXT_HYDRATION_MESSAGES', '30'))
+        self.hydrations = {}  # session_id -> [lock, waiter count] for misses being hydrated
+        self.hydration_lock = threading.Lock()
+        self.hydration_stats = {
+            'hydrated': 0,
+            'hydrated_messages': 0,
+            'coalesced': 0,
+            'failed': 0
+        }
+    
+    def register_hydrator(self, hydrator: Callable[[str, int], List[Dict]]):
+        """
+        Set the function that loads stored messages for a session missing from the store
+        
+        Args:
+            hydrator (Callable): Takes the session ID and a message limit and returns the last
+                messages, oldest first, with message_type, content, mood, created_at and
+                optionally mood_analysis
+        """
+        self.hydrator = hydrator
     
     def get_context(self, user_id: str, session_id: str, user_preferences: Dict = None) -> ConversationContext:
-        """Get or create conversation context for a session"""
-        if session_id not in self.active_contexts:
-            self.active_contexts[session_id] = ConversationContext(
-                user_id=user_id,
-                session_id=session_id,
-                user_preferences=user_preferences
-            )
-        return self.active_contexts[session_id]
+        """Get conversation context for a session, rebuilding it from stored messages on a miss"""
+        context = self.store.get_context(session_id)
+        if context is None:
+            context = self._hydrate(user_id, session_id, user_preferences)
+        return context
+    
+    def _hydrate(self, user_id: str, session_id: str, user_preferences: Optional[Dict]) -> ConversationContext:
+        """Single-flight per session: concurrent misses wait for one query and share its result"""
+        with self.hydration_lock:
+            flight = self.hydrations.setdefault(session_id, [threading.Lock(), 0])
+            flight[1] += 1
+        try:
+            with flight[0]:
+                context = self.store.get_context(session_id)
+                if context is not None:
+                    with self.hydration_lock:
+                        self.hydration_stats['coalesced'] += 1
+                    return context
+                context = self._build_from_messages(user_id, session_id, user_preferences)
+                if context is None:
+                    # Not stored, so the next turn retries instead of keeping an empty history until TTL
+                    return ConversationContext(user_id, session_id, user_preferences)
+                # create_context() keeps a context another worker stored meanwhile
+                return self.store.create_context(context)
+        finally:
+            with self.hydration_lock:
+                flight[1] -= 1
+                if not flight[1]:
+                    del self.hydrations[session_id]
     
-    def update_context(self, session_id: str, message: Dict, mood: str = None, confidence: float = None):
-        """Update context with new message and mood"""
-        if session_id in self.active_contexts:
-            context = self.active_contexts[session_id]
-            context.add_message(message)
-            
-            if mood:
-                context.update_mood(mood, confidence or 0.0)
+    def _build_from_messages(self, user_id: str, session_id: str, user_preferences: Optional[Dict]) -> Optional[ConversationContext]:
+        """Replay the session's last stored messages into a new context; None if they could not be loaded"""
+        context = ConversationContext(user_id, session_id, user_preferences)
+        if self.hydrator is None:
+            return context
+        
+        try:
+            messages = self.hydrator(session_id, self.hydration_limit) or []
+        except Exception as e:
+            print(f"Warning: Context hydration failed for {session_id}: {e}")
+            with self.hydration_lock:
+                self.hydration_stats['failed'] += 1
+            return None
+        
+        # Only user turns, which is all update_context records for a live session
+        messages = [message for message in messages if message.get('message_type') == 'user']
+        for message in messages:
+            timestamp = _to_epoch(message.get('created_at'))
+            context.add_message(message, timestamp)
+            if message.get('mood'):
+                mood_analysis = message.get('mood_analysis') or {}
+                context.update_mood(message['mood'], mood_analysis.get('confidence', 0.0), timestamp)
+        
+        if messages:
+            with self.hydration_lock:
+                self.hydration_stats['hydrated'] += 1
+                self.hydration_stats['hydrated_messages'] += len(messages)
+        return context
+    
+    def update_context(self, session_id: str, message: Dict, mood: str = None, confidence: float = None) -> Optional[ConversationContext]:
+        """Update context with new message and mood, returning the updated context"""
+        # Epoch seconds all the way into the store; only to_dict() formats them
+        now = time.time()
+        mood_entry = None
+        if mood:
+            mood_entry = {'mood': mood, 'confidence': confidence or 0.0, 'timestamp': now}
+        
+        return self.store.append_context(
+            session_id,
+            {**message, 'timestamp': now},
+            mood_entry,
+            MAX_CONVERSATION_HISTORY,
+            MAX_MOOD_HISTORY
+        )
     
     def cleanup_old_contexts(self, max_age_hours: int = 24):
         """Clean up old conversation contexts"""
         cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
-        
-        to_remove = []
-        for session_id, context in self.active_contexts.items():
-            if context.last_activity < cutoff_time:
-                to_remove.append(session_id)
-        
-        for session_id in to_remove:
-            del self.active_contexts[session_id]
+        return self.store.cleanup(cutoff_time.timestamp())
     
-    def get_context_summary(self, session_id: str) -> Dict:
+    def get_context_summary(self, session_id: str, context: Optional[ConversationContext] = None) -> Dict:
         """Get a summary of conversation context"""
-        if session_id not in self.active_contexts:
-            return {'error': 'Context not found'}
+        if context is None:
+            context = self.store.get_context(session_id)
+            if context is None:
+                return {'error': 'Context not found'}
         
-        context = self.active_contexts[session_id]
+        mood_trend = context.get_mood_trend()
+        should_redirect = context.should_redirect(mood_trend)
         return {
             'session_id': session_id,
             'user_id': context.user_id,
             'current_mood': context.current_mood,
-            'mood_trend': context.get_mood_trend(),
+            'mood_trend': mood_trend,
             'topics_count': len(context.topics_discussed),
             'educational_topics_count': len(context.educational_topics_covered),
             'message_count': len(context.conversation_history),
-            'should_redirect': context.should_redirect(),
-            'redirect_suggestions': context.get_redirect_suggestions() if context.should_redirect() else [],
-            'last_activity': context.last_activity.isoformat()
+            'should_redirect': should_redirect,
+            'redirect_suggestions': context.get_redirect_suggestions() if should_redirect else [],
+            'last_activity': _to_iso(context.last_activity)
         }
+    
+    def record_stored_messages(self, session_id: str, moods: List[Optional[str]]):
+        """
+        Fold newly stored messages into the session's mood stats, if this process tracks them
+        
+        Args:
+            session_id (str): Chat session ID
+            moods (List[Optional[str]]): Mood of each stored message, oldest first
+        """
+        with self.session_moods_lock:
+            stats = self.session_moods.get(session_id)
+            if stats is None:
+                # Seeded from the database on the next read
+                return
+            for mood in moods:
+                stats.add_message(mood)
+    
+    def get_session_mood_stats(self, session_id: str, message_count: int) -> Optional[Dict]:
+        """
+        Get session mood stats if they cover exactly the messages stored for the session
+        
+        Args:
+            session_id (str): Chat session ID
+            message_count (int): Number of messages currently stored for the session
+        
+        Returns:
+            Optional[Dict]: Stats snapshot, or None if they are missing or out of date
+                (e.g. messages were stored by another worker) and must be seeded
+        """
+        with self.session_moods_lock:
+            stats = self.session_moods.get(session_id)
+            if stats is None or stats.message_count != message_count:
+                return None
+            self.session_moods.move_to_end(session_id)
+            return self._snapshot(stats)
+    
+    def seed_session_mood_stats(self, session_id: str, moods: List[Optional[str]]) -> Dict:
+        """
+        Rebuild session mood stats from every stored message
+        
+        Args:
+            session_id (str): Chat session ID
+            moods (List[Optional[str]]): Mood of each stored message, oldest first
+        
+        Returns:
+            Dict: Stats snapshot
+        """
+        stats = SessionMoodStats()
+        for mood in moods:
+            stats.add_message(mood)
+        
+        with self.session_moods_lock:
+            self.session_moods[session_id] = stats
+            self.session_moods.move_to_end(session_id)
+            while len(self.session_moods) > self.max_session_moods:
+                self.session_moods.popitem(last=False)
+            return self._snapshot(stats)
+    
+    @staticmethod
+    def _snapshot(stats: SessionMoodStats) -> Dict:
+        return {
+            'mood_counts': dict(stats.counts),
+            'mood_changes': stats.transitions,
+            'mood_total': stats.total,
+            'primary_mood': stats.primary_mood(),
+            'trend': stats.trend(),
+            'message_count': stats.message_count
+        }
+    
+    def get_stats(self) -> Dict:
+        """Get storage backend statistics"""
+        stats = self.store.get_stats()
+        with self.session_moods_lock:
+            stats['session_mood_stats'] = len(self.session_moods)
+        with self.hydration_lock:
+            stats['hydration'] = dict(self.hydration_stats)
+        return stats
 
 # Global context manager instance
 context_manager = ConversationContextManager()
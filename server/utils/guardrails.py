@@ -3,12 +3,431 @@ Comprehensive Guardrails Service
 Combines PII detection, toxicity detection, and input validation
 Now includes educational responses instead of blocking
 """
-from typing import Dict, Tuple, Optional, List
-from .pii_guard import pii_guard
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Tuple, Optional, List, Callable, Any
+from .pii_guard import pii_guard, PIIDetection
 from .input_guard import input_guard
 from .llm_mood_analysis import llm_mood_analyzer
 from .llm_response_generator import llm_response_generator
 from .conversation_context import context_manager
+from .keyword_matcher import KeywordMatcher
+
+# Declared stage costs; cheaper stages run first so a terminal verdict can skip the rest
+STAGE_COST_VALIDATION = 0
+STAGE_COST_REGEX = 1
+STAGE_COST_CPU_MODEL = 2
+STAGE_COST_NETWORK = 3
+
+# Educational content categories, in precedence order when several match
+CONTENT_TYPE_KEYWORDS = {
+    'nudity': ['nude', 'naked', 'nudity', 'explicit'],
+    'violence': ['violence', 'kill', 'murder', 'weapon', 'fight'],
+    'drugs': ['drug', 'alcohol', 'substance', 'intoxicated'],
+    'illegal': ['illegal', 'crime', 'steal', 'fraud'],
+    'hate': ['hate', 'discriminate', 'racist', 'sexist']
+}
+
+
+class AnalysisContext:
+    """Per-message analysis state shared by every guardrail stage"""
+    
+    def __init__(self, message: str, user_id: Optional[str] = None, session_id: Optional[str] = None, user_preferences: Optional[Dict] = None):
+        """
+        Initialize the analysis context for a single message
+        
+        Args:
+            message (str): User message being analyzed
+            user_id (str, optional): User ID
+            session_id (str, optional): Chat session ID
+            user_preferences (Dict, optional): User's onboarding preferences
+        """
+        self.message = message
+        self.user_id = user_id
+        self.session_id = session_id
+        self.user_preferences = user_preferences
+        self.stage_results = {}
+        self.executed_stages = []
+        self.memo_hits = []
+        self.cache_hits = []
+        self.prefetched = set()
+        self.timed_out_stages = []
+        self.stage_timings = {}
+        self.listeners = []
+        self.lock = threading.Lock()
+    
+    def add_listener(self, listener: Callable[[str, Any], None]):
+        """Register a callback invoked with (stage_name, result) when a stage result is first known"""
+        self.listeners.append(listener)
+    
+    def notify(self, stage_name: str, result: Any):
+        """Pass a new stage result to every listener"""
+        for listener in self.listeners:
+            try:
+                listener(stage_name, result)
+            except Exception as e:
+                print(f"Warning: Guardrail listener failed for stage {stage_name}: {e}")
+    
+    def has_result(self, stage_name: str) -> bool:
+        """Check whether a stage has already produced a result"""
+        return stage_name in self.stage_results
+    
+    def set_result(self, stage_name: str, result: Any) -> bool:
+        """
+        Record a stage result produced outside the pipeline, e.g. mood from a fused LLM call
+        
+        Args:
+            stage_name (str): Stage the result belongs to
+            result (Any): Stage result
+        
+        Returns:
+            bool: True if recorded, False if the stage already had a result
+        """
+        with self.lock:
+            if self.has_result(stage_name):
+                return False
+            self.stage_results[stage_name] = result
+            self.executed_stages.append(stage_name)
+        self.notify(stage_name, result)
+        return True
+    
+    def to_report(self) -> Dict:
+        """Summarize which stages ran and which were served from memo"""
+        return {
+            'executed_stages': list(self.executed_stages),
+            'memoized_stages': list(self.memo_hits),
+            'cached_stages': list(self.cache_hits),
+            'timed_out_stages': list(self.timed_out_stages),
+            'stage_timings': dict(self.stage_timings)
+        }
+
+
+class VerdictCache:
+    """Bounded LRU cache with TTL for deterministic guardrail stage results"""
+    
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024, ttl_seconds: float = 600.0):
+        """
+        Args:
+            max_entries (int): Hard cap on cached entries
+            max_bytes (int): Hard cap on the estimated size of cached results
+            ttl_seconds (float): Lifetime of a cached result
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()  # key -> (expires_at, size, result)
+        self.current_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    @staticmethod
+    def fingerprint(stage_name: str, text: str, config_version: int) -> str:
+        """
+        Hash a stage name, normalized message and config version into a cache key
+        
+        Only Unicode normalization (NFC) is applied: casing and whitespace are kept
+        because validation stats and PII span offsets depend on them.
+        """
+        normalized = unicodedata.normalize('NFC', text)
+        digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        return f"{stage_name}:{config_version}:{digest}"
+    
+    @staticmethod
+    def _estimate_size(key: str, result: Any) -> int:
+        """Approximate the memory held by a cached entry"""
+        if hasattr(result, 'to_dict'):
+            result = result.to_dict()
+        try:
+            return len(key) + len(json.dumps(result, default=str))
+        except (TypeError, ValueError):
+            return len(key) + len(str(result))
+    
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Look up a key, returning (hit, result)"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            
+            expires_at, size, result = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                self.current_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, result
+    
+    def put(self, key: str, result: Any):
+        """Store a result, evicting least recently used entries to stay under the caps"""
+        size = self._estimate_size(key, result)
+        if size > self.max_bytes:
+            return
+        
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, size, result)
+            self.current_bytes += size
+            
+            while len(self.entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self.entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every cached result"""
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+    
+    def get_stats(self) -> Dict:
+        """Get hit, miss and eviction counters plus current usage"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.current_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+def _is_error_result(result: Any) -> bool:
+    """Check whether a stage result records a failure instead of a verdict"""
+    if isinstance(result, dict):
+        return 'error' in result
+    return bool(getattr(result, 'error', None))
+
+
+class GuardrailStage:
+    """A named unit of guardrail work that reads and writes an AnalysisContext"""
+    
+    def __init__(self, name: str, run: Callable[[AnalysisContext], Any], cost: int = STAGE_COST_VALIDATION, terminal: Optional[Callable[[AnalysisContext], Optional[str]]] = None, may_terminate: Optional[Callable[[], bool]] = None, cacheable: bool = False):
+        """
+        Args:
+            name (str): Stage name used as the memo key
+            run (Callable): Computes the stage result from the analysis context
+            cost (int): Declared cost tier used for ordering (STAGE_COST_*)
+            terminal (Callable, optional): Returns a reason when the stage result ends processing
+            may_terminate (Callable, optional): Whether the stage can end processing under the current config
+            cacheable (bool): Result depends only on the message text and config, so it can be cached
+        """
+        self.name = name
+        self.run = run
+        self.cost = cost
+        self.terminal = terminal
+        self.may_terminate = may_terminate or (lambda: terminal is not None)
+        self.cacheable = cacheable
+
+
+class GuardrailPipeline:
+    """Runs guardrail stages on demand and memoizes their results per message"""
+    
+    def __init__(self, stages: List[GuardrailStage], cache: Optional[VerdictCache] = None, cache_version: Optional[Callable[[], int]] = None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache = cache
+        self.cache_version = cache_version or (lambda: 0)
+    
+    def plan(self, stage_names: List[str], cost_overrides: Optional[Dict[str, int]] = None) -> List[List[str]]:
+        """
+        Order stages by declared cost and group them into batches
+        
+        Stages of increasing cost are merged into one batch until a stage that
+        may produce a terminal verdict is reached; that stage's cost tier closes
+        the batch so everything costlier waits for its verdict.
+        
+        Args:
+            stage_names (List[str]): Stages to schedule
+            cost_overrides (Dict[str, int], optional): Tuned costs by stage name
+        
+        Returns:
+            List[List[str]]: Batches of stages in execution order
+        """
+        cost_overrides = cost_overrides or {}
+        
+        def cost_of(name: str) -> int:
+            return cost_overrides.get(name, self.stages[name].cost)
+        
+        ordered = sorted(stage_names, key=cost_of)
+        batches = []
+        current = []
+        closing_cost = None
+        for name in ordered:
+            if closing_cost is not None and cost_of(name) > closing_cost:
+                batches.append(current)
+                current = []
+                closing_cost = None
+            current.append(name)
+            if self.stages[name].may_terminate():
+                closing_cost = cost_of(name)
+        if current:
+            batches.append(current)
+        return batches
+    
+    def run_stage(self, context: AnalysisContext, stage_name: str) -> Any:
+        """
+        Get a stage result, computing it only if this context has not seen it yet
+        
+        Args:
+            context (AnalysisContext): Per-message analysis context
+            stage_name (str): Registered stage name
+        
+        Returns:
+            Any: Stage result
+        """
+        with context.lock:
+            if context.has_result(stage_name):
+                if stage_name in context.prefetched:
+                    # First read of a result computed ahead of time by the executor
+                    context.prefetched.discard(stage_name)
+                else:
+                    context.memo_hits.append(stage_name)
+                return context.stage_results[stage_name]
+        
+        stage = self.stages.get(stage_name)
+        if stage is None:
+            raise KeyError(f"Unknown guardrail stage: {stage_name}")
+        
+        cache_key = None
+        if stage.cacheable and self.cache is not None:
+            cache_key = VerdictCache.fingerprint(stage_name, context.message, self.cache_version())
+            hit, cached = self.cache.get(cache_key)
+            if hit:
+                with context.lock:
+                    is_new = not context.has_result(stage_name)
+                    if is_new:
+                        context.stage_results[stage_name] = cached
+                        context.cache_hits.append(stage_name)
+                    result = context.stage_results[stage_name]
+                if is_new:
+                    context.notify(stage_name, result)
+                return result
+        
+        started = time.perf_counter()
+        result = stage.run(context)
+        elapsed = time.perf_counter() - started
+        
+        if cache_key and not _is_error_result(result):
+            self.cache.put(cache_key, result)
+        
+        with context.lock:
+            if context.has_result(stage_name):
+                # A timed-out stage finished late; keep the value callers already saw
+                return context.stage_results[stage_name]
+            context.stage_results[stage_name] = result
+            context.executed_stages.append(stage_name)
+            context.stage_timings[stage_name] = round(elapsed, 4)
+        context.notify(stage_name, result)
+        return result
+
+
+class ConcurrentStageExecutor:
+    """
+    Fans independent guardrail stages out over a thread pool sized to the message's stages
+    
+    Each fan-out gets its own pool, so a stage stuck past its timeout only holds its own
+    thread and cannot starve the stages of later messages.
+    """
+    
+    def __init__(self, pipeline: GuardrailPipeline):
+        self.pipeline = pipeline
+        self.lock = threading.Lock()
+        self.abandoned = 0  # stage calls still running after their timeout
+    
+    def run(self, context: AnalysisContext, stage_names: List[str], deadline_seconds: float, stage_timeouts: Dict[str, float], fallbacks: Dict[str, Callable[[], Any]]) -> Dict[str, str]:
+        """
+        Run stages concurrently and store their results in the analysis context
+        
+        Args:
+            context (AnalysisContext): Per-message analysis context
+            stage_names (List[str]): Stages to run; they must not depend on each other
+            deadline_seconds (float): Overall wall-clock budget for the whole fan-out
+            stage_timeouts (Dict[str, float]): Per-stage timeouts in seconds
+            fallbacks (Dict[str, Callable]): Factories for results of stages that time out or fail
+        
+        Returns:
+            Dict[str, str]: Status per stage ('ok', 'memo', 'timeout' or 'error')
+        """
+        statuses = {}
+        started = time.monotonic()
+        deadline = started + deadline_seconds
+        
+        pending = []
+        for name in stage_names:
+            if context.has_result(name):
+                statuses[name] = 'memo'
+            else:
+                pending.append(name)
+        if not pending:
+            return statuses
+        
+        pool = ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix='guardrail-stage')
+        try:
+            futures = {name: pool.submit(self.pipeline.run_stage, context, name) for name in pending}
+            for name, future in futures.items():
+                stage_deadline = min(deadline, started + stage_timeouts.get(name, deadline_seconds))
+                try:
+                    future.result(timeout=max(0.0, stage_deadline - time.monotonic()))
+                    statuses[name] = 'ok'
+                except FutureTimeoutError:
+                    statuses[name] = 'timeout'
+                    context.timed_out_stages.append(name)
+                    if not future.cancel():
+                        self._track_abandoned(future)
+                except Exception:
+                    statuses[name] = 'error'
+                
+                # Only stages with a safe default get one; callers must handle the others.
+                # Recorded like any other result so listeners and the report see it
+                fallback = fallbacks.get(name) if statuses[name] != 'ok' else None
+                if fallback and not context.has_result(name):
+                    context.set_result(name, fallback())
+                
+                with context.lock:
+                    if context.has_result(name):
+                        context.prefetched.add(name)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        
+        return statuses
+    
+    def _track_abandoned(self, future):
+        with self.lock:
+            self.abandoned += 1
+        future.add_done_callback(self._release_abandoned)
+    
+    def _release_abandoned(self, future):
+        with self.lock:
+            self.abandoned -= 1
+    
+    def get_stats(self) -> Dict:
+        """Get the number of timed-out stage calls still running"""
+        with self.lock:
+            return {'abandoned_stage_calls': self.abandoned}
+
 
 class GuardrailsService:
     def __init__(self):
@@ -23,10 +442,210 @@ class GuardrailsService:
             'enable_pii_scrubbing': True,
             'enable_toxicity_detection': True,
             'enable_input_validation': True,
-            'block_on_high_risk': True
+            'block_on_high_risk': True,
+            'enable_concurrent_stages': True,
+            'stage_deadline_seconds': 12.0,
+            'stage_timeouts': {
+                'mood': 10.0,
+                'toxicity': 5.0,
+                'pii': 5.0,
+                'restricted_content': 1.0
+            },
+            'stage_costs': {}
+        }
+        self.config_version = 0
+        
+        self.content_type_matcher = KeywordMatcher({
+            keyword: content_type
+            for content_type, type_keywords in CONTENT_TYPE_KEYWORDS.items()
+            for keyword in type_keywords
+        })
+        self.content_type_matcher.build()
+        
+        self.verdict_cache = VerdictCache(
+            max_entries=int(os.getenv('GUARDRAIL_CACHE_MAX_ENTRIES', '10000')),
+            max_bytes=int(os.getenv('GUARDRAIL_CACHE_MAX_BYTES', str(16 * 1024 * 1024))),
+            ttl_seconds=float(os.getenv('GUARDRAIL_CACHE_TTL_SECONDS', '600'))
+        )
+        
+        self.pipeline = GuardrailPipeline([
+            GuardrailStage('conversation', self._stage_conversation),
+            GuardrailStage('history', self._stage_history),
+            GuardrailStage('mood', self._stage_mood, cost=STAGE_COST_NETWORK),
+            GuardrailStage(
+                'validation', self._stage_validation,
+                cost=STAGE_COST_VALIDATION,
+                terminal=self._validation_verdict,
+                may_terminate=lambda: self.config['enable_input_validation'],
+                cacheable=True
+            ),
+            GuardrailStage('toxicity', self._stage_toxicity, cost=STAGE_COST_CPU_MODEL, cacheable=True),
+            GuardrailStage('restricted_content', self._stage_restricted_content, cost=STAGE_COST_REGEX, cacheable=True),
+            GuardrailStage(
+                'pii', self._stage_pii,
+                cost=STAGE_COST_CPU_MODEL,
+                terminal=self._pii_verdict,
+                may_terminate=lambda: not self.config['enable_pii_scrubbing'],
+                cacheable=True
+            ),
+            GuardrailStage('pii_summary', self._stage_pii_summary)
+        ], cache=self.verdict_cache, cache_version=lambda: self.config_version)
+        self.executor = ConcurrentStageExecutor(self.pipeline)
+        
+        # Safety stages that must complete; a message is blocked rather than let through unchecked
+        self.required_stages = ('validation', 'toxicity', 'restricted_content', 'pii')
+        
+        # Results used when a concurrent stage misses its timeout; only mood has a safe default
+        self.stage_fallbacks = {
+            'mood': lambda: self._neutral_mood('Mood analysis timed out')
+        }
+    
+    @staticmethod
+    def _neutral_mood(reason: str) -> Dict:
+        """Mood result used when no analysis was run for the message"""
+        return {
+            'mood': 'neutral',
+            'confidence': 0.0,
+            'emotional_indicators': [],
+            'context_analysis': reason,
+            'sensitivity_level': 'low',
+            'support_needed': False
         }
     
-    def process_message(self, message: str, user_id: Optional[str] = None, session_id: Optional[str] = None, user_preferences: Optional[Dict] = None) -> Dict:
+    @staticmethod
+    def _mood_skipped(guardrails_results: Dict) -> bool:
+        """Blocked, invalid or short-circuited messages never pay for an LLM mood call"""
+        return bool(
+            guardrails_results.get('validation_failed')
+            or guardrails_results.get('should_block')
+            or 'mood' in guardrails_results.get('skipped_stages', [])
+        )
+    
+    def run_scheduled_stages(self, analysis: AnalysisContext, stage_names: List[str], early_exit: bool = True) -> Dict:
+        """
+        Run stages cheapest first, stopping at the first terminal verdict
+        
+        Args:
+            analysis (AnalysisContext): Per-message analysis context
+            stage_names (List[str]): Stages to run
+            early_exit (bool): Skip the remaining stages once one returns a terminal verdict
+        
+        Returns:
+            Dict: Stage statuses, skipped stages and the terminal stage, if any
+        """
+        schedule = {
+            'statuses': {},
+            'skipped_stages': [],
+            'terminal_stage': None,
+            'terminal_reason': None
+        }
+        
+        batches = self.pipeline.plan(stage_names, self.config['stage_costs'])
+        for index, batch in enumerate(batches):
+            if len(batch) > 1 and self.config['enable_concurrent_stages']:
+                schedule['statuses'].update(self.run_concurrent_stages(analysis, batch))
+            else:
+                for name in batch:
+                    self.analyze(analysis, name)
+                    schedule['statuses'][name] = 'ok'
+            
+            if not early_exit:
+                continue
+            
+            for name in batch:
+                stage = self.pipeline.stages[name]
+                reason = stage.terminal(analysis) if stage.terminal and analysis.has_result(name) else None
+                if reason:
+                    schedule['terminal_stage'] = name
+                    schedule['terminal_reason'] = reason
+                    break
+            
+            if schedule['terminal_stage']:
+                schedule['skipped_stages'] = [name for later in batches[index + 1:] for name in later]
+                break
+        
+        return schedule
+    
+    def create_analysis(self, message: str, user_id: Optional[str] = None, session_id: Optional[str] = None, user_preferences: Optional[Dict] = None) -> AnalysisContext:
+        """Create a fresh per-message analysis context"""
+        return AnalysisContext(message, user_id, session_id, user_preferences)
+    
+    def analyze(self, analysis: AnalysisContext, stage_name: str) -> Any:
+        """Get a memoized stage result for this message"""
+        return self.pipeline.run_stage(analysis, stage_name)
+    
+    def run_concurrent_stages(self, analysis: AnalysisContext, stage_names: List[str]) -> Dict[str, str]:
+        """
+        Run independent stages in parallel under the configured deadline
+        
+        Args:
+            analysis (AnalysisContext): Per-message analysis context
+            stage_names (List[str]): Independent stages to fan out
+        
+        Returns:
+            Dict[str, str]: Status per stage
+        """
+        if not self.config['enable_concurrent_stages']:
+            return {}
+        
+        return self.executor.run(
+            analysis,
+            stage_names,
+            self.config['stage_deadline_seconds'],
+            self.config['stage_timeouts'],
+            self.stage_fallbacks
+        )
+    
+    def _stage_conversation(self, analysis: AnalysisContext):
+        """Load the conversation context for the message's session"""
+        if not (analysis.session_id and analysis.user_id):
+            return None
+        return context_manager.get_context(analysis.user_id, analysis.session_id, analysis.user_preferences)
+    
+    def _stage_history(self, analysis: AnalysisContext) -> List[Dict]:
+        """Recent conversation history used by mood analysis"""
+        context = self.analyze(analysis, 'conversation')
+        return context.get_recent_context() if context else []
+    
+    def _stage_mood(self, analysis: AnalysisContext) -> Dict:
+        """LLM mood analysis"""
+        return llm_mood_analyzer.analyze_mood(analysis.message, self.analyze(analysis, 'history'))
+    
+    def _stage_validation(self, analysis: AnalysisContext) -> Dict:
+        """Input validation rules"""
+        return self.input_guard.validate_input(analysis.message)
+    
+    def _stage_toxicity(self, analysis: AnalysisContext) -> Dict:
+        """Detoxify toxicity scoring"""
+        return self.input_guard.detect_toxicity(analysis.message, self.config['toxicity_threshold'])
+    
+    def _stage_restricted_content(self, analysis: AnalysisContext) -> Dict:
+        """Restricted keyword and spam scanning"""
+        return self.input_guard.check_restricted_content(analysis.message)
+    
+    def _stage_pii(self, analysis: AnalysisContext) -> PIIDetection:
+        """Presidio and custom-pattern PII detection"""
+        return self.pii_guard.analyze(analysis.message)
+    
+    def _stage_pii_summary(self, analysis: AnalysisContext) -> Dict:
+        """PII summary derived from the detection stage"""
+        return self.pii_guard.get_pii_summary(analysis.message, detection=self.analyze(analysis, 'pii'))
+    
+    def _validation_verdict(self, analysis: AnalysisContext) -> Optional[str]:
+        """Failed validation blocks the message"""
+        if not analysis.stage_results['validation']['is_valid']:
+            return 'Input validation failed'
+        return None
+    
+    def _pii_verdict(self, analysis: AnalysisContext) -> Optional[str]:
+        """PII blocks the message when scrubbing is disabled"""
+        if self.config['enable_pii_scrubbing']:
+            return None
+        if self.analyze(analysis, 'pii_summary').get('has_pii', False):
+            return 'Message contains PII and scrubbing is disabled'
+        return None
+    
+    def process_message(self, message: str, user_id: Optional[str] = None, session_id: Optional[str] = None, user_preferences: Optional[Dict] = None, analysis: Optional[AnalysisContext] = None, schedule_mood: bool = True) -> Dict:
         """
         Process a message through all guardrails with educational responses
         
@@ -35,10 +654,15 @@ class GuardrailsService:
             user_id (str, optional): User ID for logging
             session_id (str, optional): Chat session ID for context
             user_preferences (Dict, optional): User's onboarding preferences
-            
+            analysis (AnalysisContext, optional): Shared analysis context to reuse stage results
+            schedule_mood (bool): Run mood analysis up front; when False it only runs if restricted content needs it
+        
         Returns:
             Dict: Processing results with safety status and educational responses
         """
+        if analysis is None:
+            analysis = self.create_analysis(message, user_id, session_id, user_preferences)
+        
         results = {
             'original_message': message,
             'processed_message': message,
@@ -54,20 +678,50 @@ class GuardrailsService:
             'toxicity_detected': False,
             'validation_failed': False,
             'risk_level': 'LOW',
-            'processing_log': []
+            'processing_log': [],
+            'memoized_stages': analysis.memo_hits,
+            'cached_stages': analysis.cache_hits,
+            'stage_timings': analysis.stage_timings,
+            'skipped_stages': []
         }
         
         try:
-            conversation_history = []
-            if session_id and user_id:
-                context = context_manager.get_context(user_id, session_id, user_preferences)
-                conversation_history = context.get_recent_context()
+            stage_names = ['restricted_content', 'pii']
+            if schedule_mood:
+                stage_names.append('mood')
+            if self.config['enable_input_validation']:
+                stage_names.append('validation')
+            if self.config['enable_toxicity_detection']:
+                stage_names.append('toxicity')
+            self.analyze(analysis, 'conversation')
+            schedule = self.run_scheduled_stages(analysis, stage_names)
+            incomplete_safety_stages = []
+            for stage_name, status in schedule['statuses'].items():
+                if status in ('timeout', 'error'):
+                    results['warnings'].append(f"Guardrail stage '{stage_name}' did not complete ({status})")
+                    results['processing_log'].append(f"Stage {stage_name} {status}")
+                    if stage_name in self.required_stages and not analysis.has_result(stage_name):
+                        incomplete_safety_stages.append(stage_name)
+            if incomplete_safety_stages:
+                # Fail closed: the message was never checked by these stages
+                print(f"Warning: Blocking message, safety stages did not complete: {', '.join(incomplete_safety_stages)}")
+                results['should_block'] = True
+                results['is_safe'] = False
+                results['risk_level'] = 'HIGH'
+                results['warnings'].append("Safety checks could not be completed; please try again")
+                results['processing_log'].append(f"Blocked: incomplete safety stages {', '.join(incomplete_safety_stages)}")
+                return results
+            if schedule['skipped_stages']:
+                results['skipped_stages'] = schedule['skipped_stages']
+                results['processing_log'].append(
+                    f"Skipped stages after {schedule['terminal_stage']} verdict: {', '.join(schedule['skipped_stages'])}"
+                )
             
-            mood_analysis = llm_mood_analyzer.analyze_mood(message, conversation_history)
+            mood_analysis = self.analyze(analysis, 'mood') if analysis.has_result('mood') else None
             results['mood_analysis'] = mood_analysis
             
             if self.config['enable_input_validation']:
-                validation_results = self.input_guard.validate_input(message)
+                validation_results = self.analyze(analysis, 'validation')
                 if not validation_results['is_valid']:
                     results['validation_failed'] = True
                     results['should_block'] = True
@@ -76,11 +730,8 @@ class GuardrailsService:
                     return results
             
             toxicity_detected = False
-            if self.config['enable_toxicity_detection']:
-                toxicity_results = self.input_guard.detect_toxicity(
-                    message, 
-                    self.config['toxicity_threshold']
-                )
+            if self.config['enable_toxicity_detection'] and analysis.has_result('toxicity'):
+                toxicity_results = self.analyze(analysis, 'toxicity')
                 
                 if toxicity_results.get('is_toxic', False):
                     results['toxicity_detected'] = True
@@ -90,8 +741,11 @@ class GuardrailsService:
                     )
                     results['processing_log'].append("Toxicity detected")
             
-            content_results = self.input_guard.check_restricted_content(message)
-            if content_results['has_restricted_content']:
+            content_results = self.analyze(analysis, 'restricted_content')
+            if content_results['has_restricted_content'] and 'mood' not in results['skipped_stages']:
+                # Educational responses are tailored to mood, so a deferred mood runs now
+                mood_analysis = self.analyze(analysis, 'mood')
+                results['mood_analysis'] = mood_analysis
                 results['response_type'] = 'educational'
                 results['educational_response'] = self._generate_educational_response(
                     content_results, user_preferences, mood_analysis
@@ -102,7 +756,7 @@ class GuardrailsService:
                 results['is_safe'] = True  
             
             #PII Detection and Scrubbing
-            pii_summary = self.pii_guard.get_pii_summary(message)
+            pii_summary = self.analyze(analysis, 'pii_summary')
             if pii_summary.get('has_pii', False):
                 results['pii_detected'] = True
                 results['warnings'].append(
@@ -111,7 +765,9 @@ class GuardrailsService:
                 results['processing_log'].append("PII detected")
                 
                 if self.config['enable_pii_scrubbing']:
-                    scrubbed_message, scrub_info = self.pii_guard.scrub_pii(message)
+                    scrubbed_message, scrub_info = self.pii_guard.scrub_pii(
+                        message, detection=self.analyze(analysis, 'pii')
+                    )
                     results['processed_message'] = scrubbed_message
                     results['pii_scrubbed'] = True
                     results['processing_log'].append("PII scrubbed from message")
@@ -138,7 +794,7 @@ class GuardrailsService:
                 results['risk_level'] = 'LOW'
             
             results['processing_log'].append(f"Processing complete - Risk level: {results['risk_level']}")
-            
+        
         except Exception as e:
             results['should_block'] = True
             results['warnings'].append(f"Guardrails processing failed: {str(e)}")
@@ -178,22 +834,16 @@ class GuardrailsService:
         return educational_response
     
     def _classify_content_type(self, keywords: List[str]) -> str:
-        """Classify content type based on keywords"""
-        keyword_mapping = {
-            'nudity': ['nude', 'naked', 'nudity', 'explicit'],
-            'violence': ['violence', 'kill', 'murder', 'weapon', 'fight'],
-            'drugs': ['drug', 'alcohol', 'substance', 'intoxicated'],
-            'illegal': ['illegal', 'crime', 'steal', 'fraud'],
-            'hate': ['hate', 'discriminate', 'racist', 'sexist']
-        }
+        """Classify content type based on keywords, earlier categories taking precedence"""
+        matched_types = set(self.content_type_matcher.find_payloads(' '.join(keywords)))
         
-        for content_type, type_keywords in keyword_mapping.items():
-            if any(keyword in ' '.join(keywords).lower() for keyword in type_keywords):
+        for content_type in CONTENT_TYPE_KEYWORDS:
+            if content_type in matched_types:
                 return content_type
         
         return 'general'
     
-    def process_message_v2(self, message: str, user_id: str, session_id: str, user_preferences: Dict = None) -> Dict:
+    def process_message_v2(self, message: str, user_id: str, session_id: str, user_preferences: Dict = None, analysis: Optional[AnalysisContext] = None, defer_mood: bool = False) -> Dict:
         """
         Enhanced message processing with mood analysis and educational responses
         
@@ -202,27 +852,62 @@ class GuardrailsService:
             user_id (str): User ID
             session_id (str): Session ID
             user_preferences (Dict): User preferences
-            
+            analysis (AnalysisContext, optional): Pre-built context, e.g. with listeners attached
+            defer_mood (bool): Leave mood to the caller (e.g. a fused mood-and-reply LLM call) unless a
+                guardrail needs it; results then carry mood_deferred and must be passed to complete_message_v2
+        
         Returns:
             Dict: Enhanced processing results
         """
-        context = context_manager.get_context(user_id, session_id, user_preferences)
-        conversation_history = context.get_recent_context()
+        if analysis is None:
+            analysis = self.create_analysis(message, user_id, session_id, user_preferences)
+        self.analyze(analysis, 'conversation')
         
         guardrails_results = self.process_message(
-            message, user_id, session_id, user_preferences
+            message, user_id, session_id, user_preferences, analysis=analysis, schedule_mood=not defer_mood
         )
         
-        mood_analysis = llm_mood_analyzer.analyze_mood(message, conversation_history)
+        if defer_mood and not analysis.has_result('mood') and not self._mood_skipped(guardrails_results):
+            return {
+                **guardrails_results,
+                'mood_deferred': True,
+                'original_message': message,
+                'memoized_stages': analysis.memo_hits
+            }
+        
+        return self.complete_message_v2(analysis, guardrails_results)
+    
+    def complete_message_v2(self, analysis: AnalysisContext, guardrails_results: Dict, mood_analysis: Optional[Dict] = None) -> Dict:
+        """
+        Finish v2 processing once mood is known: update the conversation context and build guidance
+        
+        Args:
+            analysis (AnalysisContext): Analysis context used for the guardrail pass
+            guardrails_results (Dict): Results from process_message or a deferred process_message_v2
+            mood_analysis (Dict, optional): Mood produced outside the pipeline, recorded as the mood stage result
+        
+        Returns:
+            Dict: Enhanced processing results
+        """
+        if mood_analysis is not None:
+            analysis.set_result('mood', mood_analysis)
+        elif not analysis.has_result('mood') and self._mood_skipped(guardrails_results):
+            analysis.set_result('mood', self._neutral_mood('Mood analysis skipped for blocked message'))
+        
+        message = analysis.message
+        session_id = analysis.session_id
+        context = self.analyze(analysis, 'conversation')
+        mood_analysis = self.analyze(analysis, 'mood')
         current_mood = mood_analysis.get('mood', 'neutral')
         mood_confidence = mood_analysis.get('confidence', 0.0)
         
-        context_manager.update_context(
+        # Later stages read the context as updated by this turn, whichever worker stored it
+        context = context_manager.update_context(
             session_id, 
             {'content': message, 'message_type': 'user'}, 
             current_mood, 
             mood_confidence
-        )
+        ) or context
         
         response_guidance = self._generate_response_guidance(
             guardrails_results, mood_analysis, context
@@ -233,12 +918,14 @@ class GuardrailsService:
         
         return {
             **guardrails_results,
+            'mood_deferred': False,
             'mood_analysis': mood_analysis,
             'response_guidance': response_guidance,
             'should_redirect': should_redirect,
             'redirect_suggestions': redirect_suggestions,
-            'context_summary': context_manager.get_context_summary(session_id),
-            'original_message': message
+            'context_summary': context_manager.get_context_summary(session_id, context),
+            'original_message': message,
+            'memoized_stages': analysis.memo_hits
         }
     
     def _generate_response_guidance(self, guardrails_results: Dict, mood_analysis: Dict, context) -> Dict:
@@ -291,34 +978,42 @@ class GuardrailsService:
         
         return guidance
     
-    def get_safety_report(self, message: str) -> Dict:
+    def get_safety_report(self, message: str, analysis: Optional[AnalysisContext] = None) -> Dict:
         """
         Get a detailed safety report for a message without processing it
         
         Args:
             message (str): Message to analyze
-            
+            analysis (AnalysisContext, optional): Shared analysis context to reuse stage results
+        
         Returns:
             Dict: Detailed safety report
         """
+        if analysis is None:
+            analysis = self.create_analysis(message)
+        
         report = {
             'message_length': len(message),
             'word_count': len(message.split()),
             'analysis_timestamp': None,
-            'safety_checks': {}
+            'safety_checks': {},
+            'memoized_stages': analysis.memo_hits,
+            'cached_stages': analysis.cache_hits
         }
         
         try:
-            toxicity_results = self.input_guard.detect_toxicity(message, self.config['toxicity_threshold'])
+            self.run_scheduled_stages(analysis, ['validation', 'restricted_content', 'toxicity', 'pii'], early_exit=False)
+            
+            toxicity_results = self.analyze(analysis, 'toxicity')
             report['safety_checks']['toxicity'] = toxicity_results
             
-            pii_results = self.pii_guard.detect_pii(message)
+            pii_results = self.analyze(analysis, 'pii').to_dict()
             report['safety_checks']['pii'] = pii_results
             
-            content_results = self.input_guard.check_restricted_content(message)
+            content_results = self.analyze(analysis, 'restricted_content')
             report['safety_checks']['content'] = content_results
             
-            validation_results = self.input_guard.validate_input(message)
+            validation_results = self.analyze(analysis, 'validation')
             report['safety_checks']['validation'] = validation_results
             
             is_safe = (
@@ -343,15 +1038,62 @@ class GuardrailsService:
             
             if pii_results.get('summary', {}).get('has_pii'):
                 report['overall_safety']['recommendations'].append("Message contains PII")
-            
+        
         except Exception as e:
             report['error'] = f"Safety analysis failed: {str(e)}"
         
         return report
     
+    def describe_verdict(self, stage_name: str, result: Any) -> Optional[Dict]:
+        """
+        Summarize a stage result as a small JSON-safe verdict for streaming clients
+        
+        Args:
+            stage_name (str): Stage that produced the result
+            result (Any): Stage result
+        
+        Returns:
+            Optional[Dict]: Verdict, or None for stages that are not client-facing
+        """
+        if _is_error_result(result):
+            return {'stage': stage_name, 'status': 'error'}
+        
+        if stage_name == 'validation':
+            return {'stage': stage_name, 'is_valid': result['is_valid']}
+        if stage_name == 'toxicity':
+            return {
+                'stage': stage_name,
+                'is_toxic': result.get('is_toxic', False),
+                'max_category': result.get('max_category'),
+                'confidence': result.get('confidence', 0.0)
+            }
+        if stage_name == 'restricted_content':
+            return {
+                'stage': stage_name,
+                'has_restricted_content': result['has_restricted_content'],
+                'risk_level': result['risk_level']
+            }
+        if stage_name == 'pii':
+            return {'stage': stage_name, 'has_pii': result.has_pii, 'entity_types': result.entity_types}
+        if stage_name == 'mood':
+            return {'stage': stage_name, 'mood': result.get('mood'), 'confidence': result.get('confidence')}
+        return None
+    
+    def get_stats(self) -> Dict:
+        """Get runtime statistics for the guardrail stages"""
+        return {
+            'toxicity_batching': self.input_guard.get_toxicity_batch_stats(),
+            'verdict_cache': self.verdict_cache.get_stats(),
+            'pii_prefilter': self.pii_guard.get_prefilter_stats(),
+            'concurrent_stages': self.executor.get_stats(),
+            'keyword_matcher': self.input_guard.get_keyword_matcher_stats()
+        }
+    
     def update_config(self, new_config: Dict):
         """Update guardrails configuration"""
         self.config.update(new_config)
+        # Cached verdicts were computed under the old config
+        self.config_version += 1
     
     def get_config(self) -> Dict:
         """Get current guardrails configuration"""
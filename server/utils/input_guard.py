@@ -1,19 +1,28 @@
 """
 Input Guardrails Utility for Toxicity Detection and Input Validation
 """
+import os
 import re
 from typing import Dict, List, Tuple, Optional
-from detoxify import Detoxify
+from .toxicity_backends import create_toxicity_backend
+from .toxicity_batcher import ToxicityBatcher
+from .keyword_matcher import KeywordMatcher
 
 class InputGuard:
     def __init__(self):
         """Initialize toxicity detection and validation rules"""
         try:
-            self.toxicity_model = Detoxify('original')
+            self.toxicity_model = create_toxicity_backend()
+            self.toxicity_batcher = ToxicityBatcher(
+                self.toxicity_model,
+                max_batch_size=int(os.getenv('TOXICITY_BATCH_MAX_SIZE', '16')),
+                max_wait_ms=float(os.getenv('TOXICITY_BATCH_MAX_WAIT_MS', '5'))
+            )
             self.toxicity_initialized = True
         except Exception as e:
             print(f"Warning: Failed to initialize Detoxify: {e}")
             self.toxicity_model = None
+            self.toxicity_batcher = None
             self.toxicity_initialized = False
         
         self.restricted_topics = [
@@ -28,6 +37,40 @@ class InputGuard:
             'drug', 'illegal', 'explicit', 'porn', 'groom'
         ]
         
+        # Whole-word matching needs the inflected forms; matches report the base keyword
+        self.keyword_inflections = {
+            'kill': ['kills', 'killed', 'killing', 'killer', 'killers'],
+            'murder': ['murders', 'murdered', 'murdering', 'murderer'],
+            'suicide': ['suicides', 'suicidal'],
+            'bomb': ['bombs', 'bombed', 'bombing'],
+            'terrorist': ['terrorists', 'terrorism'],
+            'hate': ['hates', 'hated', 'hating', 'hateful'],
+            'discriminate': ['discriminates', 'discriminated', 'discriminating', 'discrimination'],
+            'harass': ['harasses', 'harassed', 'harassing', 'harassment'],
+            'abuse': ['abuses', 'abused', 'abusing', 'abusive'],
+            'violence': ['violent'],
+            'weapon': ['weapons'],
+            'drug': ['drugs', 'drugged'],
+            'illegal': ['illegally'],
+            'porn': ['porno', 'pornography', 'pornographic'],
+            'groom': ['grooms', 'groomed', 'grooming']
+        }
+        
+        self.keyword_matcher = KeywordMatcher()
+        for keyword in self.restricted_keywords:
+            self.keyword_matcher.add(keyword, keyword)
+            for inflection in self.keyword_inflections.get(keyword, []):
+                self.keyword_matcher.add(inflection, keyword)
+        
+        blocklist_path = os.getenv('BLOCKLIST_PATH')
+        if blocklist_path:
+            try:
+                loaded = self.keyword_matcher.load_blocklist(blocklist_path)
+                print(f"Loaded {loaded} blocklist terms from {blocklist_path}")
+            except Exception as e:
+                print(f"Warning: Failed to load blocklist {blocklist_path}: {e}")
+        self.keyword_matcher.build()
+        
         self.validation_rules = {
             'max_length': 2000,
             'min_length': 1,
@@ -44,10 +87,11 @@ class InputGuard:
             r'#\w+',
             r'\b[A-Z]{3,}\b',
         ]
+        self.compiled_spam_patterns = [(pattern, re.compile(pattern)) for pattern in self.spam_patterns]
     
     def detect_toxicity(self, text: str, threshold: float = 0.7) -> Dict:
         """
-        Detect toxicity in text using Detoxify
+        Detect toxicity in text using the configured Detoxify backend
         
         Args:
             text (str): Input text to analyze
@@ -65,7 +109,7 @@ class InputGuard:
             }
         
         try:
-            results = self.toxicity_model.predict(text)
+            results = self.toxicity_batcher.predict(text)
             
             max_score = max(results.values())
             max_category = max(results, key=results.get)
@@ -77,7 +121,8 @@ class InputGuard:
                 'confidence': max_score,
                 'max_category': max_category,
                 'categories': results,
-                'threshold_used': threshold
+                'threshold_used': threshold,
+                'backend': self.toxicity_model.name
             }
             
         except Exception as e:
@@ -88,6 +133,12 @@ class InputGuard:
                 'error': f'Toxicity detection failed: {str(e)}'
             }
     
+    def get_toxicity_batch_stats(self) -> Dict:
+        """Get micro-batching histograms for toxicity inference"""
+        if not self.toxicity_batcher:
+            return {'error': 'Toxicity detection not available'}
+        return self.toxicity_batcher.get_stats()
+    
     def validate_input(self, text: str) -> Dict:
         """
         Validate input text against various rules
@@ -179,16 +230,11 @@ class InputGuard:
         Returns:
             Dict: Restricted content analysis
         """
-        text_lower = text.lower()
-        
-        found_keywords = []
-        for keyword in self.restricted_keywords:
-            if keyword.lower() in text_lower:
-                found_keywords.append(keyword)
+        found_keywords = self.keyword_matcher.find_payloads(text)
         
         spam_detected = []
-        for pattern in self.spam_patterns:
-            matches = re.findall(pattern, text)
+        for pattern, compiled_pattern in self.compiled_spam_patterns:
+            matches = compiled_pattern.findall(text)
             if matches:
                 spam_detected.append({
                     'pattern': pattern,
@@ -219,6 +265,10 @@ class InputGuard:
             'risk_level': self._assess_content_risk(found_keywords, spam_detected)
         }
     
+    def get_keyword_matcher_stats(self) -> Dict:
+        """Get restricted keyword and blocklist automaton size"""
+        return self.keyword_matcher.get_stats()
+    
     def _assess_content_risk(self, keywords: List[str], spam_patterns: List[Dict]) -> str:
         """Assess risk level based on restricted content"""
         if len(keywords) >= 3 or len(spam_patterns) >= 2:
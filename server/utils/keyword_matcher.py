@@ -0,0 +1,216 @@
+"""
+Aho-Corasick Keyword Matcher for Restricted Content and Blocklists
+Whole-word matching in time linear in the message length, independent of list size
+"""
+from collections import deque, namedtuple
+from typing import Dict, List, Optional
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+KeywordMatch = namedtuple('KeywordMatch', ['keyword', 'payload', 'start', 'end'])
+
+
+def _fold(text: str) -> str:
+    """Lowercase text without changing its length so match offsets stay valid"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(char if len(char.lower()) != 1 else char.lower() for char in text)
+
+
+def _is_word_char(char: str) -> bool:
+    """Characters that continue a word, so a keyword next to them is not a whole-word match"""
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    """Case-insensitive Aho-Corasick automaton with word-boundary semantics"""
+    
+    def __init__(self, keywords: Optional[Dict[str, object]] = None):
+        """
+        Initialize an empty automaton, optionally seeded with keywords
+        
+        Args:
+            keywords (Dict[str, object], optional): Keyword to payload mapping
+        """
+        self.keywords = []
+        self.payloads = []
+        self.index = {}
+        self.built = False
+        
+        # Pure-Python automaton: goto transitions, failure links, keyword ending at
+        # each state and a link to the nearest suffix state that ends a keyword
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [-1]
+        self.dict_link = [-1]
+        self.automaton = None
+        
+        if keywords:
+            self.add_many(keywords)
+    
+    @property
+    def backend(self) -> str:
+        """Name of the matching implementation in use"""
+        return 'pyahocorasick' if ahocorasick else 'python'
+    
+    def __len__(self) -> int:
+        return len(self.keywords)
+    
+    def add(self, keyword: str, payload: object = None):
+        """
+        Add a keyword; the first payload registered for a keyword wins
+        
+        Args:
+            keyword (str): Word or phrase to match
+            payload (object, optional): Value reported on match; defaults to the keyword
+        """
+        keyword = _fold(keyword.strip())
+        if not keyword or keyword in self.index:
+            return
+        
+        self.index[keyword] = len(self.keywords)
+        self.keywords.append(keyword)
+        self.payloads.append(keyword if payload is None else payload)
+        self.built = False
+    
+    def add_many(self, keywords):
+        """Add keywords from a keyword-to-payload mapping or an iterable of keywords"""
+        items = keywords.items() if isinstance(keywords, dict) else ((keyword, None) for keyword in keywords)
+        for keyword, payload in items:
+            self.add(keyword, payload)
+    
+    def build(self):
+        """Compile the automaton; called automatically before the first match after changes"""
+        if ahocorasick:
+            automaton = ahocorasick.Automaton()
+            for keyword_index, keyword in enumerate(self.keywords):
+                automaton.add_word(keyword, keyword_index)
+            if self.keywords:
+                automaton.make_automaton()
+            self.automaton = automaton
+        else:
+            self._build_python()
+        self.built = True
+    
+    def _build_python(self):
+        """Build the trie, then failure and dictionary-suffix links breadth first"""
+        goto, fail, output, dict_link = [{}], [0], [-1], [-1]
+        
+        for keyword_index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    fail.append(0)
+                    output.append(-1)
+                    dict_link.append(-1)
+                state = next_state
+            output[state] = keyword_index
+        
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in goto[state].items():
+                queue.append(child)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                fail[child] = target if target != child else 0
+                dict_link[child] = fail[child] if output[fail[child]] != -1 else dict_link[fail[child]]
+        
+        self.goto, self.fail, self.output, self.dict_link = goto, fail, output, dict_link
+    
+    def _iter_raw(self, folded: str):
+        """Yield (end_index, keyword_index) for every occurrence, ignoring word boundaries"""
+        if self.automaton is not None:
+            if self.keywords:
+                yield from self.automaton.iter(folded)
+            return
+        
+        goto, fail, output, dict_link = self.goto, self.fail, self.output, self.dict_link
+        state = 0
+        for position, char in enumerate(folded):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            
+            node = state if output[state] != -1 else dict_link[state]
+            while node != -1:
+                yield position, output[node]
+                node = dict_link[node]
+    
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """
+        Find every whole-word keyword occurrence in text
+        
+        Args:
+            text (str): Text to scan
+        
+        Returns:
+            List[KeywordMatch]: Matches with keyword, payload and character offsets
+        """
+        if not self.built:
+            self.build()
+        
+        folded = _fold(text)
+        last = len(folded) - 1
+        matches = []
+        for end, keyword_index in self._iter_raw(folded):
+            keyword = self.keywords[keyword_index]
+            start = end - len(keyword) + 1
+            if start > 0 and _is_word_char(folded[start - 1]) and _is_word_char(folded[start]):
+                continue
+            if end < last and _is_word_char(folded[end + 1]) and _is_word_char(folded[end]):
+                continue
+            matches.append(KeywordMatch(keyword, self.payloads[keyword_index], start, end + 1))
+        
+        matches.sort(key=lambda match: match.start)
+        return matches
+    
+    def find_payloads(self, text: str) -> List:
+        """Get the distinct payloads matched in text, in order of first occurrence"""
+        payloads = []
+        for match in self.find_all(text):
+            if match.payload not in payloads:
+                payloads.append(match.payload)
+        return payloads
+    
+    def load_blocklist(self, path: str, default_payload: object = None) -> int:
+        """
+        Add terms from a blocklist file, streamed line by line
+        
+        Each non-empty line is a term, optionally followed by a tab and the payload
+        to report for it. Lines starting with '#' are comments.
+        
+        Args:
+            path (str): Path to a UTF-8 blocklist file
+            default_payload (object, optional): Payload for lines without one; defaults to the term
+        
+        Returns:
+            int: Number of terms added
+        """
+        added = len(self.keywords)
+        with open(path, encoding='utf-8', errors='ignore') as blocklist_file:
+            for line in blocklist_file:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                term, _, payload = line.partition('\t')
+                self.add(term, payload.strip() or default_payload)
+        return len(self.keywords) - added
+    
+    def get_stats(self) -> Dict:
+        """Get term count and matching backend"""
+        return {
+            'terms': len(self.keywords),
+            'backend': self.backend,
+            'states': len(self.goto) if self.automaton is None else None
+        }
@@ -0,0 +1,338 @@
+"""
+Shared Gemini Gateway
+One configured client and model registry, with calls multiplexed on a background asyncio loop
+"""
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Iterator, Optional
+import google.generativeai as genai
+from dotenv import load_dotenv
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+
+# Load environment variables
+load_dotenv()
+
+_STREAM_END = object()
+
+
+class LLMGateway:
+    """Single entry point for Gemini calls from services and Flask routes"""
+    
+    def __init__(self):
+        """Configure Gemini once and prepare the shared event loop"""
+        self.api_key = os.getenv('GEMINI_API_KEY')
+        self.default_model_name = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+        self.request_timeout = float(os.getenv('GEMINI_REQUEST_TIMEOUT_SECONDS', '30'))
+        self.max_concurrency = int(os.getenv('GEMINI_MAX_CONCURRENCY', '32'))
+        
+        # Shared by every call site so a dead dependency fails fast everywhere
+        self.breaker = CircuitBreaker(
+            'gemini',
+            window_seconds=float(os.getenv('GEMINI_BREAKER_WINDOW_SECONDS', '60')),
+            min_calls=int(os.getenv('GEMINI_BREAKER_MIN_CALLS', '10')),
+            error_rate_threshold=float(os.getenv('GEMINI_BREAKER_ERROR_RATE', '0.5')),
+            slow_call_ms=float(os.getenv('GEMINI_BREAKER_SLOW_CALL_MS', '10000')),
+            slow_rate_threshold=float(os.getenv('GEMINI_BREAKER_SLOW_RATE', '0.8')),
+            cooldown_seconds=float(os.getenv('GEMINI_BREAKER_COOLDOWN_SECONDS', '30'))
+        )
+        
+        self.models = {}
+        self.models_lock = threading.Lock()
+        
+        self.loop = None
+        self.loop_lock = threading.Lock()
+        self.semaphore = None
+        
+        # Identical prompts already in flight, keyed by hash; only touched from the loop thread
+        self.in_flight_calls = {}
+        
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'errors': 0,
+            'timeouts': 0,
+            'upstream_timeouts': 0,
+            'cancelled': 0,
+            'coalesced': 0,
+            'in_flight': 0,
+            'peak_in_flight': 0,
+            'total_latency_ms': 0.0
+        }
+        
+        if self.api_key:
+            genai.configure(api_key=self.api_key)
+    
+    @property
+    def configured(self) -> bool:
+        """Whether a Gemini API key is available"""
+        return bool(self.api_key)
+    
+    @property
+    def available(self) -> bool:
+        """Whether a call would be attempted now: configured and the circuit is not open"""
+        return self.configured and self.breaker.accepting_requests()
+    
+    def get_model(self, model_name: Optional[str] = None):
+        """
+        Get the shared GenerativeModel for a model name, creating it on first use
+        
+        Args:
+            model_name (str, optional): Gemini model; defaults to GEMINI_MODEL
+        
+        Returns:
+            GenerativeModel: Model instance shared by every caller
+        """
+        if not self.configured:
+            raise RuntimeError("Gemini API not configured")
+        
+        model_name = model_name or self.default_model_name
+        model = self.models.get(model_name)
+        if model is None:
+            with self.models_lock:
+                model = self.models.get(model_name)
+                if model is None:
+                    model = genai.GenerativeModel(model_name)
+                    self.models[model_name] = model
+        return model
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background event loop thread on first use"""
+        if self.loop is None:
+            with self.loop_lock:
+                if self.loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(target=loop.run_forever, name='llm-gateway', daemon=True)
+                    thread.start()
+                    self.loop = loop
+        return self.loop
+    
+    def _admit(self):
+        """Reserve a call through the breaker or fail fast"""
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Gemini circuit is open; skipping call")
+    
+    def _track_start(self) -> float:
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['in_flight'] += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+        return time.perf_counter()
+    
+    def _track_end(self, started: float, error: bool = False, cancelled: bool = False):
+        latency_ms = (time.perf_counter() - started) * 1000.0
+        if cancelled:
+            # Abandoned by the caller, e.g. a client disconnect: says nothing about Gemini
+            self.breaker.release()
+        else:
+            self.breaker.record(latency_ms, error)
+        with self.stats_lock:
+            self.stats['in_flight'] -= 1
+            self.stats['total_latency_ms'] += latency_ms
+            if cancelled:
+                self.stats['cancelled'] += 1
+            elif error:
+                self.stats['errors'] += 1
+    
+    async def _with_deadline(self, awaitable):
+        """Bound one upstream await by the request timeout so a hung call frees its slot"""
+        try:
+            return await asyncio.wait_for(awaitable, self.request_timeout)
+        except asyncio.TimeoutError:
+            with self.stats_lock:
+                self.stats['upstream_timeouts'] += 1
+            raise
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Only touched from the loop thread, so no lock is needed
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.semaphore
+    
+    @staticmethod
+    def _flight_key(model_name: str, prompt: str, kwargs: Dict) -> str:
+        payload = json.dumps([model_name, prompt, kwargs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    async def generate_async(self, prompt: str, model_name: Optional[str] = None, **kwargs) -> str:
+        """
+        Generate text, sharing one upstream call between identical concurrent requests
+        
+        Args:
+            prompt (str): Prompt to send
+            model_name (str, optional): Gemini model; defaults to GEMINI_MODEL
+            **kwargs: Extra generate_content arguments such as generation_config
+        
+        Returns:
+            str: Response text
+        
+        Raises:
+            CircuitOpenError: If the circuit is open
+            asyncio.TimeoutError: If Gemini does not answer within GEMINI_REQUEST_TIMEOUT_SECONDS
+        """
+        model_name = model_name or self.default_model_name
+        key = self._flight_key(model_name, prompt, kwargs)
+        
+        task = self.in_flight_calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate_once(prompt, model_name, **kwargs))
+            self.in_flight_calls[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish_flight(key, done))
+        else:
+            with self.stats_lock:
+                self.stats['coalesced'] += 1
+        
+        # Shielded so one caller timing out does not cancel the call for the others
+        return await asyncio.shield(task)
+    
+    def _finish_flight(self, key: str, task: asyncio.Future):
+        if self.in_flight_calls.get(key) is task:
+            del self.in_flight_calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every waiter has gone
+            task.exception()
+    
+    async def _generate_once(self, prompt: str, model_name: Optional[str] = None, **kwargs) -> str:
+        """Make one upstream call without blocking the event loop"""
+        model = self.get_model(model_name)
+        async with self._get_semaphore():
+            self._admit()
+            started = self._track_start()
+            failed = True
+            cancelled = False
+            try:
+                response = await self._with_deadline(model.generate_content_async(prompt, **kwargs))
+                failed = False
+                return response.text
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                self._track_end(started, error=failed, cancelled=cancelled)
+    
+    async def stream_async(self, prompt: str, model_name: Optional[str] = None, **kwargs):
+        """
+        Stream response text chunks as Gemini produces them
+        
+        Args:
+            prompt (str): Prompt to send
+            model_name (str, optional): Gemini model; defaults to GEMINI_MODEL
+            **kwargs: Extra generate_content arguments
+        
+        Yields:
+            str: Response text chunks
+        
+        Raises:
+            CircuitOpenError: If the circuit is open
+            asyncio.TimeoutError: If Gemini does not answer within GEMINI_REQUEST_TIMEOUT_SECONDS
+        """
+        model = self.get_model(model_name)
+        async with self._get_semaphore():
+            self._admit()
+            started = self._track_start()
+            failed = True
+            cancelled = False
+            try:
+                response = await self._with_deadline(model.generate_content_async(prompt, stream=True, **kwargs))
+                chunks = response.__aiter__()
+                while True:
+                    # Each gap between chunks gets the full deadline
+                    try:
+                        chunk = await self._with_deadline(chunks.__anext__())
+                    except StopAsyncIteration:
+                        break
+                    if chunk.text:
+                        yield chunk.text
+                failed = False
+            except (asyncio.CancelledError, GeneratorExit):
+                cancelled = True
+                raise
+            finally:
+                self._track_end(started, error=failed, cancelled=cancelled)
+    
+    def generate_text(self, prompt: str, model_name: Optional[str] = None, timeout: Optional[float] = None, **kwargs) -> str:
+        """
+        Blocking facade for Flask routes and services
+        
+        Args:
+            prompt (str): Prompt to send
+            model_name (str, optional): Gemini model; defaults to GEMINI_MODEL
+            timeout (float, optional): Seconds to wait; defaults to GEMINI_REQUEST_TIMEOUT_SECONDS
+            **kwargs: Extra generate_content arguments
+        
+        Returns:
+            str: Response text
+        """
+        self.get_model(model_name)
+        future = asyncio.run_coroutine_threadsafe(
+            self.generate_async(prompt, model_name, **kwargs),
+            self._ensure_loop()
+        )
+        try:
+            return future.result(timeout=timeout or self.request_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self.stats_lock:
+                self.stats['timeouts'] += 1
+            raise
+    
+    def stream_text(self, prompt: str, model_name: Optional[str] = None, timeout: Optional[float] = None, **kwargs) -> Iterator[str]:
+        """
+        Blocking iterator over streamed response chunks
+        
+        Args:
+            prompt (str): Prompt to send
+            model_name (str, optional): Gemini model; defaults to GEMINI_MODEL
+            timeout (float, optional): Longest wait for the next chunk
+            **kwargs: Extra generate_content arguments
+        
+        Yields:
+            str: Response text chunks
+        """
+        self.get_model(model_name)
+        chunks = queue.Queue()
+        
+        async def pump():
+            try:
+                async for chunk in self.stream_async(prompt, model_name, **kwargs):
+                    chunks.put(chunk)
+                chunks.put(_STREAM_END)
+            except Exception as e:
+                chunks.put(e)
+        
+        future = asyncio.run_coroutine_threadsafe(pump(), self._ensure_loop())
+        try:
+            while True:
+                item = chunks.get(timeout=timeout or self.request_timeout)
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        except queue.Empty:
+            with self.stats_lock:
+                self.stats['timeouts'] += 1
+            raise TimeoutError("Timed out waiting for Gemini stream")
+        finally:
+            future.cancel()
+    
+    def get_stats(self) -> Dict:
+        """Get request counts, concurrency and latency for the gateway"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        completed = stats['requests'] - stats['in_flight']
+        stats['avg_latency_ms'] = round(stats.pop('total_latency_ms') / completed, 2) if completed else 0.0
+        stats['configured'] = self.configured
+        stats['models'] = list(self.models)
+        stats['max_concurrency'] = self.max_concurrency
+        stats['coalesced_keys_in_flight'] = len(self.in_flight_calls)
+        stats['circuit_breaker'] = self.breaker.get_state()
+        return stats
+
+# Create global instance
+llm_gateway = LLMGateway()
@@ -1,8 +1,10 @@
-import google.generativeai as genai
 import os
+import threading
 from dotenv import load_dotenv
 import json
 from typing import Dict, List, Optional
+from .llm_gateway import llm_gateway
+from .local_mood_classifier import local_mood_classifier
 
 # Load environment variables
 load_dotenv()
@@ -10,14 +12,81 @@ load_dotenv()
 class LLMMoodAnalysisService:
     def __init__(self):
         """Initialize LLM-based mood analysis using Gemini"""
-        self.api_key = os.getenv('GEMINI_API_KEY')
         self.model_name = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+        self.gateway = llm_gateway
+        self.local_classifier = local_mood_classifier
+        self.local_first_pass_enabled = os.getenv('LOCAL_MOOD_FIRST_PASS', 'True').lower() == 'true'
         
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel(self.model_name)
-        else:
-            self.model = None
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'local_first_pass': 0,
+            'llm_calls': 0,
+            'local_fallbacks': 0,
+            'local_only': 0,
+            'compared': 0,
+            'agreed': 0
+        }
+    
+    def first_pass(self, user_input: str) -> Optional[Dict]:
+        """
+        Classify locally and return the result only when it is confident enough to skip the LLM
+        
+        Args:
+            user_input (str): User's message
+        
+        Returns:
+            Optional[Dict]: Local mood analysis, or None when the LLM should decide
+        """
+        if not self.local_first_pass_enabled:
+            return None
+        
+        result = self.local_classifier.classify(user_input)
+        if not self.local_classifier.is_confident(user_input, result):
+            return None
+        
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['local_first_pass'] += 1
+        return result
+    
+    def analyze_mood_local(self, user_input: str) -> Dict:
+        """
+        Analyze mood with the local classifier only, for callers that cannot wait on the LLM
+        
+        Args:
+            user_input (str): User's message
+        
+        Returns:
+            Dict: Mood analysis results
+        """
+        result = self.first_pass(user_input)
+        if result is not None:
+            return result
+        
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['local_only'] += 1
+        
+        result = self.local_classifier.classify(user_input)
+        result['context_analysis'] = 'Local analysis, LLM skipped'
+        return result
+    
+    def record_llm_mood(self, user_input: str, llm_result: Dict):
+        """
+        Count an LLM mood decision and whether the local classifier agreed with it
+        
+        Args:
+            user_input (str): User's message
+            llm_result (Dict): Mood analysis produced by the LLM
+        """
+        local_result = self.local_classifier.classify(user_input)
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['llm_calls'] += 1
+            self.stats['compared'] += 1
+            if local_result['mood'] == llm_result.get('mood'):
+                self.stats['agreed'] += 1
     
     def analyze_mood(self, user_input: str, conversation_history: List[Dict] = None) -> Dict:
         """
@@ -26,11 +95,15 @@ class LLMMoodAnalysisService:
         Args:
             user_input (str): User's message
             conversation_history (List[Dict]): Previous conversation context
-            
+        
         Returns:
             Dict: Mood analysis results
         """
-        if not self.model:
+        local_result = self.first_pass(user_input)
+        if local_result is not None:
+            return local_result
+        
+        if not self.gateway.available:
             return self._fallback_analysis(user_input)
         
         try:
@@ -64,10 +137,9 @@ Be especially sensitive to mental health concerns and crisis situations. If you
 
 Respond with ONLY a valid JSON object, no additional text.
 """
-            
+
             # Get response from Gemini
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
+            response_text = self.gateway.generate_text(prompt, self.model_name).strip()
             
             # Clean response text (remove markdown code blocks if present)
             if response_text.startswith('```json'):
@@ -83,18 +155,19 @@ Respond with ONLY a valid JSON object, no additional text.
                 result = json.loads(response_text)
                 
                 # Validate and clean the response
-                result = self._validate_response(result)
+                result = self.validate_mood_result(result)
                 
                 # Add timestamp
                 from datetime import datetime
                 result['timestamp'] = datetime.now().isoformat()
                 
+                self.record_llm_mood(user_input, result)
                 return result
-                
+            
             except json.JSONDecodeError:
                 # If JSON parsing fails, use fallback
                 return self._fallback_analysis(user_input)
-                
+        
         except Exception as e:
             print(f"LLM mood analysis error: {e}")
             return self._fallback_analysis(user_input)
@@ -115,8 +188,16 @@ Respond with ONLY a valid JSON object, no additional text.
         
         return "\n".join(context_parts) if context_parts else "No previous conversation context."
     
-    def _validate_response(self, result: Dict) -> Dict:
-        """Validate and clean the LLM response"""
+    def validate_mood_result(self, result: Dict) -> Dict:
+        """
+        Validate and clean mood fields parsed from an LLM response
+        
+        Args:
+            result (Dict): Parsed JSON from this analyzer's call or a fused mood-and-reply call
+        
+        Returns:
+            Dict: Mood analysis with every field present and in range
+        """
         # Ensure required fields exist
         valid_moods = ['neutral', 'happy', 'sad', 'curious', 'supportive']
         
@@ -138,66 +219,26 @@ Respond with ONLY a valid JSON object, no additional text.
         }
     
     def _fallback_analysis(self, user_input: str) -> Dict:
-        """Fallback analysis when LLM is not available - use simple LLM call"""
-        try:
-            # Try to use Gemini directly for fallback
-            import google.generativeai as genai
-            import os
-            from dotenv import load_dotenv
-            
-            load_dotenv()
-            api_key = os.getenv('GEMINI_API_KEY')
-            model_name = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
-            
-            if api_key:
-                genai.configure(api_key=api_key)
-                model = genai.GenerativeModel(model_name)
-                
-                # Create a simple prompt for mood analysis
-                prompt = f"""
-Analyze the emotional state of this message: "{user_input}"
-Respond with JSON: {{"mood": "neutral|happy|sad|curious|supportive", "confidence": 0.0-1.0, "sensitivity_level": "low|medium|high", "support_needed": true/false}}
-"""
-                
-                response = model.generate_content(prompt)
-                response_text = response.text.strip()
-                
-                # Clean response text (remove markdown code blocks if present)
-                if response_text.startswith('```json'):
-                    response_text = response_text[7:]
-                if response_text.startswith('```'):
-                    response_text = response_text[3:]
-                if response_text.endswith('```'):
-                    response_text = response_text[:-3]
-                response_text = response_text.strip()
-                
-                import json
-                result = json.loads(response_text)
-                
-                from datetime import datetime
-                return {
-                    'mood': result.get('mood', 'neutral'),
-                    'confidence': float(result.get('confidence', 0.5)),
-                    'emotional_indicators': [],
-                    'context_analysis': 'LLM fallback analysis',
-                    'sensitivity_level': result.get('sensitivity_level', 'low'),
-                    'support_needed': bool(result.get('support_needed', False)),
-                    'timestamp': datetime.now().isoformat()
-                }
-        except:
-            pass
-        
-        # Ultimate fallback - minimal analysis
-        from datetime import datetime
-        return {
-            'mood': 'neutral',
-            'confidence': 0.3,
-            'emotional_indicators': [],
-            'context_analysis': 'Fallback analysis - no LLM available',
-            'sensitivity_level': 'low',
-            'support_needed': False,
-            'timestamp': datetime.now().isoformat()
-        }
+        """Fallback analysis when the LLM is unavailable or fails - classify locally"""
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['local_fallbacks'] += 1
+        
+        result = self.local_classifier.classify(user_input)
+        result['context_analysis'] = 'Local fallback analysis'
+        return result
+    
+    def get_stats(self) -> Dict:
+        """Get how often the LLM was skipped and how often the local classifier agreed with it"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        requests = stats['requests']
+        stats['llm_calls_saved_rate'] = round((stats['local_first_pass'] + stats['local_fallbacks'] + stats['local_only']) / requests, 4) if requests else 0.0
+        stats['agreement_rate'] = round(stats['agreed'] / stats['compared'], 4) if stats['compared'] else 0.0
+        stats['local_first_pass_enabled'] = self.local_first_pass_enabled
+        stats['min_confidence'] = self.local_classifier.min_confidence
+        stats['max_words'] = self.local_classifier.max_words
+        return stats
 
 # Create global instance
 llm_mood_analyzer = LLMMoodAnalysisService()
@@ -1,23 +1,55 @@
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 import json
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, Iterator, List, Optional
+from .llm_gateway import llm_gateway
+from .llm_mood_analysis import llm_mood_analyzer
+from .prompt_builder import prompt_builder
+from .semantic_cache import SemanticResponseCache
 
 # Load environment variables
 load_dotenv()
 
+RESPONSE_STYLE_GUIDE = """1. **For Sad/Depressed Mood**: Be empathetic, supportive, and encouraging. If you detect serious mental health concerns, provide gentle support and suggest reaching out to trusted people or professionals.
+
+2. **For Happy Mood**: Match their positive energy, be enthusiastic, and encourage them.
+
+3. **For Curious Mood**: Be educational and helpful, provide information while being appropriate.
+
+4. **For Supportive Mood**: Be understanding and offer help.
+
+5. **For Neutral Mood**: Be friendly and engaging.
+
+Guidelines:
+- Always use the user's name if provided in preferences
+- Be conversational and friendly, like talking to a friend
+- For sensitive topics (mental health, suicide, etc.), be extra supportive and suggest professional help
+- For inappropriate content, provide educational alternatives instead of blocking
+- Keep responses concise but meaningful (2-3 sentences)
+- Use appropriate emojis sparingly
+- Be genuine and caring"""
+
+def _strip_code_fence(response_text: str) -> str:
+    """Remove markdown code fences Gemini sometimes wraps JSON in"""
+    response_text = response_text.strip()
+    if response_text.startswith('```json'):
+        response_text = response_text[7:]
+    if response_text.startswith('```'):
+        response_text = response_text[3:]
+    if response_text.endswith('```'):
+        response_text = response_text[:-3]
+    return response_text.strip()
+
 class LLMResponseGenerator:
     def __init__(self):
         """Initialize LLM-based response generation using Gemini"""
-        self.api_key = os.getenv('GEMINI_API_KEY')
         self.model_name = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
-        
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel(self.model_name)
-        else:
-            self.model = None
+        self.gateway = llm_gateway
+        self.fused_enabled = os.getenv('LLM_FUSED_MOOD_REPLY', 'True').lower() == 'true'
+        self.fused_stats = {'calls': 0, 'fallbacks': 0}
+        self.stats_lock = threading.Lock()
+        self.semantic_cache = SemanticResponseCache()
     
     def generate_response(self, user_message: str, mood_analysis: Dict, user_preferences: Dict = None, conversation_context: Dict = None) -> str:
         """
@@ -28,60 +60,183 @@ class LLMResponseGenerator:
             mood_analysis (Dict): Mood analysis results
             user_preferences (Dict): User's onboarding preferences
             conversation_context (Dict): Conversation context
-            
+        
         Returns:
             str: Generated response
         """
-        if not self.model:
+        if not self.gateway.available:
             return self._fallback_response(user_message, mood_analysis, user_preferences)
         
+        cached = self.semantic_cache.lookup(user_message, mood_analysis, user_preferences, conversation_context)
+        if cached is not None:
+            return cached
+        
         try:
-            # Build context for response generation
-            context = self._build_response_context(user_message, mood_analysis, user_preferences, conversation_context)
+            prompt = self._build_prompt(user_message, mood_analysis, user_preferences, conversation_context)
             
-            # Create prompt for response generation
-            prompt = f"""
+            # Get response from Gemini
+            response_text = self.gateway.generate_text(prompt, self.model_name).strip()
+            self.semantic_cache.store(user_message, mood_analysis, response_text, user_preferences, conversation_context)
+            return response_text
+        
+        except Exception as e:
+            print(f"LLM response generation error: {e}")
+            return self._fallback_response(user_message, mood_analysis, user_preferences, retry_llm=False)
+    
+    def generate_response_with_mood(self, user_message: str, user_preferences: Dict = None, conversation_context: Dict = None, conversation_history: List[Dict] = None) -> Dict:
+        """
+        Analyze mood and generate the reply in a single structured Gemini call
+        
+        Args:
+            user_message (str): User's message
+            user_preferences (Dict): User's onboarding preferences
+            conversation_context (Dict): Conversation context
+            conversation_history (List[Dict]): Recent messages used for mood analysis
+        
+        Returns:
+            Dict: 'mood_analysis' in the shape analyze_mood returns, 'content' with the reply
+                  and 'fused' telling whether one call served both
+        """
+        # A confident local mood only needs the reply, which the semantic cache may already hold
+        mood_analysis = llm_mood_analyzer.first_pass(user_message)
+        if mood_analysis is not None:
+            content = self.generate_response(user_message, mood_analysis, user_preferences, conversation_context)
+            return {'mood_analysis': mood_analysis, 'content': content, 'fused': False}
+        
+        if self.gateway.available:
+            with self.stats_lock:
+                self.fused_stats['calls'] += 1
+            try:
+                prompt = self._build_fused_prompt(user_message, user_preferences, conversation_context, conversation_history)
+                response_text = self.gateway.generate_text(
+                    prompt,
+                    self.model_name,
+                    generation_config={'response_mime_type': 'application/json'}
+                )
+                result = json.loads(_strip_code_fence(response_text))
+                reply = str(result.get('reply', '')).strip()
+                if reply:
+                    from datetime import datetime
+                    mood_analysis = llm_mood_analyzer.validate_mood_result(result)
+                    mood_analysis['timestamp'] = datetime.now().isoformat()
+                    llm_mood_analyzer.record_llm_mood(user_message, mood_analysis)
+                    self.semantic_cache.store(user_message, mood_analysis, reply, user_preferences, conversation_context)
+                    return {'mood_analysis': mood_analysis, 'content': reply, 'fused': True}
+            except Exception as e:
+                print(f"Fused mood and response generation error: {e}")
+            with self.stats_lock:
+                self.fused_stats['fallbacks'] += 1
+        
+        # Separate calls, as in the unfused path
+        mood_analysis = llm_mood_analyzer.analyze_mood(user_message, conversation_history)
+        content = self.generate_response(user_message, mood_analysis, user_preferences, conversation_context)
+        return {'mood_analysis': mood_analysis, 'content': content, 'fused': False}
+    
+    def stream_response(self, user_message: str, mood_analysis: Dict, user_preferences: Dict = None, conversation_context: Dict = None) -> Iterator[str]:
+        """
+        Stream the response as Gemini generates it
+        
+        Args:
+            user_message (str): User's message
+            mood_analysis (Dict): Mood analysis results
+            user_preferences (Dict): User's onboarding preferences
+            conversation_context (Dict): Conversation context
+        
+        Yields:
+            str: Response text chunks
+        """
+        cached = self.semantic_cache.lookup(user_message, mood_analysis, user_preferences, conversation_context)
+        if cached is not None:
+            yield cached
+            return
+        
+        chunks = []
+        if self.gateway.available:
+            try:
+                prompt = self._build_prompt(user_message, mood_analysis, user_preferences, conversation_context)
+                for chunk in self.gateway.stream_text(prompt, self.model_name):
+                    chunks.append(chunk)
+                    yield chunk
+                self.semantic_cache.store(user_message, mood_analysis, ''.join(chunks).strip(), user_preferences, conversation_context)
+                return
+            except Exception as e:
+                print(f"LLM response streaming error: {e}")
+                if chunks:
+                    return
+                yield self._fallback_response(user_message, mood_analysis, user_preferences, retry_llm=False)
+                return
+        
+        yield self._fallback_response(user_message, mood_analysis, user_preferences)
+    
+    def get_stats(self) -> Dict:
+        """Get fused-call, local mood and semantic cache statistics"""
+        with self.stats_lock:
+            fused_stats = dict(self.fused_stats)
+        return {
+            'fused_calls': fused_stats,
+            'mood_analysis': llm_mood_analyzer.get_stats(),
+            'prompt_sizes': prompt_builder.get_stats(),
+            'semantic_cache': self.semantic_cache.get_stats()
+        }
+    
+    def _build_prompt(self, user_message: str, mood_analysis: Dict, user_preferences: Dict, conversation_context: Dict) -> str:
+        """Build the response generation prompt"""
+        # Build context for response generation
+        context = self._build_response_context(user_message, mood_analysis, user_preferences, conversation_context)
+        
+        # Create prompt for response generation
+        prompt = f"""
 You are a caring, supportive AI companion named CareCompanion. You're designed to help users with empathy, understanding, and appropriate guidance.
 
 User Message: "{user_message}"
 
-Mood Analysis: {json.dumps(mood_analysis, indent=2)}
+Mood Analysis: {prompt_builder.pack_mood(mood_analysis)}
 
-User Preferences: {json.dumps(user_preferences or {}, indent=2)}
+User Preferences: {prompt_builder.pack_preferences(user_preferences) or 'None provided'}
 
-Conversation Context: {json.dumps(conversation_context or {}, indent=2)}
+Conversation Context:
+{prompt_builder.pack_context(conversation_context, user_message)}
 
 Based on the user's message and emotional state, generate an appropriate response that:
 
-1. **For Sad/Depressed Mood**: Be empathetic, supportive, and encouraging. If you detect serious mental health concerns, provide gentle support and suggest reaching out to trusted people or professionals.
+{RESPONSE_STYLE_GUIDE}
 
-2. **For Happy Mood**: Match their positive energy, be enthusiastic, and encourage them.
+Generate a response that feels natural and supportive:
+"""
+        prompt_builder.record('response', prompt)
+        return prompt
+    
+    def _build_fused_prompt(self, user_message: str, user_preferences: Dict, conversation_context: Dict, conversation_history: List[Dict]) -> str:
+        """Build the prompt asking for mood fields and the reply as one JSON object"""
+        prompt = f"""
+You are a caring, supportive AI companion named CareCompanion. You're designed to help users with empathy, understanding, and appropriate guidance.
 
-3. **For Curious Mood**: Be educational and helpful, provide information while being appropriate.
+User Message: "{user_message}"
 
-4. **For Supportive Mood**: Be understanding and offer help.
+User Preferences: {prompt_builder.pack_preferences(user_preferences) or 'None provided'}
 
-5. **For Neutral Mood**: Be friendly and engaging.
+Conversation Context:
+{prompt_builder.pack_context(conversation_context, user_message, history=conversation_history)}
 
-Guidelines:
-- Always use the user's name if provided in preferences
-- Be conversational and friendly, like talking to a friend
-- For sensitive topics (mental health, suicide, etc.), be extra supportive and suggest professional help
-- For inappropriate content, provide educational alternatives instead of blocking
-- Keep responses concise but meaningful (2-3 sentences)
-- Use appropriate emojis sparingly
-- Be genuine and caring
+First determine the user's emotional state, then reply to them in a way that fits it.
 
-Generate a response that feels natural and supportive:
+Be especially sensitive to mental health concerns and crisis situations. If you detect any signs of distress, suicidal ideation, or serious emotional problems, mark sensitivity_level as "high" and support_needed as true.
+
+When writing the reply, follow this guidance for the detected mood:
+
+{RESPONSE_STYLE_GUIDE}
+
+Respond with ONLY a valid JSON object with these fields:
+- "mood": one of "neutral", "happy", "sad", "curious", "supportive"
+- "confidence": number between 0.0 and 1.0
+- "emotional_indicators": list of words/phrases that indicate the mood
+- "context_analysis": brief explanation of why this mood was detected
+- "sensitivity_level": "low", "medium", or "high"
+- "support_needed": boolean
+- "reply": your response to the user
 """
-            
-            # Get response from Gemini
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-            
-        except Exception as e:
-            print(f"LLM response generation error: {e}")
-            return self._fallback_response(user_message, mood_analysis, user_preferences)
+        prompt_builder.record('fused', prompt)
+        return prompt
     
     def _build_response_context(self, user_message: str, mood_analysis: Dict, user_preferences: Dict, conversation_context: Dict) -> str:
         """Build context for response generation"""
@@ -115,30 +270,30 @@ Generate a response that feels natural and supportive:
         
         return "\n".join(context_parts) if context_parts else "No additional context available."
     
-    def _fallback_response(self, user_message: str, mood_analysis: Dict, user_preferences: Dict) -> str:
-        """Fallback response when LLM is not available - use simple LLM call"""
+    def _fallback_response(self, user_message: str, mood_analysis: Dict, user_preferences: Dict, retry_llm: bool = True) -> str:
+        """
+        Fallback response when the full prompt cannot be used - try a simple LLM call
+        
+        Args:
+            user_message (str): User's message
+            mood_analysis (Dict): Mood analysis results
+            user_preferences (Dict): User's onboarding preferences
+            retry_llm (bool): False after a failed Gemini call, so a struggling dependency
+                is not hit twice for the same message
+        
+        Returns:
+            str: Short reply
+        """
         try:
-            # Try to use Gemini directly for fallback
-            import google.generativeai as genai
-            import os
-            from dotenv import load_dotenv
-            
-            load_dotenv()
-            api_key = os.getenv('GEMINI_API_KEY')
-            model_name = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
-            
-            if api_key:
-                genai.configure(api_key=api_key)
-                model = genai.GenerativeModel(model_name)
-                
+            # Retry through the shared gateway model with a simpler prompt
+            if retry_llm and self.gateway.available:
                 # Create a simple prompt for fallback
                 mood = mood_analysis.get('mood', 'neutral')
                 user_name = user_preferences.get('name', '') if user_preferences else ''
                 
                 prompt = f"Generate a brief, supportive response for a user named {user_name} who is in a {mood} mood. Keep it short and empathetic."
                 
-                response = model.generate_content(prompt)
-                return response.text.strip()
+                return self.gateway.generate_text(prompt, self.model_name).strip()
         except:
             pass
         
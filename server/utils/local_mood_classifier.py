@@ -0,0 +1,139 @@
+"""
+Local Lexicon Mood Classifier
+CPU-only mood detection for the five moods used by LLM mood analysis
+"""
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Tuple
+from .keyword_matcher import KeywordMatcher
+
+# Weighted cue words per mood; phrases match as whole words
+MOOD_LEXICON = {
+    'happy': {
+        1.0: ['happy', 'glad', 'great', 'awesome', 'amazing', 'excited', 'wonderful', 'fantastic',
+              'love it', 'yay', 'so good', 'feeling good', 'feel good', 'thrilled', 'proud', 'delighted'],
+        0.5: ['good', 'nice', 'fun', 'cool', 'thanks', 'thank you', 'lol', 'haha', 'enjoyed', 'better']
+    },
+    'sad': {
+        1.0: ['sad', 'depressed', 'lonely', 'unhappy', 'miserable', 'crying', 'cry', 'heartbroken',
+              'upset', 'hopeless', 'worthless', 'down', 'awful', 'terrible', 'hurt', 'tired of'],
+        0.5: ['bad', 'tired', 'bored', 'sick', 'lost', 'alone', 'miss']
+    },
+    'curious': {
+        1.0: ['how do', 'how does', 'how can', 'what is', 'what are', 'why do', 'why does', 'why is',
+              'explain', 'tell me about', 'can you teach', 'wondering', 'curious', 'learn about'],
+        0.5: ['how', 'what', 'why', 'when', 'where', 'which', 'learn']
+    },
+    'supportive': {
+        1.0: ['help me', 'need help', 'can you help', 'advice', 'support', 'struggling', 'stressed',
+              'anxious', 'worried', 'overwhelmed', 'scared', 'nervous', 'afraid', 'confused'],
+        0.5: ['help', 'stress', 'worry', 'problem', 'issue', 'hard time']
+    },
+    'neutral': {
+        1.0: ['hi', 'hello', 'hey', 'ok', 'okay', 'sure', 'fine', 'alright', 'good morning',
+              'good evening', 'good night', 'bye', 'see you'],
+        0.5: []
+    }
+}
+
+# Always sent to the LLM and, on fallback, treated as high sensitivity
+CRISIS_TERMS = [
+    'suicide', 'suicidal', 'kill myself', 'end my life', 'end it all', 'want to die',
+    'self harm', 'hurt myself', 'cut myself', 'no reason to live', 'better off dead'
+]
+
+NEGATIONS = {'not', 'no', 'never', "don't", 'dont', "isn't", "wasn't", "can't", 'cannot', "didn't", "doesn't"}
+
+# Negated cues count toward this mood instead
+NEGATED_MOOD = {'happy': 'sad', 'sad': 'neutral', 'curious': 'neutral', 'supportive': 'neutral', 'neutral': 'neutral'}
+
+_PRECEDING_WORD = re.compile(r"([a-z']+)\W*$")
+
+
+class LocalMoodClassifier:
+    """Lexicon classifier returning the same shape as LLM mood analysis"""
+    
+    def __init__(self):
+        """Build the cue automaton once and read gating thresholds"""
+        self.matcher = KeywordMatcher()
+        for term in CRISIS_TERMS:
+            self.matcher.add(term, ('crisis', 1.0))
+        for mood, weighted_terms in MOOD_LEXICON.items():
+            for weight, terms in weighted_terms.items():
+                for term in terms:
+                    self.matcher.add(term, (mood, weight))
+        self.matcher.build()
+        
+        self.min_confidence = float(os.getenv('LOCAL_MOOD_MIN_CONFIDENCE', '0.75'))
+        self.max_words = int(os.getenv('LOCAL_MOOD_MAX_WORDS', '8'))
+    
+    def classify(self, text: str) -> Dict:
+        """
+        Classify the mood of a message from lexicon cues
+        
+        Args:
+            text (str): User's message
+        
+        Returns:
+            Dict: Mood analysis in the shape produced by LLM mood analysis
+        """
+        scores, indicators, crisis = self._score(text)
+        
+        if crisis:
+            mood, confidence = 'sad', 0.9
+        elif not scores:
+            mood, confidence = 'neutral', 0.4
+        else:
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            mood, top_score = ranked[0]
+            share = top_score / sum(scores.values())
+            confidence = min(0.95, share * (0.6 + 0.15 * min(top_score, 2.0)))
+        
+        sensitivity_level = 'high' if crisis else ('medium' if mood == 'sad' else 'low')
+        return {
+            'mood': mood,
+            'confidence': round(confidence, 2),
+            'emotional_indicators': indicators,
+            'context_analysis': 'Local lexicon analysis',
+            'sensitivity_level': sensitivity_level,
+            'support_needed': crisis or (mood == 'sad' and confidence >= 0.75),
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def is_confident(self, text: str, result: Dict) -> bool:
+        """Whether a local result is safe to use without asking the LLM"""
+        return (
+            len(text.split()) <= self.max_words and
+            result['confidence'] >= self.min_confidence and
+            result['sensitivity_level'] == 'low' and
+            not result['support_needed']
+        )
+    
+    def _score(self, text: str) -> Tuple[Dict[str, float], List[str], bool]:
+        """Sum cue weights per mood, flipping negated cues"""
+        scores = {}
+        indicators = []
+        crisis = False
+        lowered = text.lower()
+        
+        for match in self.matcher.find_all(text):
+            mood, weight = match.payload
+            if mood == 'crisis':
+                crisis = True
+                indicators.append(match.keyword)
+                continue
+            
+            preceding = _PRECEDING_WORD.search(lowered[:match.start])
+            if preceding and preceding.group(1) in NEGATIONS:
+                mood = NEGATED_MOOD[mood]
+            scores[mood] = scores.get(mood, 0.0) + weight
+            indicators.append(match.keyword)
+        
+        if text.strip().endswith('?'):
+            scores['curious'] = scores.get('curious', 0.0) + 0.5
+        
+        return scores, indicators, crisis
+
+# Create global instance
+local_mood_classifier = LocalMoodClassifier()
@@ -1,238 +1,508 @@
 """
 PII Detection and Scrubbing Utility using Presidio
 """
-from presidio_analyzer import AnalyzerEngine
-from presidio_anonymizer import AnonymizerEngine
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine
+from presidio_anonymizer.entities import OperatorConfig
 from presidio_analyzer.nlp_engine import NlpEngineProvider
+import hashlib
+import os
 import re
+import threading
 from typing import Dict, List, Tuple, Optional
 
+# Components the lean profile turns off; NER only needs the tokenizer and its own tok2vec
+LEAN_DISABLED_PIPES = ['parser', 'lemmatizer']
+
+PREFILTER_DIGIT = re.compile(r'\d')
+PREFILTER_URL = re.compile(r'https?://|www\.|\.(?:com|org|net|edu|gov|io)\b', re.IGNORECASE)
+PREFILTER_CAPITALIZED = re.compile(r"\b[A-Z][A-Za-z'-]+")
+
+# Words often capitalized only because they start a sentence; any other sentence-initial
+# capitalized word may be a name ("Priya is my friend")
+SENTENCE_START_WORDS = frozenset("""
+    a about after again all also am an and any are as at be because been before but by can
+    could did do does don't either even every for from get give good had has have he he's
+    hello her here hey hi his how however i'd i'll i'm i've if in is isn't it it's just let
+    let's like maybe me my no not now of ok okay on once one only or our please she she's
+    so some sometimes sorry still thank thanks that that's the their then there there's
+    these they they're this those today tomorrow too um well we we're were what what's when
+    where which while who why will with would yeah yes yesterday you you're your
+""".split())
+
+def _has_name_like_token(text: str) -> bool:
+    """Check for a capitalized word that is not just a common word starting a sentence"""
+    for match in PREFILTER_CAPITALIZED.finditer(text):
+        preceding = text[:match.start()].rstrip()
+        starts_sentence = not preceding or preceding[-1] in '.!?"\'('
+        if not starts_sentence or match.group().lower() not in SENTENCE_START_WORDS:
+            return True
+    return False
+
+class PIISpan:
+    """A merged region of text covered by one or more overlapping PII entities"""
+    
+    __slots__ = ('start', 'end', 'entities')
+    
+    def __init__(self, start: int, end: int, entities: List[Dict]):
+        self.start = start
+        self.end = end
+        self.entities = entities
+    
+    @property
+    def presidio_entity(self) -> Optional[Dict]:
+        """Highest scoring Presidio entity in the span, if any"""
+        presidio_entities = [entity for entity in self.entities if entity['source'] == 'presidio']
+        if not presidio_entities:
+            return None
+        return max(presidio_entities, key=lambda entity: entity['score'])
+    
+    @property
+    def primary_entity(self) -> Dict:
+        """Entity whose type labels the redaction: Presidio first, then the longest custom match"""
+        return self.presidio_entity or max(self.entities, key=lambda entity: entity['end'] - entity['start'])
+
+
+def merge_spans(entities: List[Dict]) -> List[PIISpan]:
+    """
+    Merge overlapping entity intervals into disjoint spans
+    
+    Args:
+        entities (List[Dict]): Entities with 'start' and 'end' offsets
+    
+    Returns:
+        List[PIISpan]: Disjoint spans sorted by start offset
+    """
+    spans = []
+    for entity in sorted(entities, key=lambda entity: (entity['start'], -entity['end'])):
+        if spans and entity['start'] < spans[-1].end:
+            current = spans[-1]
+            current.end = max(current.end, entity['end'])
+            current.entities.append(entity)
+        else:
+            spans.append(PIISpan(entity['start'], entity['end'], [entity]))
+    return spans
+
+
+class PIIDetection:
+    """PII found in one text, computed once and shared by summary, scrubbing and threshold checks"""
+    
+    def __init__(self, text: str, presidio_results: Optional[List[Dict]] = None, custom_results: Optional[List[Dict]] = None, error: Optional[str] = None):
+        """
+        Args:
+            text (str): Analyzed text
+            presidio_results (List[Dict], optional): Entities found by the Presidio analyzer
+            custom_results (List[Dict], optional): Entities found by the custom regex patterns
+            error (str, optional): Error message if detection failed
+        """
+        self.text = text
+        self.presidio_results = presidio_results or []
+        self.custom_results = custom_results or []
+        self.error = error
+        self.spans = merge_spans(self.presidio_results + self.custom_results)
+    
+    @property
+    def total_entities(self) -> int:
+        return len(self.presidio_results) + len(self.custom_results)
+    
+    @property
+    def entity_types(self) -> List[str]:
+        return list(dict.fromkeys(entity['entity_type'] for entity in self.presidio_results + self.custom_results))
+    
+    @property
+    def has_pii(self) -> bool:
+        return self.total_entities > 0
+    
+    def has_pii_above(self, threshold: float) -> bool:
+        """Check for a Presidio entity at or above threshold, or any custom pattern match"""
+        if self.error:
+            return False
+        if self.custom_results:
+            return True
+        return any(entity['score'] >= threshold for entity in self.presidio_results)
+    
+    @staticmethod
+    def assess_risk_level(entity_count: int) -> str:
+        """Assess risk level based on number of PII entities"""
+        if entity_count == 0:
+            return "LOW"
+        elif entity_count <= 2:
+            return "MEDIUM"
+        else:
+            return "HIGH"
+    
+    def summary(self) -> Dict:
+        """Summary of detected PII"""
+        if self.error:
+            return {"error": self.error}
+        
+        return {
+            'has_pii': self.has_pii,
+            'entity_count': self.total_entities,
+            'entity_types': self.entity_types,
+            'risk_level': self.assess_risk_level(self.total_entities)
+        }
+    
+    def to_dict(self) -> Dict:
+        """Detection results in the detect_pii response format"""
+        if self.error:
+            return {"error": self.error}
+        
+        def public(entity: Dict) -> Dict:
+            return {key: value for key, value in entity.items() if key != 'source'}
+        
+        return {
+            'presidio_results': [public(entity) for entity in self.presidio_results],
+            'custom_patterns': [public(entity) for entity in self.custom_results],
+            'summary': {
+                'total_entities': self.total_entities,
+                'entity_types': self.entity_types
+            }
+        }
+
 class PIIGuard:
-    def __init__(self):
-        """Initialize Presidio analyzer and anonymizer engines"""
+    def __init__(self, profile: Optional[str] = None):
+        """
+        Initialize Presidio analyzer and redaction configuration
+        
+        Args:
+            profile (str, optional): 'default' or 'lean'; defaults to PII_PROFILE
+        """
+        self.profile = (profile or os.getenv('PII_PROFILE', 'default')).lower()
+        self.batch_size = int(os.getenv('PII_BATCH_SIZE', '32'))
+        # Pattern and prefilter state is pure regex, so it exists even if Presidio fails to load
+        self.custom_patterns = {
+            'EMAIL': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+            'PHONE': r'(\+?1[-.\s]?)?\(?([0-9]{3})\)?[-.\s]?([0-9]{3})[-.\s]?([0-9]{4})',
+            'SSN': r'\b\d{3}-?\d{2}-?\d{4}\b',
+            'CREDIT_CARD': r'\b(?:\d{4}[-\s]?){3}\d{4}\b',
+            'IP_ADDRESS': r'\b(?:\d{1,3}\.){3}\d{1,3}\b'
+        }
+        self.compiled_patterns = {
+            name: re.compile(pattern, re.IGNORECASE)
+            for name, pattern in self.custom_patterns.items()
+        }
+        
+        # Prefilter: one alternation of every custom pattern plus cheap lexical signals
+        self.prefilter_pattern = re.compile(
+            '|'.join(f'(?P<{name}>{pattern})' for name, pattern in self.custom_patterns.items()),
+            re.IGNORECASE
+        )
+        self.prefilter_enabled = os.getenv('PII_PREFILTER_ENABLED', 'True').lower() == 'true'
+        self.prefilter_stats = {'messages': 0, 'ner_skipped': 0}
+        self.prefilter_lock = threading.Lock()
+        
         try:
             #NLP engine with spaCy
-            provider = NlpEngineProvider(conf_file=None)
+            if self.profile == 'lean':
+                provider = NlpEngineProvider(nlp_configuration={
+                    'nlp_engine_name': 'spacy',
+                    'models': [{'lang_code': 'en', 'model_name': os.getenv('PII_SPACY_MODEL', 'en_core_web_sm')}]
+                })
+            else:
+                provider = NlpEngineProvider(conf_file=None)
             nlp_engine = provider.create_engine()
             
-            #analyzer and anonymizer
+            if self.profile == 'lean':
+                nlp = nlp_engine.nlp['en']
+                for pipe_name in LEAN_DISABLED_PIPES:
+                    if pipe_name in nlp.pipe_names:
+                        nlp.disable_pipe(pipe_name)
+            
+            #analyzer
             self.analyzer = AnalyzerEngine(nlp_engine=nlp_engine)
-            self.anonymizer = AnonymizerEngine()
+            self.batch_analyzer = BatchAnalyzerEngine(analyzer_engine=self.analyzer)
             
-            self.custom_patterns = {
-                'EMAIL': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-                'PHONE': r'(\+?1[-.\s]?)?\(?([0-9]{3})\)?[-.\s]?([0-9]{3})[-.\s]?([0-9]{4})',
-                'SSN': r'\b\d{3}-?\d{2}-?\d{4}\b',
-                'CREDIT_CARD': r'\b(?:\d{4}[-\s]?){3}\d{4}\b',
-                'IP_ADDRESS': r'\b(?:\d{1,3}\.){3}\d{1,3}\b'
+            # Replacement values per entity type - built once and shared by every scrub
+            self.operators = {
+                "DEFAULT": OperatorConfig("replace", {"new_value": "[REDACTED]"}),
+                "EMAIL": OperatorConfig("replace", {"new_value": "[EMAIL_REDACTED]"}),
+                "EMAIL_ADDRESS": OperatorConfig("replace", {"new_value": "[EMAIL_REDACTED]"}),
+                "PHONE_NUMBER": OperatorConfig("replace", {"new_value": "[PHONE_REDACTED]"}),
+                "PHONE": OperatorConfig("replace", {"new_value": "[PHONE_REDACTED]"}),
+                "PERSON": OperatorConfig("replace", {"new_value": "[NAME_REDACTED]"}),
+                "LOCATION": OperatorConfig("replace", {"new_value": "[LOCATION_REDACTED]"}),
+                "CREDIT_CARD": OperatorConfig("replace", {"new_value": "[CARD_REDACTED]"}),
+                "SSN": OperatorConfig("replace", {"new_value": "[SSN_REDACTED]"}),
+                "IP_ADDRESS": OperatorConfig("replace", {"new_value": "[IP_REDACTED]"}),
+                "US_BANK_NUMBER": OperatorConfig("replace", {"new_value": "[BANK_REDACTED]"}),
+                "US_DRIVER_LICENSE": OperatorConfig("replace", {"new_value": "[LICENSE_REDACTED]"}),
+                "URL": OperatorConfig("replace", {"new_value": "[URL_REDACTED]"})
             }
             
+            # Lean profile only keeps the recognizers whose entities have a redaction operator
+            self.entities = None
+            if self.profile == 'lean':
+                redacted_entities = set(self.operators) - {'DEFAULT'}
+                registry = self.analyzer.registry
+                registry.recognizers = [
+                    recognizer for recognizer in registry.recognizers
+                    if set(recognizer.supported_entities) & redacted_entities
+                ]
+                self.entities = sorted({
+                    entity for recognizer in registry.recognizers
+                    for entity in recognizer.supported_entities
+                } & redacted_entities)
+        
         except Exception as e:
             print(f"Warning: Failed to initialize PII Guard: {e}")
             self.analyzer = None
-            self.anonymizer = None
     
-    def detect_pii(self, text: str) -> Dict[str, List[Dict]]:
+    def prefilter(self, text: str) -> Dict:
         """
-        Detect PII in text using Presidio and custom patterns
+        Decide cheaply whether the Presidio NLP pass and custom patterns need to run
+        
+        Args:
+            text (str): Input text to check
+        
+        Returns:
+            Dict: Lexical signals found, custom pattern types hit and whether NER is needed
+        """
+        signals = []
+        if PREFILTER_DIGIT.search(text):
+            signals.append('digit')
+        if '@' in text:
+            signals.append('at_sign')
+        if PREFILTER_URL.search(text):
+            signals.append('url')
+        if _has_name_like_token(text):
+            signals.append('capitalized_token')
+        
+        pattern_hits = []
+        if signals:
+            # Every custom pattern needs a digit or '@', so clean text never reaches the alternation
+            match = self.prefilter_pattern.search(text)
+            if match:
+                pattern_hits.append(match.lastgroup)
+        
+        return {
+            'needs_ner': bool(signals) or not self.prefilter_enabled,
+            'signals': signals,
+            'pattern_hits': pattern_hits
+        }
+    
+    def get_prefilter_stats(self) -> Dict:
+        """Get how many messages skipped the Presidio NLP pass"""
+        with self.prefilter_lock:
+            messages = self.prefilter_stats['messages']
+            skipped = self.prefilter_stats['ner_skipped']
+        return {
+            'enabled': self.prefilter_enabled,
+            'messages': messages,
+            'ner_skipped': skipped,
+            'ner_skip_fraction': round(skipped / messages, 4) if messages else 0.0
+        }
+    
+    def analyze(self, text: str) -> PIIDetection:
+        """
+        Detect PII in text once using Presidio and custom patterns
         
         Args:
             text (str): Input text to analyze
-            
+        
         Returns:
-            Dict containing detected PII entities
+            PIIDetection: Detection result shared by summary, scrubbing and threshold checks
         """
         if not self.analyzer:
-            return {"error": "PII analyzer not initialized"}
+            return PIIDetection(text, error="PII analyzer not initialized")
         
         try:
-            # Use Presidio analyzer
-            results = self.analyzer.analyze(text=text, language='en')
-            
-            detected_entities = {
-                'presidio_results': [],
-                'custom_patterns': [],
-                'summary': {
-                    'total_entities': 0,
-                    'entity_types': set()
-                }
-            }
+            prefilter = self._run_prefilter(text)
             
-            for result in results:
-                entity_info = {
-                    'entity_type': result.entity_type,
-                    'start': result.start,
-                    'end': result.end,
-                    'score': result.score,
-                    'text': text[result.start:result.end]
-                }
-                detected_entities['presidio_results'].append(entity_info)
-                detected_entities['summary']['entity_types'].add(result.entity_type)
-            
-            for pattern_name, pattern in self.custom_patterns.items():
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                for match in matches:
-                    entity_info = {
-                        'entity_type': pattern_name,
-                        'start': match.start(),
-                        'end': match.end(),
-                        'score': 1.0,
-                        'text': match.group()
-                    }
-                    detected_entities['custom_patterns'].append(entity_info)
-                    detected_entities['summary']['entity_types'].add(pattern_name)
-            
-            detected_entities['summary']['total_entities'] = len(detected_entities['presidio_results']) + len(detected_entities['custom_patterns'])
-            detected_entities['summary']['entity_types'] = list(detected_entities['summary']['entity_types'])
+            # Use Presidio analyzer only when the prefilter saw something name- or number-like
+            results = self.analyzer.analyze(text=text, language='en', entities=self.entities) if prefilter['needs_ner'] else []
+            return self._build_detection(text, prefilter, results)
+        
+        except Exception as e:
+            return PIIDetection(text, error=f"PII detection failed: {str(e)}")
+    
+    def analyze_batch(self, texts: List[str]) -> List[PIIDetection]:
+        """
+        Detect PII in many texts, running the NLP pass for all of them through nlp.pipe
+        
+        Args:
+            texts (List[str]): Input texts to analyze
+        
+        Returns:
+            List[PIIDetection]: One detection result per input text, in order
+        """
+        if not self.analyzer:
+            return [PIIDetection(text, error="PII analyzer not initialized") for text in texts]
+        
+        try:
+            prefilters = [self._run_prefilter(text) for text in texts]
+            ner_texts = [text for text, prefilter in zip(texts, prefilters) if prefilter['needs_ner']]
             
-            return detected_entities
+            batch_results = iter(self.batch_analyzer.analyze_iterator(
+                ner_texts,
+                language='en',
+                batch_size=self.batch_size,
+                entities=self.entities
+            ) if ner_texts else [])
             
+            return [
+                self._build_detection(text, prefilter, next(batch_results) if prefilter['needs_ner'] else [])
+                for text, prefilter in zip(texts, prefilters)
+            ]
+        
         except Exception as e:
-            return {"error": f"PII detection failed: {str(e)}"}
+            return [PIIDetection(text, error=f"PII detection failed: {str(e)}") for text in texts]
     
-    def scrub_pii(self, text: str, replacement_strategy: str = "replace") -> Tuple[str, Dict]:
+    def _run_prefilter(self, text: str) -> Dict:
+        """Run the prefilter and count whether the message skipped NER"""
+        prefilter = self.prefilter(text)
+        with self.prefilter_lock:
+            self.prefilter_stats['messages'] += 1
+            if not prefilter['needs_ner']:
+                self.prefilter_stats['ner_skipped'] += 1
+        return prefilter
+    
+    def _build_detection(self, text: str, prefilter: Dict, results: List) -> PIIDetection:
+        """Combine Presidio results with custom pattern matches into a detection"""
+        presidio_results = [
+            {
+                'entity_type': result.entity_type,
+                'start': result.start,
+                'end': result.end,
+                'score': result.score,
+                'text': text[result.start:result.end],
+                'source': 'presidio'
+            }
+            for result in results
+        ]
+        
+        custom_results = []
+        compiled_patterns = self.compiled_patterns.items() if prefilter['pattern_hits'] or not self.prefilter_enabled else []
+        for pattern_name, pattern in compiled_patterns:
+            matches = pattern.finditer(text)
+            for match in matches:
+                custom_results.append({
+                    'entity_type': pattern_name,
+                    'start': match.start(),
+                    'end': match.end(),
+                    'score': 1.0,
+                    'text': match.group(),
+                    'source': 'custom'
+                })
+        
+        return PIIDetection(text, presidio_results, custom_results)
+    
+    def detect_pii(self, text: str) -> Dict[str, List[Dict]]:
         """
-        Scrub PII from text using Presidio anonymizer
+        Detect PII in text using Presidio and custom patterns
+        
+        Args:
+            text (str): Input text to analyze
+        
+        Returns:
+            Dict containing detected PII entities
+        """
+        return self.analyze(text).to_dict()
+    
+    def _replacement_for(self, span: PIISpan, text: str, replacement_strategy: str) -> str:
+        """Pick the redaction text for a merged span"""
+        presidio_entity = span.presidio_entity
+        if presidio_entity:
+            operator = self.operators.get(presidio_entity['entity_type'], self.operators['DEFAULT'])
+            return operator.params['new_value']
+        
+        original_text = text[span.start:span.end]
+        if replacement_strategy == "replace":
+            return f"[{span.primary_entity['entity_type']}_REDACTED]"
+        elif replacement_strategy == "mask":
+            return "*" * len(original_text)
+        else:  # hash
+            return hashlib.md5(original_text.encode()).hexdigest()[:8]
+    
+    def scrub_pii(self, text: str, replacement_strategy: str = "replace", detection: Optional[PIIDetection] = None) -> Tuple[str, Dict]:
+        """
+        Scrub PII from text in a single pass over the merged entity spans
         
         Args:
             text (str): Input text to scrub
             replacement_strategy (str): Strategy for replacement ("replace", "mask", "hash")
-            
+            detection (PIIDetection, optional): Existing detection result for this text
+        
         Returns:
             Tuple of (scrubbed_text, anonymization_info)
         """
-        if not self.anonymizer:
-            return text, {"error": "PII anonymizer not initialized"}
+        if not self.analyzer:
+            return text, {"error": "PII analyzer not initialized"}
         
         try:
-            detection_results = self.detect_pii(text)
-            
-            if "error" in detection_results:
-                return text, detection_results
-            
-            # Configure anonymization - use proper Presidio operator format
-            from presidio_anonymizer.entities import OperatorConfig
-            operators = {
-                "DEFAULT": OperatorConfig("replace", {"new_value": "[REDACTED]"}),
-                "EMAIL": OperatorConfig("replace", {"new_value": "[EMAIL_REDACTED]"}),
-                "EMAIL_ADDRESS": OperatorConfig("replace", {"new_value": "[EMAIL_REDACTED]"}),
-                "PHONE_NUMBER": OperatorConfig("replace", {"new_value": "[PHONE_REDACTED]"}),
-                "PHONE": OperatorConfig("replace", {"new_value": "[PHONE_REDACTED]"}),
-                "PERSON": OperatorConfig("replace", {"new_value": "[NAME_REDACTED]"}),
-                "LOCATION": OperatorConfig("replace", {"new_value": "[LOCATION_REDACTED]"}),
-                "CREDIT_CARD": OperatorConfig("replace", {"new_value": "[CARD_REDACTED]"}),
-                "SSN": OperatorConfig("replace", {"new_value": "[SSN_REDACTED]"}),
-                "IP_ADDRESS": OperatorConfig("replace", {"new_value": "[IP_REDACTED]"}),
-                "US_BANK_NUMBER": OperatorConfig("replace", {"new_value": "[BANK_REDACTED]"}),
-                "US_DRIVER_LICENSE": OperatorConfig("replace", {"new_value": "[LICENSE_REDACTED]"}),
-                "URL": OperatorConfig("replace", {"new_value": "[URL_REDACTED]"})
-            }
+            if detection is None:
+                detection = self.analyze(text)
             
-            presidio_results = []
-            for entity in detection_results.get('presidio_results', []):
-                from presidio_analyzer import RecognizerResult
-                presidio_results.append(RecognizerResult(
-                    entity_type=entity['entity_type'],
-                    start=entity['start'],
-                    end=entity['end'],
-                    score=entity['score'],
-                    analysis_explanation=None
-                ))
+            if detection.error:
+                return text, {"error": detection.error}
             
-            anonymized_result = self.anonymizer.anonymize(
-                text=text,
-                analyzer_results=presidio_results,
-                operators=operators
-            )
-            
-            scrubbed_text = anonymized_result.text
+            pieces = []
+            cursor = 0
+            redactions = []
             custom_redactions = []
-            
-            for entity in detection_results.get('custom_patterns', []):
-                original_text = entity['text']
-                if replacement_strategy == "replace":
-                    replacement = f"[{entity['entity_type']}_REDACTED]"
-                elif replacement_strategy == "mask":
-                    replacement = "*" * len(original_text)
-                else:  # hash
-                    import hashlib
-                    replacement = hashlib.md5(original_text.encode()).hexdigest()[:8]
+            for span in detection.spans:
+                replacement = self._replacement_for(span, text, replacement_strategy)
+                pieces.append(text[cursor:span.start])
+                pieces.append(replacement)
+                cursor = span.end
                 
-                scrubbed_text = scrubbed_text.replace(original_text, replacement)
-                custom_redactions.append({
-                    'original': original_text,
+                redaction = {
+                    'original': text[span.start:span.end],
                     'replacement': replacement,
-                    'type': entity['entity_type']
-                })
+                    'type': span.primary_entity['entity_type']
+                }
+                redactions.append(redaction)
+                if span.presidio_entity is None:
+                    custom_redactions.append(redaction)
+            pieces.append(text[cursor:])
+            scrubbed_text = ''.join(pieces)
             
             anonymization_info = {
                 'original_length': len(text),
                 'scrubbed_length': len(scrubbed_text),
-                'entities_detected': detection_results['summary']['total_entities'],
-                'entity_types': detection_results['summary']['entity_types'],
-                'custom_redactions': custom_redactions,
-                'presidio_anonymized': anonymized_result.text
+                'entities_detected': detection.total_entities,
+                'entity_types': detection.entity_types,
+                'redactions': redactions,
+                'custom_redactions': custom_redactions
             }
             
             return scrubbed_text, anonymization_info
-            
+        
         except Exception as e:
             return text, {"error": f"PII scrubbing failed: {str(e)}"}
     
-    def is_pii_detected(self, text: str, threshold: float = 0.5) -> bool:
+    def is_pii_detected(self, text: str, threshold: float = 0.5, detection: Optional[PIIDetection] = None) -> bool:
         """
         Check if PII is detected in text above threshold
         
         Args:
             text (str): Input text to check
             threshold (float): Confidence threshold for PII detection
-            
+            detection (PIIDetection, optional): Existing detection result for this text
+        
         Returns:
             bool: True if PII detected above threshold
         """
-        detection_results = self.detect_pii(text)
-        
-        if "error" in detection_results:
-            return False
-        
-        for entity in detection_results.get('presidio_results', []):
-            if entity['score'] >= threshold:
-                return True
-        
-        if detection_results.get('custom_patterns'):
-            return True
-        
-        return False
+        if detection is None:
+            detection = self.analyze(text)
+        return detection.has_pii_above(threshold)
     
-    def get_pii_summary(self, text: str) -> Dict:
+    def get_pii_summary(self, text: str, detection: Optional[PIIDetection] = None) -> Dict:
         """
         Get a summary of PII detected in text
         
         Args:
             text (str): Input text to analyze
-            
+            detection (PIIDetection, optional): Existing detection result for this text
+        
         Returns:
             Dict: Summary of detected PII
         """
-        detection_results = self.detect_pii(text)
-        
-        if "error" in detection_results:
-            return detection_results
-        
-        return {
-            'has_pii': detection_results['summary']['total_entities'] > 0,
-            'entity_count': detection_results['summary']['total_entities'],
-            'entity_types': detection_results['summary']['entity_types'],
-            'risk_level': self._assess_risk_level(detection_results['summary']['total_entities'])
-        }
+        if detection is None:
+            detection = self.analyze(text)
+        return detection.summary()
     
     def _assess_risk_level(self, entity_count: int) -> str:
         """Assess risk level based on number of PII entities"""
-        if entity_count == 0:
-            return "LOW"
-        elif entity_count <= 2:
-            return "MEDIUM"
-        else:
-            return "HIGH"
+        return PIIDetection.assess_risk_level(entity_count)
 
 pii_guard = PIIGuard()
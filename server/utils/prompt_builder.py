@@ -0,0 +1,174 @@
+"""
+Prompt Builder
+Packs conversation context into a token budget with compact serialization
+"""
+import json
+import math
+import os
+import threading
+from typing import Dict, List, Optional
+
+# Roughly four characters per token for English text
+CHARS_PER_TOKEN = 4
+
+# Onboarding fields the reply can actually use; ids and timestamps are left out
+PREFERENCE_FIELDS = ('name', 'life_genre', 'weekly_goal', 'morning_preference', 'favorite_app')
+
+MOOD_FIELDS = ('mood', 'confidence', 'sensitivity_level', 'support_needed')
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for budgeting and logging"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def compact_json(value) -> str:
+    """Serialize without indentation or padding"""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+class PromptBuilder:
+    """Assembles the context section of response prompts within a token budget"""
+    
+    def __init__(self, context_token_budget: Optional[int] = None, max_turn_chars: Optional[int] = None):
+        """
+        Initialize the builder
+        
+        Args:
+            context_token_budget (int, optional): Token budget for the packed context block
+            max_turn_chars (int, optional): Longest excerpt kept from any single turn
+        """
+        self.context_token_budget = context_token_budget or int(os.getenv('PROMPT_CONTEXT_TOKEN_BUDGET', '600'))
+        self.max_turn_chars = max_turn_chars or int(os.getenv('PROMPT_MAX_TURN_CHARS', '300'))
+        self.log_sizes = os.getenv('PROMPT_SIZE_LOGGING', 'True').lower() == 'true'
+        
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'prompts': 0,
+            'total_tokens': 0,
+            'max_tokens': 0,
+            'turns_packed': 0,
+            'turns_dropped': 0
+        }
+    
+    def pack_mood(self, mood_analysis: Dict) -> str:
+        """
+        Serialize the mood fields the reply depends on
+        
+        Args:
+            mood_analysis (Dict): Mood analysis results
+        
+        Returns:
+            str: Compact JSON
+        """
+        packed = {field: mood_analysis[field] for field in MOOD_FIELDS if field in mood_analysis}
+        indicators = mood_analysis.get('emotional_indicators')
+        if indicators:
+            packed['indicators'] = indicators[:5]
+        return compact_json(packed)
+    
+    def pack_preferences(self, user_preferences: Optional[Dict]) -> str:
+        """
+        Serialize the onboarding fields used for personalization
+        
+        Args:
+            user_preferences (Dict, optional): User's onboarding preferences
+        
+        Returns:
+            str: Compact JSON, or an empty string when nothing is set
+        """
+        packed = {field: user_preferences[field] for field in PREFERENCE_FIELDS if (user_preferences or {}).get(field)}
+        return compact_json(packed) if packed else ''
+    
+    def pack_context(self, conversation_context: Optional[Dict], user_message: str = '', history: Optional[List[Dict]] = None, token_budget: Optional[int] = None) -> str:
+        """
+        Pack the most relevant conversation context into the budget
+        
+        The mood trail always goes in; recent turns are added newest first until the budget
+        runs out and then listed oldest first; discussed topics fill any space left.
+        
+        Args:
+            conversation_context (Dict, optional): Serialized ConversationContext
+            user_message (str): Current message, skipped if it is already the newest turn
+            history (List[Dict], optional): Turns to use instead of the context's own history
+            token_budget (int, optional): Overrides the configured budget
+        
+        Returns:
+            str: Context block for the prompt
+        """
+        conversation_context = conversation_context or {}
+        budget = token_budget or self.context_token_budget
+        lines = []
+        
+        moods = [entry.get('mood') for entry in conversation_context.get('mood_history', [])[-5:] if entry.get('mood')]
+        if moods:
+            lines.append(f"Mood trail: {' > '.join(moods)}")
+        elif conversation_context.get('current_mood'):
+            lines.append(f"Current mood: {conversation_context['current_mood']}")
+        used = estimate_tokens('\n'.join(lines))
+        
+        turns = history if history is not None else conversation_context.get('conversation_history', [])
+        turns = list(turns)
+        if turns and user_message and turns[-1].get('content', '').strip() == user_message.strip():
+            turns = turns[:-1]
+        
+        packed_turns = []
+        for turn in reversed(turns):
+            role = 'AI' if turn.get('message_type') == 'ai' else 'User'
+            content = ' '.join(str(turn.get('content', '')).split())
+            if len(content) > self.max_turn_chars:
+                content = content[:self.max_turn_chars].rstrip() + '...'
+            line = f"{role}: {content}"
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                break
+            packed_turns.append(line)
+            used += cost
+        
+        if packed_turns:
+            lines.append("Recent turns (oldest first):")
+            lines.extend(reversed(packed_turns))
+        
+        topics = [entry.get('topic') if isinstance(entry, dict) else entry for entry in conversation_context.get('topics_discussed', [])[-5:]]
+        topics = [str(topic) for topic in topics if topic]
+        if topics:
+            line = f"Topics discussed: {', '.join(topics)}"
+            if used + estimate_tokens(line) <= budget:
+                lines.append(line)
+        
+        with self.stats_lock:
+            self.stats['turns_packed'] += len(packed_turns)
+            self.stats['turns_dropped'] += len(turns) - len(packed_turns)
+        
+        return '\n'.join(lines) if lines else 'No previous conversation context.'
+    
+    def record(self, kind: str, prompt: str) -> int:
+        """
+        Log the size of a prompt about to be sent
+        
+        Args:
+            kind (str): Prompt type, e.g. 'response' or 'fused'
+            prompt (str): Final prompt text
+        
+        Returns:
+            int: Estimated token count
+        """
+        tokens = estimate_tokens(prompt)
+        with self.stats_lock:
+            self.stats['prompts'] += 1
+            self.stats['total_tokens'] += tokens
+            self.stats['max_tokens'] = max(self.stats['max_tokens'], tokens)
+        if self.log_sizes:
+            print(f"Prompt size [{kind}]: {len(prompt)} chars, ~{tokens} tokens")
+        return tokens
+    
+    def get_stats(self) -> Dict:
+        """Get prompt size statistics"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['avg_tokens'] = round(stats['total_tokens'] / stats['prompts'], 1) if stats['prompts'] else 0.0
+        stats['context_token_budget'] = self.context_token_budget
+        return stats
+
+# Create global instance
+prompt_builder = PromptBuilder()
@@ -0,0 +1,262 @@
+"""
+Semantic Response Cache
+Reuses generated replies for near-identical short messages using local sentence embeddings
+"""
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from .prompt_builder import PREFERENCE_FIELDS
+
+# Every preference the reply prompt can personalize with is templated out of cached replies
+PLACEHOLDERS = {field: f'{{user_{field}}}' for field in PREFERENCE_FIELDS}
+NAME_PLACEHOLDER = PLACEHOLDERS['name']
+
+
+class SemanticResponseCache:
+    """In-process vector index of past replies keyed by message embedding and mood"""
+    
+    def __init__(self, encoder: Optional[Callable[[List[str]], np.ndarray]] = None, threshold: Optional[float] = None, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None, max_message_words: Optional[int] = None):
+        """
+        Initialize the cache; the embedding model loads on first use
+        
+        Args:
+            encoder (Callable, optional): Maps a list of texts to an embedding matrix; defaults to
+                a sentence-transformers model named by SEMANTIC_CACHE_MODEL
+            threshold (float, optional): Minimum cosine similarity for a hit
+            max_entries (int, optional): Size cap; least recently used entries are evicted
+            ttl_seconds (float, optional): Lifetime of each entry
+            max_message_words (int, optional): Longer messages are never cached
+        """
+        self.enabled = os.getenv('SEMANTIC_CACHE_ENABLED', 'True').lower() == 'true'
+        self.model_name = os.getenv('SEMANTIC_CACHE_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+        self.threshold = threshold if threshold is not None else float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.92'))
+        self.max_entries = max_entries or int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '2000'))
+        self.ttl_seconds = ttl_seconds or float(os.getenv('SEMANTIC_CACHE_TTL_SECONDS', '3600'))
+        self.max_message_words = max_message_words or int(os.getenv('SEMANTIC_CACHE_MAX_WORDS', '12'))
+        
+        self.encoder = encoder
+        self.load_lock = threading.Lock()
+        self.lock = threading.Lock()
+        
+        # Row i of the matrix belongs to entries[i]; free rows are reused before evicting
+        self.vectors = None
+        self.entries = [None] * self.max_entries
+        self.free_slots = list(range(self.max_entries - 1, -1, -1))
+        
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'bypassed': 0,
+            'stores': 0,
+            'evictions': 0,
+            'expirations': 0
+        }
+    
+    def _get_encoder(self) -> Optional[Callable[[List[str]], np.ndarray]]:
+        """Load the sentence-embedding model once, disabling the cache if it is unavailable"""
+        if self.encoder is None and self.enabled:
+            with self.load_lock:
+                if self.encoder is None and self.enabled:
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                        model = SentenceTransformer(self.model_name, device='cpu')
+                        self.encoder = lambda texts: model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+                    except Exception as e:
+                        print(f"Warning: Semantic response cache disabled, embedding model unavailable: {e}")
+                        self.enabled = False
+        return self.encoder
+    
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        encoder = self._get_encoder()
+        if encoder is None:
+            return None
+        vector = np.asarray(encoder([text.strip().lower()]), dtype=np.float32)[0]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    @staticmethod
+    def _has_prior_turns(message: str, conversation_context: Optional[Dict]) -> bool:
+        """Whether the session has turns before this message that a reply could depend on"""
+        turns = list((conversation_context or {}).get('conversation_history') or [])
+        if turns and str(turns[-1].get('content', '')).strip() == message.strip():
+            turns = turns[:-1]
+        return bool(turns)
+    
+    def _is_cacheable(self, message: str, mood_analysis: Dict, conversation_context: Optional[Dict]) -> bool:
+        """Only short, low-sensitivity opening turns are safe to answer from cache"""
+        if not self.enabled or not message.strip():
+            return False
+        if len(message.split()) > self.max_message_words:
+            return False
+        if mood_analysis.get('support_needed') or mood_analysis.get('sensitivity_level') == 'high':
+            return False
+        # Follow-ups like "yes" or "tell me more" mean something different in every conversation
+        if self._has_prior_turns(message, conversation_context):
+            return False
+        return True
+    
+    @staticmethod
+    def _to_template(response: str, user_preferences: Optional[Dict]) -> str:
+        """Replace the user's preference values with placeholders so the reply can be reused for anyone"""
+        values = [
+            (str(value).strip(), PLACEHOLDERS[field])
+            for field, value in (user_preferences or {}).items()
+            if field in PLACEHOLDERS and value and str(value).strip()
+        ]
+        # Longest first so a value containing another is replaced whole
+        for value, placeholder in sorted(values, key=lambda item: len(item[0]), reverse=True):
+            response = re.sub(rf'\b{re.escape(value)}\b', placeholder, response, flags=re.IGNORECASE)
+        return response
+    
+    @staticmethod
+    def _render(template: str, user_preferences: Optional[Dict]) -> Optional[str]:
+        """
+        Fill the placeholders with the current user's preferences
+        
+        A missing name is dropped cleanly; a reply built around any other preference the
+        current user has not set cannot be reused, so None is returned.
+        """
+        user_preferences = user_preferences or {}
+        rendered = template
+        for field, placeholder in PLACEHOLDERS.items():
+            if placeholder not in rendered:
+                continue
+            value = user_preferences.get(field)
+            if value:
+                rendered = rendered.replace(placeholder, str(value))
+            elif field == 'name':
+                rendered = re.sub(r'[ ,]*' + re.escape(placeholder), '', rendered)
+                rendered = re.sub(r'\s{2,}', ' ', rendered).strip()
+            else:
+                return None
+        return rendered
+    
+    def lookup(self, message: str, mood_analysis: Dict, user_preferences: Optional[Dict] = None, conversation_context: Optional[Dict] = None) -> Optional[str]:
+        """
+        Find a cached reply for a similar message in the same mood bucket
+        
+        Args:
+            message (str): User's message
+            mood_analysis (Dict): Mood analysis for the message
+            user_preferences (Dict, optional): Used to re-template preference placeholders
+            conversation_context (Dict, optional): Serialized context; turns after the first are never cached
+        
+        Returns:
+            Optional[str]: Rendered reply, or None on a miss
+        """
+        if not self._is_cacheable(message, mood_analysis, conversation_context):
+            with self.lock:
+                self.stats['bypassed'] += 1
+            return None
+        
+        query = self._embed(message)
+        if query is None:
+            return None
+        
+        mood = mood_analysis.get('mood', 'neutral')
+        now = time.time()
+        with self.lock:
+            best_slot, best_score = None, self.threshold
+            if self.vectors is not None:
+                scores = self.vectors @ query
+                for slot in np.argsort(-scores):
+                    if scores[slot] < best_score:
+                        break
+                    entry = self.entries[slot]
+                    if entry is None:
+                        continue
+                    if entry['expires_at'] <= now:
+                        self._release(slot)
+                        self.stats['expirations'] += 1
+                        continue
+                    if entry['mood'] == mood:
+                        rendered = self._render(entry['template'], user_preferences)
+                        if rendered is None:
+                            continue
+                        best_slot, best_score = slot, float(scores[slot])
+                        break
+            
+            if best_slot is None:
+                self.stats['misses'] += 1
+                return None
+            
+            entry = self.entries[best_slot]
+            entry['last_used'] = now
+            entry['hits'] += 1
+            self.stats['hits'] += 1
+        
+        return rendered
+    
+    def store(self, message: str, mood_analysis: Dict, response: str, user_preferences: Optional[Dict] = None, conversation_context: Optional[Dict] = None):
+        """
+        Cache a generated reply for later similar messages
+        
+        Args:
+            message (str): User's message
+            mood_analysis (Dict): Mood analysis the reply was generated for
+            response (str): Generated reply
+            user_preferences (Dict, optional): Used to template out preference values
+            conversation_context (Dict, optional): Serialized context the reply was generated with
+        """
+        if not response or not self._is_cacheable(message, mood_analysis, conversation_context):
+            return
+        
+        vector = self._embed(message)
+        if vector is None:
+            return
+        
+        now = time.time()
+        entry = {
+            'template': self._to_template(response, user_preferences),
+            'mood': mood_analysis.get('mood', 'neutral'),
+            'expires_at': now + self.ttl_seconds,
+            'last_used': now,
+            'hits': 0
+        }
+        with self.lock:
+            if self.vectors is None:
+                self.vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            slot = self._claim_slot(now)
+            self.vectors[slot] = vector
+            self.entries[slot] = entry
+            self.stats['stores'] += 1
+    
+    def _claim_slot(self, now: float) -> int:
+        """Get a free row, reclaiming expired entries first and then the least recently used"""
+        if not self.free_slots:
+            for slot, entry in enumerate(self.entries):
+                if entry is not None and entry['expires_at'] <= now:
+                    self._release(slot)
+                    self.stats['expirations'] += 1
+        if not self.free_slots:
+            oldest = min(range(self.max_entries), key=lambda slot: self.entries[slot]['last_used'])
+            self._release(oldest)
+            self.stats['evictions'] += 1
+        return self.free_slots.pop()
+    
+    def _release(self, slot: int):
+        self.entries[slot] = None
+        self.vectors[slot] = 0.0
+        self.free_slots.append(slot)
+    
+    def clear(self):
+        """Remove every cached reply"""
+        with self.lock:
+            self.vectors = None
+            self.entries = [None] * self.max_entries
+            self.free_slots = list(range(self.max_entries - 1, -1, -1))
+    
+    def get_stats(self) -> Dict:
+        """Get hit rate, size and eviction counters"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = self.max_entries - len(self.free_slots)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['enabled'] = self.enabled
+        stats['threshold'] = self.threshold
+        stats['max_entries'] = self.max_entries
+        return stats
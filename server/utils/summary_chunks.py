@@ -0,0 +1,366 @@
+"""
+Incremental Collaboration Summaries
+Map step: fixed-size message chunks are summarized once and stored in summary_chunks.
+Reduce step: chunk summaries plus the unsummarized tail are merged into the session summary.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from db.config import supabase
+from .llm_gateway import llm_gateway
+from .prompt_builder import compact_json, estimate_tokens
+
+# Load environment variables
+load_dotenv()
+
+SUMMARY_MODEL = 'gemini-2.0-flash'
+
+MESSAGE_COLUMNS = 'id, message_type, content, mood, created_at'
+
+
+def _parse_json(response_text: str) -> Optional[Dict]:
+    """Parse a JSON object from a Gemini reply, tolerating code fences"""
+    text = response_text.strip()
+    if text.startswith('```'):
+        text = text.strip('`')
+        if text.startswith('json'):
+            text = text[4:]
+    try:
+        result = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return result if isinstance(result, dict) else None
+
+
+def _format_messages(messages: List[Dict], max_chars: int) -> str:
+    lines = []
+    for msg in messages:
+        role = "User" if msg.get('message_type') == 'user' else "AI Assistant"
+        content = ' '.join(str(msg.get('content', '')).split())
+        if len(content) > max_chars:
+            content = content[:max_chars].rstrip() + '...'
+        lines.append(f"{role}: {content}")
+    return '\n'.join(lines)
+
+
+def _after_boundary(query, chunk: Dict):
+    """Filter a chat_messages query to rows after a chunk's last message, ordered by (created_at, id)"""
+    last_at = chunk['last_message_at']
+    last_id = chunk.get('last_message_id')
+    if not last_id:
+        return query.gt('created_at', last_at)
+    # Messages stored in the same instant as the boundary are told apart by id
+    return query.or_(f'created_at.gt."{last_at}",and(created_at.eq."{last_at}",id.gt.{last_id})')
+
+
+def summary_is_current(summary: Optional[Dict], latest_message_at: Optional[str], message_count: int) -> bool:
+    """
+    Whether a stored collaboration summary already covers every message in its session
+    
+    Args:
+        summary (Dict, optional): collaboration_summaries row
+        latest_message_at (str, optional): created_at of the session's newest message
+        message_count (int): Number of messages in the session
+    
+    Returns:
+        bool: True if regenerating would summarize nothing new
+    """
+    if not summary or not latest_message_at:
+        return False
+    # The count catches messages stored in the same instant as the last summarized one
+    return summary.get('summarized_through') == latest_message_at and summary.get('message_count') == message_count
+
+
+def _count_moods(messages: List[Dict]) -> Dict[str, int]:
+    counts = {}
+    for msg in messages:
+        if msg.get('mood'):
+            counts[msg['mood']] = counts.get(msg['mood'], 0) + 1
+    return counts
+
+
+class SummaryChunker:
+    """Builds collaboration summaries from stored chunk summaries, re-summarizing only new chunks"""
+    
+    def __init__(self):
+        """Initialize chunking limits and the background pool for eager chunk summaries"""
+        self.chunk_size = int(os.getenv('SUMMARY_CHUNK_MESSAGES', '20'))
+        self.max_message_chars = int(os.getenv('SUMMARY_MAX_MESSAGE_CHARS', '500'))
+        self.reduce_token_budget = int(os.getenv('SUMMARY_REDUCE_TOKEN_BUDGET', '3000'))
+        self.max_pending_sessions = int(os.getenv('SUMMARY_MAX_PENDING_SESSIONS', '10000'))
+        self.gateway = llm_gateway
+        
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='summary-chunk')
+        self.lock = threading.Lock()
+        # session_id -> messages stored since the last eager map run, least recently noted first;
+        # a dropped count only delays that session's chunks until the next summary request
+        self.pending_counts = OrderedDict()
+        self.sessions_in_progress = set()
+        
+        self.stats = {
+            'chunks_summarized': 0,
+            'chunks_reused': 0,
+            'reduces': 0,
+            'eager_runs': 0,
+            'pending_evictions': 0
+        }
+    
+    def note_messages(self, session_id: str, count: int = 1):
+        """
+        Record newly stored messages and summarize a chunk in the background once one fills up
+        
+        Args:
+            session_id (str): Chat session ID
+            count (int): Number of messages just stored
+        """
+        with self.lock:
+            pending = self.pending_counts.pop(session_id, 0) + count
+            if pending < self.chunk_size or session_id in self.sessions_in_progress:
+                self.pending_counts[session_id] = pending
+                while len(self.pending_counts) > self.max_pending_sessions:
+                    self.pending_counts.popitem(last=False)
+                    self.stats['pending_evictions'] += 1
+                return
+            self.sessions_in_progress.add(session_id)
+            self.stats['eager_runs'] += 1
+        self.executor.submit(self._eager_map, session_id)
+    
+    def _eager_map(self, session_id: str):
+        try:
+            self.summarize_new_chunks(session_id)
+        except Exception as e:
+            print(f"Warning: Background chunk summarization failed for {session_id}: {e}")
+        finally:
+            with self.lock:
+                self.sessions_in_progress.discard(session_id)
+    
+    def summarize_new_chunks(self, session_id: str) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Map step: summarize and store every full chunk of messages not yet covered
+        
+        Args:
+            session_id (str): Chat session ID
+        
+        Returns:
+            Tuple[List[Dict], List[Dict]]: All stored chunk rows in order, and the messages
+                after the last full chunk
+        """
+        chunks_result = supabase.table('summary_chunks').select('*').eq('session_id', session_id).order('chunk_index').execute()
+        chunks = chunks_result.data or []
+        
+        query = supabase.table('chat_messages').select(MESSAGE_COLUMNS).eq('session_id', session_id)
+        if chunks:
+            query = _after_boundary(query, chunks[-1])
+        messages = query.order('created_at').order('id').execute().data or []
+        
+        with self.lock:
+            self.stats['chunks_reused'] += len(chunks)
+        
+        next_index = chunks[-1]['chunk_index'] + 1 if chunks else 0
+        while len(messages) >= self.chunk_size:
+            chunk = self._map_chunk(session_id, next_index, messages[:self.chunk_size])
+            if chunk is None:
+                # Leave the chunk unsummarized so a later run retries it with the LLM
+                break
+            messages = messages[self.chunk_size:]
+            result = supabase.table('summary_chunks').upsert(chunk, on_conflict='session_id,chunk_index').execute()
+            chunks.append(result.data[0] if result.data else chunk)
+            next_index += 1
+        
+        return chunks, messages
+    
+    def _map_chunk(self, session_id: str, chunk_index: int, messages: List[Dict]) -> Optional[Dict]:
+        """Summarize one chunk of messages, or return None if the LLM could not"""
+        if not self.gateway.available:
+            return None
+        
+        prompt = f"""
+Summarize this part of a supportive chat conversation between a user and an AI assistant.
+
+CONVERSATION:
+{_format_messages(messages, self.max_message_chars)}
+
+Respond with ONLY a JSON object with these fields:
+- summary: string of 2-3 sentences
+- key_points: array of at most 4 short strings about the user's feelings, needs and topics
+"""
+        summary = None
+        try:
+            response_text = self.gateway.generate_text(
+                prompt,
+                SUMMARY_MODEL,
+                generation_config={'response_mime_type': 'application/json'}
+            )
+            summary = _parse_json(response_text)
+        except Exception as e:
+            print(f"Chunk summary error: {e}")
+        
+        if not summary:
+            return None
+        
+        with self.lock:
+            self.stats['chunks_summarized'] += 1
+        
+        return {
+            'session_id': session_id,
+            'chunk_index': chunk_index,
+            'summary': str(summary.get('summary', '')),
+            'key_points': list(summary.get('key_points', []))[:4],
+            'mood_counts': _count_moods(messages),
+            'message_count': len(messages),
+            'first_message_at': messages[0]['created_at'],
+            'last_message_at': messages[-1]['created_at'],
+            'last_message_id': messages[-1]['id']
+        }
+    
+    def build_summary(self, session: Dict) -> Tuple[Dict, Dict]:
+        """
+        Map any new chunks, then reduce everything into collaboration summary fields
+        
+        Args:
+            session (Dict): Chat session row
+        
+        Returns:
+            Tuple[Dict, Dict]: Summary data (title, summary, key_insights, mood_analysis,
+                recommendations) and bookkeeping (chunk_count, message_count, summarized_through)
+        """
+        chunks, tail = self.summarize_new_chunks(session['id'])
+        message_count = sum(chunk.get('message_count', 0) for chunk in chunks) + len(tail)
+        if message_count == 0:
+            raise ValueError('No messages found in this session')
+        
+        mood_counts = {}
+        for counts in [chunk.get('mood_counts') or {} for chunk in chunks] + [_count_moods(tail)]:
+            for mood, count in counts.items():
+                mood_counts[mood] = mood_counts.get(mood, 0) + count
+        mood_trail = [max(chunk['mood_counts'], key=chunk['mood_counts'].get) for chunk in chunks if chunk.get('mood_counts')]
+        
+        summary_data = self._reduce(session, chunks, tail) if self.gateway.available else None
+        if not summary_data:
+            summary_data = self._fallback_summary(session, message_count)
+        
+        mood_analysis = summary_data.get('mood_analysis')
+        if not isinstance(mood_analysis, dict):
+            mood_analysis = {'patterns': str(mood_analysis)} if mood_analysis else {}
+        mood_analysis['mood_counts'] = mood_counts
+        if mood_trail:
+            mood_analysis['mood_by_chunk'] = mood_trail
+        summary_data['mood_analysis'] = mood_analysis
+        
+        last_message_at = tail[-1]['created_at'] if tail else (chunks[-1]['last_message_at'] if chunks else None)
+        with self.lock:
+            self.stats['reduces'] += 1
+        return summary_data, {
+            'chunk_count': len(chunks),
+            'message_count': message_count,
+            'summarized_through': last_message_at
+        }
+    
+    def _reduce(self, session: Dict, chunks: List[Dict], tail: List[Dict]) -> Optional[Dict]:
+        """Reduce step: merge chunk summaries, newest in full detail, into the session summary"""
+        # The most recent messages get up to half the budget, newest first
+        recent = []
+        used = 0
+        for msg in reversed(tail):
+            cost = estimate_tokens(_format_messages([msg], self.max_message_chars))
+            if used + cost > self.reduce_token_budget // 2:
+                break
+            recent.insert(0, msg)
+            used += cost
+        tail_text = _format_messages(recent, self.max_message_chars)
+        
+        # Newest chunks keep their key points; older ones shrink to their summary, then drop out
+        packed = []
+        for chunk in reversed(chunks):
+            entry = {'part': chunk['chunk_index'] + 1, 'summary': chunk.get('summary', '')}
+            if chunk.get('key_points'):
+                entry['key_points'] = chunk['key_points']
+            line = compact_json(entry)
+            if used + estimate_tokens(line) > self.reduce_token_budget:
+                entry.pop('key_points', None)
+                line = compact_json(entry)
+                if used + estimate_tokens(line) > self.reduce_token_budget:
+                    break
+            packed.append(line)
+            used += estimate_tokens(line)
+        omitted = len(chunks) - len(packed)
+        
+        prompt = f"""
+Analyze this therapy/counseling conversation and create a comprehensive collaboration summary.
+The conversation is given as summaries of consecutive parts, oldest first, followed by the most recent messages.
+{f"({omitted} earliest parts omitted for length.)" if omitted else ""}{f" ({len(tail) - len(recent)} older unsummarized messages omitted.)" if len(recent) < len(tail) else ""}
+
+PART SUMMARIES:
+{chr(10).join(reversed(packed)) if packed else "None"}
+
+MOST RECENT MESSAGES:
+{tail_text or "None"}
+
+Please provide:
+1. A concise title for this session
+2. A detailed summary of the conversation
+3. Key insights about the user's emotional state and needs
+4. Mood analysis and patterns
+5. Recommendations for continued support
+
+Format your response as JSON with these fields:
+- title: string
+- summary: string
+- key_insights: array of strings
+- mood_analysis: object with mood patterns and trends
+- recommendations: array of strings
+"""
+        try:
+            response_text = self.gateway.generate_text(
+                prompt,
+                SUMMARY_MODEL,
+                generation_config={'response_mime_type': 'application/json'}
+            )
+        except Exception as e:
+            print(f"Gemini API error: {e}")
+            return None
+        
+        summary_data = _parse_json(response_text)
+        if summary_data is None:
+            print("JSON parsing failed for reduced summary")
+            summary_data = {
+                'title': f"Session Summary - {session['title']}",
+                'summary': response_text,
+                'key_insights': ["AI-generated insights from conversation"],
+                'mood_analysis': {"patterns": "Analyzed from conversation"},
+                'recommendations': ["Continue supportive dialogue"]
+            }
+        return summary_data
+    
+    def _fallback_summary(self, session: Dict, message_count: int) -> Dict:
+        return {
+            'title': f"Session Summary - {session['title']}",
+            'summary': f"This is a summary of your conversation session '{session['title']}'. The session contained {message_count} messages. AI analysis was temporarily unavailable, but the conversation has been recorded for future reference.",
+            'key_insights': [
+                f"Session contained {message_count} messages",
+                "Conversation was recorded successfully",
+                "AI analysis temporarily unavailable"
+            ],
+            'mood_analysis': {"patterns": "Analysis temporarily unavailable"},
+            'recommendations': [
+                "Continue engaging in supportive conversations",
+                "Session data has been preserved",
+                "AI analysis will be available in future sessions"
+            ]
+        }
+    
+    def get_stats(self) -> Dict:
+        """Get map and reduce counters"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['sessions_in_progress'] = len(self.sessions_in_progress)
+            stats['pending_sessions'] = len(self.pending_counts)
+        stats['chunk_size'] = self.chunk_size
+        return stats
+
+# Create global instance
+summary_chunker = SummaryChunker()
@@ -0,0 +1,212 @@
+"""
+Summary Job Queue
+Runs collaboration summary generation on a local worker pool, tracked in the summary_jobs table
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from postgrest.exceptions import APIError
+from db.config import supabase
+
+# Load environment variables
+load_dotenv()
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Postgres error code raised when the unique active-job index rejects an insert
+UNIQUE_VIOLATION = '23505'
+
+
+class SummaryJobQueue:
+    """Persistent job table with an in-process worker pool and one active job per session"""
+    
+    def __init__(self):
+        """Initialize the worker pool; the job handler is registered by the chat routes"""
+        self.max_workers = int(os.getenv('SUMMARY_JOB_WORKERS', '2'))
+        self.stale_after_seconds = int(os.getenv('SUMMARY_JOB_STALE_SECONDS', '600'))
+        # Running jobs touch updated_at this often so they are never mistaken for orphans
+        self.heartbeat_seconds = float(os.getenv('SUMMARY_JOB_HEARTBEAT_SECONDS', str(self.stale_after_seconds / 4)))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='summary-job')
+        self.handler = None
+        
+        # session_id -> job_id for jobs this process has queued or is running
+        self.active_jobs = {}
+        self.lock = threading.Lock()
+        
+        self.stats = {
+            'submitted': 0,
+            'deduplicated': 0,
+            'completed': 0,
+            'failed': 0,
+            'recovered': 0
+        }
+    
+    def register_handler(self, handler: Callable[[Dict], Dict]):
+        """
+        Set the function that does the work for a job
+        
+        Args:
+            handler (Callable): Takes the job row and returns the saved summary row
+        """
+        self.handler = handler
+    
+    def submit(self, session_id: str, user_id: str, refresh: bool = False) -> Tuple[Dict, bool]:
+        """
+        Queue a summary job, or return the one already active for the session
+        
+        Args:
+            session_id (str): Chat session to summarize
+            user_id (str): Owner of the session
+            refresh (bool): Update an existing summary with messages added since it was made
+        
+        Returns:
+            Tuple[Dict, bool]: Job row and whether an existing job was reused
+        """
+        # The unique active-job index, not the lock, keeps one job per session, so the
+        # lock only guards local bookkeeping and is never held across a database call
+        existing = self._find_active_job(session_id)
+        if existing:
+            with self.lock:
+                self.stats['deduplicated'] += 1
+            return existing, True
+        
+        now = datetime.now(timezone.utc).isoformat()
+        try:
+            result = supabase.table('summary_jobs').insert({
+                'session_id': session_id,
+                'user_id': user_id,
+                'status': 'queued',
+                'refresh': refresh,
+                'created_at': now,
+                'updated_at': now
+            }).execute()
+        except APIError as e:
+            if e.code != UNIQUE_VIOLATION:
+                raise
+            # Another request or process won the unique active-job index for this session
+            existing = self._find_active_job(session_id)
+            if existing:
+                with self.lock:
+                    self.stats['deduplicated'] += 1
+                return existing, True
+            raise
+        job = result.data[0]
+        
+        with self.lock:
+            self.active_jobs[session_id] = job['id']
+            self.stats['submitted'] += 1
+        
+        self.executor.submit(self._run, job)
+        return job, False
+    
+    def _find_active_job(self, session_id: str) -> Optional[Dict]:
+        """Look up the queued or running job for the session in the job table"""
+        result = supabase.table('summary_jobs').select('*').eq('session_id', session_id).in_('status', list(ACTIVE_STATUSES)).order('created_at', desc=True).limit(1).execute()
+        if result.data:
+            return result.data[0]
+        with self.lock:
+            self.active_jobs.pop(session_id, None)
+        return None
+    
+    def get_job(self, job_id: str, user_id: str) -> Optional[Dict]:
+        """
+        Get a job for its owner, re-queueing it if the worker that held it has gone away
+        
+        Args:
+            job_id (str): Job ID
+            user_id (str): Requesting user
+        
+        Returns:
+            Optional[Dict]: Job row, or None if not found
+        """
+        result = supabase.table('summary_jobs').select('*').eq('id', job_id).eq('user_id', user_id).execute()
+        if not result.data:
+            return None
+        
+        job = result.data[0]
+        if job['status'] in ACTIVE_STATUSES and self._is_orphaned(job):
+            self._recover(job)
+        return job
+    
+    def _is_orphaned(self, job: Dict) -> bool:
+        """An active job no process has touched for a while, e.g. after a restart"""
+        with self.lock:
+            if self.active_jobs.get(job['session_id']) == job['id']:
+                return False
+        try:
+            updated_at = datetime.fromisoformat(str(job.get('updated_at')).replace('Z', '+00:00'))
+        except ValueError:
+            return True
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - updated_at > timedelta(seconds=self.stale_after_seconds)
+    
+    def _recover(self, job: Dict):
+        with self.lock:
+            if self.active_jobs.get(job['session_id']) == job['id']:
+                return
+            self.active_jobs[job['session_id']] = job['id']
+            self.stats['recovered'] += 1
+        self._update(job['id'], status='queued')
+        self.executor.submit(self._run, job)
+    
+    def _update(self, job_id: str, **fields):
+        fields['updated_at'] = datetime.now(timezone.utc).isoformat()
+        supabase.table('summary_jobs').update(fields).eq('id', job_id).execute()
+    
+    def _heartbeat(self, job_id: str, stop: threading.Event):
+        """Touch a running job's updated_at until the job finishes"""
+        while not stop.wait(self.heartbeat_seconds):
+            try:
+                self._update(job_id)
+            except Exception as e:
+                print(f"Warning: Summary job {job_id} heartbeat failed: {e}")
+    
+    def _run(self, job: Dict):
+        """Worker body: run the handler and record the outcome on the job row"""
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job['id'], stop_heartbeat), name='summary-job-heartbeat', daemon=True
+        )
+        try:
+            self._update(job['id'], status='running', started_at=datetime.now(timezone.utc).isoformat())
+            heartbeat.start()
+            if self.handler is None:
+                raise RuntimeError("No summary job handler registered")
+            
+            summary = self.handler(job)
+            self._update(
+                job['id'],
+                status='completed',
+                summary_id=summary.get('id'),
+                completed_at=datetime.now(timezone.utc).isoformat()
+            )
+            with self.lock:
+                self.stats['completed'] += 1
+        except Exception as e:
+            print(f"Warning: Summary job {job['id']} failed: {e}")
+            try:
+                self._update(job['id'], status='failed', error=str(e)[:500], completed_at=datetime.now(timezone.utc).isoformat())
+            except Exception as update_error:
+                print(f"Warning: Could not record summary job failure: {update_error}")
+            with self.lock:
+                self.stats['failed'] += 1
+        finally:
+            stop_heartbeat.set()
+            with self.lock:
+                if self.active_jobs.get(job['session_id']) == job['id']:
+                    del self.active_jobs[job['session_id']]
+    
+    def get_stats(self) -> Dict:
+        """Get job counters and worker pool size"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['active'] = len(self.active_jobs)
+        stats['workers'] = self.max_workers
+        return stats
+
+# Create global instance
+summary_job_queue = SummaryJobQueue()
@@ -0,0 +1,192 @@
+"""
+Pluggable Inference Backends for the Toxicity Classifier
+PyTorch (Detoxify) and int8-quantized ONNX Runtime implementations
+"""
+import json
+import os
+from typing import Dict, List, Optional
+
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'toxicity')
+
+
+class TorchToxicityBackend:
+    """Full-precision Detoxify model running on PyTorch"""
+    
+    name = 'torch'
+    
+    def __init__(self, variant: str = 'original'):
+        from detoxify import Detoxify
+        
+        self.variant = variant
+        self.model = Detoxify(variant)
+        self.class_names = list(self.model.class_names)
+    
+    def predict(self, texts: List[str]) -> Dict[str, List[float]]:
+        """
+        Score a batch of texts
+        
+        Args:
+            texts (List[str]): Texts to score
+        
+        Returns:
+            Dict[str, List[float]]: Scores per category, one entry per text
+        """
+        return self.model.predict(list(texts))
+
+
+class OnnxToxicityBackend:
+    """Detoxify exported to ONNX with int8 dynamic quantization, run on ONNX Runtime CPU"""
+    
+    name = 'onnx'
+    
+    def __init__(self, variant: str = 'original', model_dir: str = DEFAULT_ONNX_DIR, quantize: bool = True, max_length: int = 512):
+        """
+        Load a model exported beforehand with export_toxicity_onnx.py
+        
+        Args:
+            variant (str): Detoxify checkpoint name
+            model_dir (str): Directory holding the ONNX model, tokenizer and labels
+            quantize (bool): Use the int8 dynamically quantized model
+            max_length (int): Token truncation length; 512 matches what Detoxify scores
+        
+        Raises:
+            FileNotFoundError: If the model has not been exported to model_dir
+        """
+        import numpy as np
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        self.np = np
+        self.variant = variant
+        self.max_length = max_length
+        self.model_dir = os.path.join(model_dir, variant)
+        self.model_path = os.path.join(self.model_dir, 'model.int8.onnx' if quantize else 'model.onnx')
+        
+        # Exporting here would pull torch into every worker and race on model_dir
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"{self.model_path} not found; run export_toxicity_onnx.py first")
+        
+        with open(os.path.join(self.model_dir, 'labels.json')) as labels_file:
+            self.class_names = json.load(labels_file)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = int(os.getenv('TOXICITY_ONNX_THREADS', '0'))
+        self.session = ort.InferenceSession(self.model_path, sess_options=options, providers=['CPUExecutionProvider'])
+    
+    def predict(self, texts: List[str]) -> Dict[str, List[float]]:
+        """
+        Score a batch of texts
+        
+        Args:
+            texts (List[str]): Texts to score
+        
+        Returns:
+            Dict[str, List[float]]: Scores per category, one entry per text
+        """
+        encoded = self.tokenizer(
+            list(texts),
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors='np'
+        )
+        logits = self.session.run(['logits'], {
+            'input_ids': encoded['input_ids'].astype(self.np.int64),
+            'attention_mask': encoded['attention_mask'].astype(self.np.int64)
+        })[0]
+        scores = 1.0 / (1.0 + self.np.exp(-logits))
+        
+        return {
+            category: scores[:, i].tolist()
+            for i, category in enumerate(self.class_names)
+        }
+
+
+def export_detoxify_onnx(variant: str, output_dir: str, quantize: bool = True) -> str:
+    """
+    Export a Detoxify checkpoint to ONNX and optionally quantize it to int8; an offline step
+    run by export_toxicity_onnx.py, never by a serving worker
+    
+    Args:
+        variant (str): Detoxify checkpoint name
+        output_dir (str): Directory to write model, tokenizer and labels to
+        quantize (bool): Also write the int8 dynamically quantized model
+    
+    Returns:
+        str: Path of the model the ONNX backend should load
+    """
+    import torch
+    from detoxify import Detoxify
+    
+    os.makedirs(output_dir, exist_ok=True)
+    detoxify_model = Detoxify(variant, device='cpu')
+    classifier = detoxify_model.model.eval()
+    
+    class LogitsOnly(torch.nn.Module):
+        """Wraps the classifier so the exported graph returns plain logits"""
+        
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+        
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask)[0]
+    
+    sample = detoxify_model.tokenizer(['export sample text'], return_tensors='pt', padding=True, truncation=True)
+    fp32_path = os.path.join(output_dir, 'model.onnx')
+    with torch.no_grad():
+        torch.onnx.export(
+            LogitsOnly(classifier),
+            (sample['input_ids'], sample['attention_mask']),
+            fp32_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['logits'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'logits': {0: 'batch'}
+            },
+            opset_version=14
+        )
+    
+    detoxify_model.tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, 'labels.json'), 'w') as labels_file:
+        json.dump(list(detoxify_model.class_names), labels_file)
+    
+    if not quantize:
+        return fp32_path
+    
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    int8_path = os.path.join(output_dir, 'model.int8.onnx')
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def create_toxicity_backend(backend_name: Optional[str] = None, variant: Optional[str] = None):
+    """
+    Create the toxicity backend selected by config
+    
+    Args:
+        backend_name (str, optional): 'torch' or 'onnx'; defaults to TOXICITY_BACKEND
+        variant (str, optional): Detoxify checkpoint; defaults to TOXICITY_MODEL_VARIANT
+    
+    Returns:
+        Backend exposing predict(List[str]) and class_names
+    """
+    backend_name = (backend_name or os.getenv('TOXICITY_BACKEND', 'torch')).lower()
+    variant = variant or os.getenv('TOXICITY_MODEL_VARIANT', 'original')
+    
+    if backend_name == 'onnx':
+        try:
+            return OnnxToxicityBackend(
+                variant=variant,
+                model_dir=os.getenv('TOXICITY_ONNX_DIR', DEFAULT_ONNX_DIR),
+                quantize=os.getenv('TOXICITY_ONNX_QUANTIZE', 'True').lower() == 'true'
+            )
+        except Exception as e:
+            print(f"Warning: Failed to initialize ONNX toxicity backend, falling back to PyTorch: {e}")
+    
+    return TorchToxicityBackend(variant=variant)
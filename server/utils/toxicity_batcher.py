@@ -0,0 +1,134 @@
+"""
+Dynamic Micro-Batching for Toxicity Inference
+Collects concurrent toxicity requests and scores them with one batched model call
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+
+class Histogram:
+    """Fixed-bucket histogram with cumulative counts"""
+    
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+    
+    def observe(self, value: float):
+        """Record a single observation"""
+        with self.lock:
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    index = i
+                    break
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+    
+    def snapshot(self) -> Dict:
+        """Get cumulative bucket counts, total count, sum and mean"""
+        with self.lock:
+            cumulative = {}
+            running = 0
+            for bound, bucket_count in zip(self.buckets, self.counts):
+                running += bucket_count
+                cumulative[str(bound)] = running
+            cumulative['+Inf'] = self.count
+            return {
+                'buckets': cumulative,
+                'count': self.count,
+                'sum': round(self.total, 4),
+                'mean': round(self.total / self.count, 4) if self.count else 0.0
+            }
+
+
+class ToxicityBatcher:
+    """Queue in front of a toxicity model that batches concurrent predict calls"""
+    
+    def __init__(self, model, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        """
+        Initialize the batcher and start its worker thread
+        
+        Args:
+            model: Object with predict(List[str]) returning {category: [score, ...]}
+            max_batch_size (int): Maximum number of texts per model call
+            max_wait_ms (float): Longest time the first request in a batch waits for company
+        """
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.requests = queue.Queue()
+        self.batch_size_histogram = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.queue_wait_histogram = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100])
+        self.batches_run = 0
+        self.worker = threading.Thread(target=self._run, name='toxicity-batcher', daemon=True)
+        self.worker.start()
+    
+    def submit(self, text: str) -> Future:
+        """Queue a text for scoring and return a future for its scores"""
+        future = Future()
+        self.requests.put((text, future, time.perf_counter()))
+        return future
+    
+    def predict(self, text: str, timeout: Optional[float] = None) -> Dict[str, float]:
+        """
+        Score a single text through the shared batch queue
+        
+        Args:
+            text (str): Text to score
+            timeout (float, optional): Seconds to wait for the batch result
+        
+        Returns:
+            Dict[str, float]: Score per toxicity category
+        """
+        return self.submit(text).result(timeout=timeout)
+    
+    def _collect_batch(self) -> List:
+        """Block for the first request, then gather more until the batch is full or the wait expires"""
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        """Worker loop that runs one batched predict per collected batch"""
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                self.queue_wait_histogram.observe((started - enqueued_at) * 1000.0)
+            self.batch_size_histogram.observe(len(batch))
+            self.batches_run += 1
+            
+            texts = [text for text, _, _ in batch]
+            try:
+                scores = self.model.predict(texts)
+                for i, (_, future, _) in enumerate(batch):
+                    future.set_result({category: float(values[i]) for category, values in scores.items()})
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+    
+    def get_stats(self) -> Dict:
+        """Get batching configuration and histograms"""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'batches_run': self.batches_run,
+            'queue_depth': self.requests.qsize(),
+            'batch_size': self.batch_size_histogram.snapshot(),
+            'queue_wait_ms': self.queue_wait_histogram.snapshot()
+        }